@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import hashlib
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request, Response, status
+from bson import ObjectId
+
+from app.services.changes import get_versions
+
+# 条件请求统计
+conditional_stats: Dict[str, int] = {"not_modified": 0, "modified": 0}
+
+def make_etag(request: Request, *parts: Any) -> str:
+    """由请求路径、查询参数和版本信息生成强ETag"""
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    source = "|".join([request.url.path, query, *map(str, parts)])
+    return '"' + hashlib.sha1(source.encode()).hexdigest() + '"'
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    """按 If-None-Match 的弱比较规则判断ETag是否匹配"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    为响应设置ETag，并处理 If-None-Match 条件请求
+    
+    Args:
+        request: 当前请求
+        response: 路由的响应对象，用于写入ETag头
+        etag: 当前表示的ETag
+    
+    Returns:
+        ETag匹配时返回304响应，路由应直接返回它；否则返回None
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        conditional_stats["not_modified"] += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    conditional_stats["modified"] += 1
+    response.headers.update(headers)
+    return None
+
+async def check_collection_etag(
+    request: Request,
+    response: Response,
+    user_id: ObjectId,
+    collection: str,
+    *parts: Any
+) -> Optional[Response]:
+    """
+    以用户集合版本号为依据处理条件请求
+    
+    版本号在查询数据之前读取：若读取后数据又发生变更，返回的ETag偏旧，
+    客户端下次请求只会多取一次完整数据，不会得到过期的304。
+    
+    Args:
+        request: 当前请求
+        response: 路由的响应对象
+        user_id: 用户ID
+        collection: 响应所依赖的集合名
+        *parts: 影响响应内容的其他值（如日期）
+    
+    Returns:
+        ETag匹配时返回304响应，否则返回None
+    """
+    versions = await get_versions(user_id)
+    etag = make_etag(request, user_id, collection, versions.get(collection, 0), *parts)
+    return check_etag(request, response, etag)
+
+async def _poll(client: Any, headers: Dict[str, str], task_ids: List[str], polls: int, change_rate: float, conditional: bool) -> Dict[str, float]:
+    """
+    模拟客户端轮询：每轮依次请求各端点，按 change_rate 的概率在轮询之间修改一个任务
+    
+    conditional 为真时带上上次响应的ETag，相同的随机种子使两种模式的修改序列一致。
+    """
+    paths = ["/api/tasks", "/api/dashboard", "/api/daily-cards/today"]
+    etags: Dict[str, str] = {}
+    rng = random.Random(0)
+    stats = {"requests": 0, "not_modified": 0, "bytes": 0}
+    
+    started, cpu_started = time.perf_counter(), time.process_time()
+    for index in range(polls):
+        if rng.random() < change_rate:
+            task_id = rng.choice(task_ids)
+            response = await client.put(f"/api/tasks/{task_id}", json={"title": f"Edited {index}"}, headers=headers)
+            response.raise_for_status()
+        for path in paths:
+            request_headers = {**headers, "If-None-Match": etags[path]} if conditional and path in etags else headers
+            response = await client.get(path, headers=request_headers)
+            if response.status_code != status.HTTP_304_NOT_MODIFIED:
+                response.raise_for_status()
+                etags[path] = response.headers.get("ETag", "")
+            else:
+                stats["not_modified"] += 1
+            stats["requests"] += 1
+            stats["bytes"] += len(response.content)
+    stats["seconds"] = time.perf_counter() - started
+    stats["cpu_seconds"] = time.process_time() - cpu_started
+    return stats
+
+async def _main(task_count: int, polls: int, change_rate: float) -> int:
+    from app.core.benchmark import benchmark_client, insert_tasks, register_user
+    
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        await insert_tasks(user_id, task_count)
+        response = await client.put("/api/daily-cards/today", headers=headers)
+        response.raise_for_status()
+        task_ids = [task["id"] for task in (await client.get("/api/tasks", headers=headers)).json()["items"]]
+        
+        print(f"{polls} polls of 3 endpoints, {task_count} tasks, change probability {change_rate:.0%} per poll")
+        results = {}
+        for label, conditional in (("unconditional", False), ("If-None-Match", True)):
+            results[label] = stats = await _poll(client, headers, task_ids, polls, change_rate, conditional)
+            print(
+                f"{label:<14} {stats['bytes'] / 1024:9.1f} KiB {stats['cpu_seconds'] * 1000:8.1f} ms cpu "
+                f"{stats['seconds'] * 1000:8.1f} ms wall {stats['not_modified']:5d}/{stats['requests']} not modified"
+            )
+        
+        full, conditional = results["unconditional"], results["If-None-Match"]
+        print(
+            f"Saved {1 - conditional['bytes'] / full['bytes']:.0%} of bytes and "
+            f"{1 - conditional['cpu_seconds'] / full['cpu_seconds']:.0%} of CPU time"
+        )
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模拟客户端轮询，比较条件请求节省的传输字节和CPU时间（使用临时数据库）")
+    parser.add_argument("--tasks", type=int, default=500, help="用户的任务数")
+    parser.add_argument("--polls", type=int, default=300, help="轮询次数")
+    parser.add_argument("--change-rate", type=float, default=0.05, help="每次轮询前修改一个任务的概率")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.tasks, args.polls, args.change_rate)))
@@ -1,12 +1,28 @@
 from fastapi import FastAPI
+from app.core.broker import event_broker
 from app.core.db import connect_to_mongo, close_mongo_connection
+from app.core.config import settings
+from app.core.hash_pool import hash_pool
+from app.core.indexes import ensure_indexes
+from app.core.revocation import revocation_list
+from app.core.security import calibrate_bcrypt_cost
+from app.services.archive import task_archiver
+from app.services.changes import VERSION_COLLECTION
+from app.services.sync import SYNC_COLLECTIONS
 
 def create_start_app_handler(app: FastAPI):
     """
     创建应用启动处理器
     """
     async def start_app() -> None:
+        calibrate_bcrypt_cost()
         await connect_to_mongo()
+        await ensure_indexes()
+        revocation_list.start()
+        if settings.EVENTS_CHANGE_STREAMS:
+            event_broker.start(VERSION_COLLECTION, SYNC_COLLECTIONS)
+        if settings.TASK_ARCHIVE_AFTER_DAYS is not None:
+            task_archiver.start()
     
     return start_app
 
@@ -15,6 +31,10 @@ def create_stop_app_handler(app: FastAPI):
     创建应用停止处理器
     """
     async def stop_app() -> None:
+        revocation_list.stop()
+        event_broker.stop()
+        task_archiver.stop()
         await close_mongo_connection()
+        hash_pool.shutdown()
     
     return stop_app
@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+def resolve_projection(
+    view: str,
+    fields: Optional[str],
+    views: Dict[str, Optional[Tuple[str, ...]]],
+    allowed_fields: Sequence[str]
+) -> Optional[Dict[str, int]]:
+    """
+    将视图名或 fields 参数转换为MongoDB投影
+    
+    Args:
+        view: 预定义视图名
+        fields: 逗号分隔的字段列表，提供时优先于视图
+        views: 视图名到字段元组的映射，None 表示返回完整文档
+        allowed_fields: 允许请求的字段
+    
+    Returns:
+        MongoDB投影，None 表示不做投影
+    
+    Raises:
+        HTTPException: 如果视图或字段无效
+    """
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+        invalid = [f for f in selected if f not in allowed_fields]
+        if invalid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的字段: {', '.join(invalid)}。有效字段: {', '.join(allowed_fields)}"
+            )
+    elif view in views:
+        selected = views[view]
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的视图。有效视图: {', '.join(views)}"
+        )
+    
+    if selected is None:
+        return None
+    
+    # _id 总是由MongoDB返回
+    return {field: 1 for field in selected}
+
+async def _walk(client: Any, headers: Dict[str, str], params: Dict[str, str]) -> Tuple[int, float]:
+    """按游标读取全部任务，返回响应体总字节数和总耗时（秒）"""
+    total_bytes, cursor = 0, None
+    started = time.perf_counter()
+    while True:
+        response = await client.get(
+            "/api/tasks",
+            params={**params, "limit": 200, **({"cursor": cursor} if cursor else {})},
+            headers=headers
+        )
+        response.raise_for_status()
+        total_bytes += len(response.content)
+        cursor = response.json()["next_cursor"]
+        if not cursor:
+            return total_bytes, time.perf_counter() - started
+
+async def _main(task_count: int, repeat: int) -> int:
+    from app.core.benchmark import benchmark_client, insert_tasks, register_user
+    
+    variants: List[Tuple[str, Dict[str, str]]] = [
+        ("view=full", {}),
+        ("view=board", {"view": "board"}),
+        ("fields=title,is_completed", {"fields": "title,is_completed"}),
+    ]
+    
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        await insert_tasks(user_id, task_count)
+        
+        print(f"Reading all {task_count} tasks through GET /api/tasks (200 per page), median of {repeat}")
+        for label, params in variants:
+            runs = [await _walk(client, headers, params) for _ in range(repeat)]
+            size = runs[0][0]
+            elapsed = statistics.median(seconds for _, seconds in runs)
+            print(f"{label:<28} {size / 1024:9.1f} KiB {size / task_count:7.1f} B/task {elapsed * 1000:8.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比较不同视图和字段集下任务列表的响应大小和耗时（使用临时数据库）")
+    parser.add_argument("--tasks", type=int, default=3000, help="用户的任务数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取中位数")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.tasks, args.repeat)))
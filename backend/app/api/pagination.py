@@ -0,0 +1,205 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId, Timestamp, json_util
+from bson.errors import BSONError
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+# 排序键：(字段名, 方向)，最后一个字段必须唯一（通常为 _id）
+SortKeys = Sequence[Tuple[str, int]]
+
+# 游标中可以出现的排序键值类型，其他类型（如正则、代码）不能用于范围比较
+CURSOR_VALUE_TYPES = (str, int, float, bool, datetime, ObjectId, Timestamp, type(None))
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    将请求的每页条数限制在配置范围内
+
+    Args:
+        limit: 请求的每页条数
+
+    Returns:
+        实际使用的每页条数
+    """
+    if limit is None:
+        return settings.PAGE_SIZE_DEFAULT
+    return max(1, min(limit, settings.PAGE_SIZE_MAX))
+
+def encode_cursor(doc: Dict[str, Any], sort_keys: SortKeys) -> str:
+    """
+    由一页中最后一个文档的排序键值生成不透明游标
+
+    Args:
+        doc: 文档
+        sort_keys: 排序键
+
+    Returns:
+        base64url编码的游标
+    """
+    values = [doc.get(field) for field, _ in sort_keys]
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_keys: SortKeys) -> List[Any]:
+    """
+    解析游标中的排序键值
+
+    Args:
+        cursor: 游标
+        sort_keys: 排序键
+
+    Returns:
+        排序键值列表
+
+    Raises:
+        HTTPException: 如果游标无效
+    """
+    # 客户端可以构造任意游标：格式正确的base64也可能包含无效的ObjectId（InvalidId）
+    # 或结构错误的扩展JSON（KeyError、TypeError 等），一律视为无效游标
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json_util.loads(raw)
+    except (binascii.Error, ValueError, KeyError, TypeError, ArithmeticError, BSONError):
+        values = None
+
+    if (
+        not isinstance(values, list)
+        or len(values) != len(sort_keys)
+        or not all(isinstance(value, CURSOR_VALUE_TYPES) for value in values)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+    return values
+
+def keyset_filter(sort_keys: SortKeys, values: List[Any]) -> Dict[str, Any]:
+    """
+    构建"位于游标之后"的查询条件
+
+    对排序 (a, b) 生成 {a 越过 va} 或 {a == va 且 b 越过 vb}，
+    配合以相同键排序的索引，任意深度的翻页都只需一次索引范围扫描。
+
+    Args:
+        sort_keys: 排序键
+        values: 游标中的排序键值
+
+    Returns:
+        MongoDB查询条件
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort_keys):
+        clause = {f: values[j] for j, (f, _) in enumerate(sort_keys[:i])}
+        if values[i] is None and direction > 0:
+            # 空值排在升序的最前面，其后是所有非空值；{"$gt": None} 不匹配任何非空值
+            clause[field] = {"$ne": None}
+        else:
+            clause[field] = {"$lt" if direction < 0 else "$gt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort_keys: SortKeys,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> Dict[str, Any]:
+    """
+    按键集分页读取一页文档
+
+    Args:
+        collection: MongoDB集合
+        query: 查询条件
+        sort_keys: 排序键
+        limit: 每页条数
+        cursor: 上一页返回的游标
+        projection: 投影，排序键会被临时加入以生成游标
+
+    Returns:
+        包含 items 和 next_cursor 的字典
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort_keys, decode_cursor(cursor, sort_keys))]}
+
+    extra_fields = []
+    if projection is not None:
+        projection = dict(projection)
+        for field, _ in sort_keys:
+            if field != "_id" and field not in projection:
+                projection[field] = 1
+                extra_fields.append(field)
+
+    # 多取一条用于判断是否还有下一页
+    docs = await collection.find(query, projection).sort(list(sort_keys)).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_keys)
+
+    for doc in docs:
+        for field in extra_fields:
+            doc.pop(field, None)
+
+    return {"items": docs, "next_cursor": next_cursor}
+
+async def fetch_merged_page(
+    collections: Sequence[Any],
+    query: Dict[str, Any],
+    sort_keys: SortKeys,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> Dict[str, Any]:
+    """
+    在多个结构相同的集合上按同一排序键分页，结果合并为一页
+
+    每个集合各取 limit+1 条后合并排序；某集合中未取到的文档都排在该集合
+    已取到的文档之后，所以合并后的前 limit 条与在并集上分页的结果一致。
+
+    Args:
+        collections: MongoDB集合列表
+        query: 查询条件
+        sort_keys: 排序键
+        limit: 每页条数
+        cursor: 上一页返回的游标
+        projection: 投影
+
+    Returns:
+        包含 items 和 next_cursor 的字典
+    """
+    extra_fields = []
+    if projection is not None:
+        projection = dict(projection)
+        for field, _ in sort_keys:
+            if field != "_id" and field not in projection:
+                projection[field] = 1
+                extra_fields.append(field)
+
+    docs = []
+    for collection in collections:
+        docs.extend((await fetch_page(collection, query, sort_keys, limit + 1, cursor, projection))["items"])
+
+    # 逐个排序键做稳定排序；None 与MongoDB一致排在最前
+    for field, direction in reversed(sort_keys):
+        docs.sort(
+            key=lambda doc: (doc.get(field) is not None, doc.get(field) if doc.get(field) is not None else 0),
+            reverse=direction < 0
+        )
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_keys)
+
+    for doc in docs:
+        for field in extra_fields:
+            doc.pop(field, None)
+
+    return {"items": docs, "next_cursor": next_cursor}
@@ -0,0 +1,151 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+def _default(value: Any) -> Any:
+    """orjson 不能原生编码的类型：ObjectId 输出为字符串"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class MongoJSONResponse(JSONResponse):
+    """
+    使用 orjson 编码的JSON响应，应用的默认响应类
+    
+    datetime、date 和 UUID 由 orjson 原生编码，MongoDB文档中的 ObjectId 编码为字符串，
+    字典的非字符串键转换为字符串。
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class ResponseSerializer:
+    """
+    预编译的响应序列化器，用于返回大量文档的热点路由
+    
+    FastAPI 处理 response_model 时每个请求都要先校验返回值，再将校验结果转换为
+    可JSON化的Python对象，最后由响应类编码为字节。序列化器在导入时为模型构建一次
+    TypeAdapter，每个请求只校验一次，并由 pydantic-core 直接输出JSON字节。
+    路由直接返回 Response，FastAPI 不再处理返回值；装饰器上的 response_model
+    仍然保留，用于生成OpenAPI文档，两者应使用同一个模型和 exclude_unset 设置。
+    """
+    def __init__(self, model: Any, exclude_unset: bool = False):
+        self.adapter = TypeAdapter(model)
+        self.exclude_unset = exclude_unset
+    
+    def render(self, content: Any) -> bytes:
+        """按模型校验返回值并编码为JSON字节，返回值中的模型实例（如 UserInDB）按属性读取"""
+        return self.adapter.dump_json(
+            self.adapter.validate_python(content, from_attributes=True),
+            by_alias=True,
+            exclude_unset=self.exclude_unset
+        )
+    
+    def response(self, content: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+        """
+        构建JSON响应
+    
+        Args:
+            content: 路由的返回值，如MongoDB文档组成的字典
+            response: 路由注入的响应对象，其上设置的响应头（如ETag）会复制到返回的响应中
+            status_code: 响应状态码
+    
+        Returns:
+            可由路由直接返回的响应
+        """
+        result = Response(self.render(content), status_code=status_code, media_type="application/json")
+        if response is not None:
+            result.raw_headers.extend(
+                (key, value) for key, value in response.headers.raw if key != b"content-length"
+            )
+        return result
+
+def _sample_page(task_count: int) -> Dict[str, Any]:
+    """构造与 GET /tasks 返回值形式相同的一页完整任务文档"""
+    now = datetime.utcnow()
+    user_id = ObjectId()
+    tasks = [
+        {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "title": f"Task {index}",
+            "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit",
+            "list_type": ("todo", "watch", "later")[index % 3],
+            "priority": index % 3,
+            "tags": ["work", f"tag{index % 10}"],
+            "due_date": now + timedelta(days=index % 30),
+            "is_completed": index % 4 == 0,
+            "completed_at": now if index % 4 == 0 else None,
+            "rank": f"{index:08d}",
+            "created_at": now - timedelta(days=index),
+            "updated_at": now,
+        }
+        for index in range(task_count)
+    ]
+    return {"items": tasks, "next_cursor": "cursor"}
+
+def _measure(render: Callable[[], bytes], iterations: int) -> Dict[str, float]:
+    """测量每次序列化的CPU时间、分配的内存和输出大小"""
+    render()
+    start = time.process_time()
+    for _ in range(iterations):
+        render()
+    cpu_ms = (time.process_time() - start) / iterations * 1000
+    
+    # tracemalloc 会显著拖慢执行，内存单独测量一次
+    tracemalloc.start()
+    body = render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cpu_ms": cpu_ms, "peak_kib": peak / 1024, "bytes": len(body)}
+
+def _main(task_count: int, iterations: int) -> int:
+    from fastapi.routing import _prepare_response_content
+    from fastapi.utils import create_response_field
+    
+    from app.schemas.task import TaskPage
+    
+    content = _sample_page(task_count)
+    field = create_response_field(name="response", type_=TaskPage)
+    serializer = ResponseSerializer(TaskPage, exclude_unset=True)
+    
+    def fastapi_path(response_class: Any) -> Callable[[], bytes]:
+        # 与 fastapi.routing.serialize_response 相同：校验、转换为可JSON化的对象，再由响应类编码
+        def render() -> bytes:
+            value, errors = field.validate(_prepare_response_content(content, exclude_unset=True), {}, loc=("response",))
+            if errors:
+                raise ValueError(errors)
+            return response_class(field.serialize(value, mode="json", exclude_unset=True)).body
+        return render
+    
+    paths = {
+        "response_model + JSONResponse": fastapi_path(JSONResponse),
+        "response_model + MongoJSONResponse": fastapi_path(MongoJSONResponse),
+        "ResponseSerializer": lambda: serializer.response(content).body,
+        "jsonable_encoder + JSONResponse (no model)": lambda: JSONResponse(
+            jsonable_encoder(content, custom_encoder={ObjectId: str})
+        ).body,
+        "MongoJSONResponse (no model)": lambda: MongoJSONResponse(content).body,
+    }
+    
+    print(f"{task_count} tasks per response, {iterations} iterations")
+    for name, render in paths.items():
+        result = _measure(render, iterations)
+        print(f"{name:<45} {result['cpu_ms']:8.2f} ms cpu {result['peak_kib']:10.1f} KiB peak {result['bytes']:>9} bytes")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比较任务列表响应的序列化开销")
+    parser.add_argument("--tasks", type=int, default=1000, help="每个响应中的任务数")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    sys.exit(_main(args.tasks, args.iterations))
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.routes import auth, tasks, daily_cards
+from app.api.routes import auth, tasks, daily_cards, data, tags, sync, events, analytics, dashboard
 
 api_router = APIRouter()
 
@@ -7,3 +7,9 @@ api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["认证"])
 api_router.include_router(tasks.router, prefix="/tasks", tags=["任务"])
 api_router.include_router(daily_cards.router, prefix="/daily-cards", tags=["每日卡片"])
+api_router.include_router(tags.router, prefix="/tags", tags=["标签"])
+api_router.include_router(sync.router, prefix="/sync", tags=["同步"])
+api_router.include_router(events.router, prefix="/events", tags=["事件"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["分析"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["仪表板"])
+api_router.include_router(data.router, tags=["数据导入导出"])
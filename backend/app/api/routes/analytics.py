@@ -0,0 +1,219 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from bson import ObjectId
+
+from app.api.conditional import check_etag, make_etag
+from app.core.config import settings
+from app.core.deps import get_current_identity
+from app.core.db import get_collection
+from app.schemas.user import CurrentUser
+from app.schemas.analytics import ProductivityInsights, ProductivityReport, TaskRecommendationList
+from app.schemas.daily_card import card_date
+from app.services.changes import get_versions
+from app.services.productivity import PERIODS, PRODUCTIVITY_COLLECTION, week_start
+from app.services.recommendations import recommend_tasks
+
+router = APIRouter()
+
+# 统计文档中的计数字段和按键细分的计数字段
+COUNT_FIELDS = ("completed_total", "card_tasks", "card_tasks_completed", "accomplishment_total")
+BREAKDOWN_FIELDS = ("completed", "accomplishments")
+
+def _date_range(date_from: Optional[date], date_to: Optional[date]) -> Tuple[date, date]:
+    """解析请求的日期范围（含两端），默认为截至今天的最近 ANALYTICS_DEFAULT_DAYS 天"""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=settings.ANALYTICS_DEFAULT_DAYS - 1)
+    
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="起始日期不能晚于结束日期"
+        )
+    if (date_to - date_from).days >= settings.ANALYTICS_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"日期范围不能超过 {settings.ANALYTICS_MAX_DAYS} 天"
+        )
+    return date_from, date_to
+
+async def _check_analytics_etag(request: Request, response: Response, user_id: ObjectId) -> Optional[Response]:
+    """统计由任务和每日卡片派生，ETag 由两者的版本号生成；默认日期范围随日期变化，日期也计入ETag"""
+    versions = await get_versions(user_id)
+    etag = make_etag(
+        request, user_id, versions.get("tasks", 0), versions.get("daily_cards", 0), datetime.utcnow().date()
+    )
+    return check_etag(request, response, etag)
+
+async def _read_series(user_id: ObjectId, period: str, starts: List[date]) -> List[Dict[str, Any]]:
+    """
+    读取连续若干天或周的统计
+    
+    一次范围查询命中 (user_id, period, start) 索引，读取的文档数不超过 starts 的长度。
+    没有统计文档的日期计为0。
+    """
+    cursor = get_collection(PRODUCTIVITY_COLLECTION).find(
+        {
+            "user_id": user_id,
+            "period": period,
+            "start": {"$gte": card_date(starts[0]), "$lte": card_date(starts[-1])}
+        },
+        {"_id": 0, "user_id": 0, "period": 0}
+    )
+    docs = {doc.pop("start").date(): doc async for doc in cursor}
+    
+    series = []
+    for start in starts:
+        doc = docs.get(start, {})
+        item: Dict[str, Any] = {"start": start}
+        for field in COUNT_FIELDS:
+            item[field] = doc.get(field, 0)
+        for field in BREAKDOWN_FIELDS:
+            # 增量维护会留下计数为0的键
+            item[field] = {key: count for key, count in doc.get(field, {}).items() if count}
+        series.append(item)
+    return series
+
+def _totals(series: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """累加统计序列"""
+    totals: Dict[str, Any] = {field: 0 for field in COUNT_FIELDS}
+    totals.update({field: {} for field in BREAKDOWN_FIELDS})
+    for item in series:
+        for field in COUNT_FIELDS:
+            totals[field] += item[field]
+        for field in BREAKDOWN_FIELDS:
+            for key, count in item[field].items():
+                totals[field][key] = totals[field].get(key, 0) + count
+    return totals
+
+def _streaks(counts: List[int]) -> Tuple[int, int]:
+    """
+    由按日期升序排列的每日完成数计算连续完成任务的天数
+    
+    最后一天可能尚未结束，当天还没有完成任务时当前连续天数从前一天算起。
+    
+    Returns:
+        (当前连续天数, 最长连续天数)
+    """
+    longest = run = 0
+    for count in counts:
+        run = run + 1 if count else 0
+        longest = max(longest, run)
+    
+    current = 0
+    for count in reversed(counts[:-1] if counts and not counts[-1] else counts):
+        if not count:
+            break
+        current += 1
+    return current, longest
+
+@router.get("/productivity", response_model=ProductivityReport)
+async def read_productivity(
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    period: str = "day",
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    获取生产力分析
+    
+    返回日期范围内（含两端）每天或每周的完成任务数（按列表细分）、卡片任务的计划与完成数
+    以及成就数（按来源细分）。数据来自随写入增量维护的统计文档，
+    读取量与请求的天数成正比，与历史数据量无关。
+    period=week 时返回范围所涉及的各周（周一开始）的完整计数。
+    """
+    if period not in PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的统计周期。有效值: {', '.join(PERIODS)}"
+        )
+    start, end = _date_range(date_from, date_to)
+    
+    user_id = ObjectId(current_user.id)
+    not_modified = await _check_analytics_etag(request, response, user_id)
+    if not_modified:
+        return not_modified
+    
+    if period == "week":
+        first, step = week_start(start).date(), 7
+    else:
+        first, step = start, 1
+    starts = [first + timedelta(days=offset) for offset in range(0, (end - first).days + 1, step)]
+    series = await _read_series(user_id, period, starts)
+    
+    return {
+        "start": start,
+        "end": end,
+        "period": period,
+        "items": series,
+        "totals": _totals(series),
+    }
+
+@router.get("/insights", response_model=ProductivityInsights)
+async def read_insights(
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    获取用户行为洞察
+    
+    由日期范围内（含两端）的每日统计计算活跃天数、最常完成任务的星期和列表、
+    卡片任务完成率、连续完成任务的天数以及最近一周的变化趋势。
+    连续天数只在请求的范围内计算。
+    """
+    start, end = _date_range(date_from, date_to)
+    
+    user_id = ObjectId(current_user.id)
+    not_modified = await _check_analytics_etag(request, response, user_id)
+    if not_modified:
+        return not_modified
+    
+    series = await _read_series(
+        user_id, "day", [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    )
+    totals = _totals(series)
+    completed = [item["completed_total"] for item in series]
+    
+    weekdays = [0] * 7
+    for item in series:
+        weekdays[item["start"].weekday()] += item["completed_total"]
+    
+    current_streak, longest_streak = _streaks(completed)
+    recent, previous = sum(completed[-7:]), sum(completed[-14:-7])
+    
+    return {
+        "start": start,
+        "end": end,
+        "active_days": sum(1 for count in completed if count),
+        "daily_average": round(totals["completed_total"] / len(series), 2),
+        "best_weekday": weekdays.index(max(weekdays)) if any(weekdays) else None,
+        "top_list_type": max(totals["completed"], key=totals["completed"].get) if totals["completed"] else None,
+        "card_completion_rate": (
+            round(totals["card_tasks_completed"] / totals["card_tasks"], 4) if totals["card_tasks"] else None
+        ),
+        "current_streak": current_streak,
+        "longest_streak": longest_streak,
+        "week_over_week": round((recent - previous) / previous, 4) if len(series) >= 14 and previous else None,
+    }
+
+@router.get("/recommendations", response_model=TaskRecommendationList)
+async def read_recommendations(
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    获取推荐加入今天卡片的任务
+    
+    综合优先级、截止日期、搁置时间、所在列表以及用户近期完成任务的列表和标签偏好，
+    对全部未完成的任务一次向量化打分，返回得分最高的任务及贡献最大的因素。
+    """
+    if limit is None:
+        limit = settings.RECOMMENDATION_LIMIT_DEFAULT
+    limit = max(1, min(limit, settings.RECOMMENDATION_LIMIT_MAX))
+    
+    return {"items": await recommend_tasks(ObjectId(current_user.id), limit)}
@@ -1,13 +1,24 @@
 from datetime import timedelta
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
+from app.api.conditional import check_etag, make_etag
+from app.core.cache import invalidate_user
 from app.core.config import settings
-from app.core.security import create_access_token, get_password_hash, verify_password
+from app.core.security import (
+    create_access_token,
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_password_async,
+)
 from app.core.deps import get_current_user
 from app.core.db import get_collection
+from app.core.revocation import revocation_list
 from app.schemas.token import Token
 from app.schemas.user import User, UserCreate, UserInDB
 
@@ -20,30 +31,26 @@ async def register(user_in: UserCreate) -> Any:
     """
     user_collection = get_collection("users")
     
-    # 检查邮箱是否已存在
-    if await user_collection.find_one({"email": user_in.email}):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="该邮箱已被注册"
-        )
+    # 创建新用户
+    user_data = user_in.dict()
+    user_data["password"] = await get_password_hash_async(user_in.password)
     
-    # 检查用户名是否已存在
-    if await user_collection.find_one({"username": user_in.username}):
+    # 邮箱和用户名的唯一性由唯一索引保证
+    try:
+        await user_collection.insert_one(user_data)
+    except DuplicateKeyError as exc:
+        key_pattern = (exc.details or {}).get("keyPattern", {})
+        if "username" in key_pattern:
+            detail = "该用户名已被使用"
+        else:
+            detail = "该邮箱已被注册"
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="该用户名已被使用"
+            detail=detail
         )
     
-    # 创建新用户
-    user_data = user_in.dict()
-    user_data["password"] = get_password_hash(user_in.password)
-    
-    result = await user_collection.insert_one(user_data)
-    
-    # 获取新创建的用户
-    new_user = await user_collection.find_one({"_id": result.inserted_id})
-    
-    return new_user
+    # insert_one 会把生成的 _id 写回 user_data
+    return user_data
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
@@ -58,7 +65,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
         # 尝试使用用户名查找
         user = await user_collection.find_one({"username": form_data.username})
     
-    if not user or not verify_password(form_data.password, user["password"]):
+    if not user or not await verify_password_async(form_data.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="邮箱/用户名或密码不正确",
@@ -67,15 +74,27 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
     
     # 更新最后登录时间
     from datetime import datetime
+    update_data = {"last_login": datetime.utcnow()}
+    
+    # 密码哈希成本与当前配置不一致时透明地重新哈希
+    if password_needs_rehash(user["password"]):
+        update_data["password"] = await get_password_hash_async(form_data.password)
+    
     await user_collection.update_one(
         {"_id": user["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
+        {"$set": update_data}
     )
+    invalidate_user(user["_id"])
     
     # 创建访问令牌
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    # 令牌总是携带签发时的令牌版本号，吊销后旧令牌随即失效
+    claims = {"ver": user.get("token_version", 0)}
+    if settings.STATELESS_TOKENS:
+        # 内嵌路由所需的最小身份声明，认证时无需访问数据库
+        claims["username"] = user["username"]
     access_token = create_access_token(
-        subject=str(user["_id"]), expires_delta=access_token_expires
+        subject=str(user["_id"]), expires_delta=access_token_expires, claims=claims
     )
     
     return {
@@ -84,8 +103,38 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
     }
 
 @router.get("/me", response_model=User)
-async def read_users_me(current_user: UserInDB = Depends(get_current_user)) -> Any:
+async def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: UserInDB = Depends(get_current_user)
+) -> Any:
     """
     获取当前用户信息
+    
+    用户信息在认证时已经读取，ETag 直接由响应字段生成。
     """
+    etag = make_etag(request, current_user.id, current_user.email, current_user.username)
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     return current_user
+
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT, response_model=None)
+async def revoke_tokens(current_user: UserInDB = Depends(get_current_user)) -> None:
+    """
+    吊销当前用户已签发的所有访问令牌
+    """
+    user_collection = get_collection("users")
+    
+    # 递增令牌版本号，旧版本号的令牌随即失效
+    user = await user_collection.find_one_and_update(
+        {"_id": ObjectId(current_user.id)},
+        {"$inc": {"token_version": 1}},
+        projection={"token_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if user:
+        revocation_list.revoke(user["_id"], user["token_version"])
+    invalidate_user(current_user.id)
@@ -1,42 +1,217 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 from datetime import datetime, date
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from app.core.deps import get_current_user
+from app.api.conditional import check_collection_etag
+from app.api.fields import resolve_projection
+from app.api.pagination import fetch_page, page_size
+from app.api.responses import ResponseSerializer
+from app.core.config import settings
+from app.core.deps import get_current_identity
 from app.core.db import get_collection
-from app.schemas.user import UserInDB
-from app.schemas.daily_card import DailyCard, DailyCardCreate, DailyCardUpdate, AccomplishmentCreate, Accomplishment
+from app.schemas.user import CurrentUser
+from app.services.changes import record_change
+from app.services.productivity import update_card_rollups
+from app.services.sync import SYNC_FIELD, new_sync_stamp, stamp_update
+from app.schemas.daily_card import (
+    CardTaskBase,
+    DailyCard,
+    DailyCardCreate,
+    DailyCardPage,
+    DailyCardSummaryList,
+    DailyCardUpdate,
+    AccomplishmentCreate,
+    Accomplishment,
+    DAILY_CARD_FIELDS,
+    DAILY_CARD_VIEWS,
+    card_date,
+)
 
 router = APIRouter()
 
-@router.get("", response_model=List[DailyCard])
+# 卡片列表按日期倒序，(user_id, date) 唯一，日期即可保证排序唯一
+DAILY_CARD_SORT = [("date", -1)]
+
+# 卡片列表的预编译序列化器，与路由的 response_model 设置一致
+daily_card_page_serializer = ResponseSerializer(DailyCardPage, exclude_unset=True)
+
+def _date_range_query(user_id: ObjectId, date_from: Optional[date], date_to: Optional[date]) -> Dict[str, Any]:
+    """构建按日期范围（含两端）查询卡片的条件"""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="起始日期不能晚于结束日期"
+        )
+    
+    query: Dict[str, Any] = {"user_id": user_id}
+    date_range = {}
+    if date_from:
+        date_range["$gte"] = card_date(date_from)
+    if date_to:
+        date_range["$lte"] = card_date(date_to)
+    if date_range:
+        query["date"] = date_range
+    return query
+
+async def _resolve_card_tasks(task_items: List[CardTaskBase], user_id: ObjectId) -> List[Dict[str, Any]]:
+    """
+    校验卡片引用的任务并构建卡片中的任务数据
+    
+    所有任务ID在一次 $in 查询中校验，格式无效的ID在查询之前即被拒绝。
+    
+    Args:
+        task_items: 请求中的卡片任务
+        user_id: 当前用户ID
+    
+    Returns:
+        卡片任务数据列表
+    
+    Raises:
+        HTTPException: 如果任务数量不符、任务ID无效或任务不存在/不属于当前用户
+    """
+    # 验证任务数量
+    if len(task_items) < 1 or len(task_items) > 5:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="每日卡片应包含1-5个任务"
+        )
+    
+    for task_item in task_items:
+        if not ObjectId.is_valid(task_item.task_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的任务ID: {task_item.task_id}"
+            )
+    
+    # 一次查询取回全部引用任务的标题，所有权校验在过滤条件中完成
+    task_ids = {ObjectId(task_item.task_id) for task_item in task_items}
+    cursor = get_collection("tasks").find(
+        {"_id": {"$in": list(task_ids)}, "user_id": user_id},
+        {"title": 1}
+    )
+    titles = {task["_id"]: task["title"] async for task in cursor}
+    
+    missing = task_ids - titles.keys()
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"任务 {', '.join(sorted(map(str, missing)))} 不存在或不属于当前用户"
+        )
+    
+    return [
+        {
+            "task_id": ObjectId(task_item.task_id),
+            "title": task_item.title or titles[ObjectId(task_item.task_id)],
+            "is_completed": task_item.is_completed
+        }
+        for task_item in task_items
+    ]
+
+@router.get("", response_model=DailyCardPage, response_model_exclude_unset=True)
 async def read_daily_cards(
-    current_user: UserInDB = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    view: str = "full",
+    fields: str = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     获取当前用户的所有每日卡片
+    
+    通过 from/to（含两端）限定日期范围，通过 view（compact/full）或逗号分隔的 fields 参数选择返回字段。
+    结果按日期倒序分页，将响应中的 next_cursor 作为 cursor 参数获取下一页。
+    响应带有ETag，携带匹配的 If-None-Match 时直接返回304，不执行查询。
     """
+    not_modified = await check_collection_etag(request, response, ObjectId(current_user.id), "daily_cards")
+    if not_modified:
+        return not_modified
+    
     card_collection = get_collection("daily_cards")
+    projection = resolve_projection(view, fields, DAILY_CARD_VIEWS, DAILY_CARD_FIELDS)
     
     # 查询卡片
-    cards = await card_collection.find({
-        "user_id": ObjectId(current_user.id)
-    }).sort("date", -1).to_list(length=30)  # 最近30张卡片
+    page = await fetch_page(
+        card_collection,
+        _date_range_query(ObjectId(current_user.id), date_from, date_to),
+        DAILY_CARD_SORT,
+        page_size(limit),
+        cursor,
+        projection
+    )
+    return daily_card_page_serializer.response(page, response)
+
+@router.get("/summary", response_model=DailyCardSummaryList)
+async def read_daily_card_summary(
+    request: Request,
+    response: Response,
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    获取日期范围内（含两端）每天的卡片统计摘要，按日期升序
+    
+    每张卡片只返回任务数、已完成任务数和成就数，由聚合管道在服务端计算，
+    一次查询即可得到全年的热力图数据。
+    """
+    if (date_to - date_from).days >= settings.DAILY_CARD_SUMMARY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"日期范围不能超过 {settings.DAILY_CARD_SUMMARY_MAX_DAYS} 天"
+        )
+    
+    not_modified = await check_collection_etag(request, response, ObjectId(current_user.id), "daily_cards")
+    if not_modified:
+        return not_modified
+    
+    card_collection = get_collection("daily_cards")
     
-    return cards
+    pipeline = [
+        {"$match": _date_range_query(ObjectId(current_user.id), date_from, date_to)},
+        {"$sort": {"date": 1}},
+        {"$project": {
+            "_id": 0,
+            "date": 1,
+            "task_count": {"$size": {"$ifNull": ["$tasks", []]}},
+            "completed_count": {"$size": {"$filter": {
+                "input": {"$ifNull": ["$tasks", []]},
+                "cond": {"$eq": ["$$this.is_completed", True]}
+            }}},
+            "accomplishment_count": {"$size": {"$ifNull": ["$accomplishments", []]}}
+        }},
+    ]
+    items = await card_collection.aggregate(pipeline).to_list(length=None)
+    
+    return {"items": items}
 
 @router.get("/today", response_model=DailyCard)
 async def read_today_card(
-    current_user: UserInDB = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     获取今天的卡片
+    
+    ETag 由卡片集合版本号和日期生成，跨天后自动失效。
     """
     card_collection = get_collection("daily_cards")
     
     # 获取今天的日期
-    today = datetime.utcnow().date()
+    today = card_date(datetime.utcnow().date())
+    
+    not_modified = await check_collection_etag(
+        request, response, ObjectId(current_user.id), "daily_cards", today
+    )
+    if not_modified:
+        return not_modified
     
     # 查询今天的卡片
     card = await card_collection.find_one({
@@ -52,132 +227,126 @@ async def read_today_card(
     
     return card
 
-@router.post("", response_model=DailyCard, status_code=status.HTTP_201_CREATED)
-async def create_daily_card(
-    card_in: DailyCardCreate,
-    current_user: UserInDB = Depends(get_current_user)
+@router.put("/today", response_model=DailyCard)
+async def get_or_create_today_card(
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
-    创建新的每日卡片
+    获取今天的卡片，不存在时创建一张空卡片
+    
+    获取或创建由一次 upsert 完成：卡片已存在时原样返回，(user_id, date) 唯一索引保证并发请求只创建一张。
+    新建的卡片随后补写同步序号；同步序号必须在写入之前预留，而预留只对新建卡片有意义，
+    因此不在 upsert 之前预留，已有卡片的请求始终只有一次数据库操作。
     """
     card_collection = get_collection("daily_cards")
-    task_collection = get_collection("tasks")
-    
-    # 设置日期，如果未提供则使用今天的日期
-    card_date = card_in.date or datetime.utcnow().date()
     
-    # 检查该日期是否已存在卡片
-    existing_card = await card_collection.find_one({
+    now = datetime.utcnow()
+    query = {
         "user_id": ObjectId(current_user.id),
-        "date": card_date
-    })
+        "date": card_date(now.date())
+    }
     
-    if existing_card:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"该日期 ({card_date}) 的卡片已存在"
+    try:
+        card = await card_collection.find_one_and_update(
+            query,
+            {"$setOnInsert": {"tasks": [], "accomplishments": [], "created_at": now, "updated_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
+    except DuplicateKeyError:
+        # 并发 upsert 竞争失败的一方直接读取已创建的卡片
+        return await card_collection.find_one(query)
     
-    # 验证任务数量
-    if len(card_in.tasks) < 1 or len(card_in.tasks) > 5:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="每日卡片应包含1-5个任务"
+    if SYNC_FIELD not in card:
+        # 只有尚未写入同步序号的卡片（本次新建的卡片）才补写，并发补写时只有一次生效
+        stamp = await new_sync_stamp(query["user_id"])
+        result = await card_collection.update_one(
+            {"_id": card["_id"], SYNC_FIELD: {"$exists": False}},
+            stamp_update({}, stamp)
         )
+        if result.modified_count:
+            await record_change(card["user_id"], "daily_cards")
+    
+    return card
+
+@router.post("", response_model=DailyCard, status_code=status.HTTP_201_CREATED)
+async def create_daily_card(
+    card_in: DailyCardCreate,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    创建新的每日卡片
+    """
+    card_collection = get_collection("daily_cards")
+    
+    # 设置日期，如果未提供则使用今天的日期
+    day = card_in.date or datetime.utcnow().date()
     
     # 验证任务是否存在并属于当前用户
-    tasks_data = []
-    for task_item in card_in.tasks:
-        task = await task_collection.find_one({
-            "_id": ObjectId(task_item.task_id),
-            "user_id": ObjectId(current_user.id)
-        })
-        
-        if not task:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"任务 {task_item.task_id} 不存在或不属于当前用户"
-            )
-        
-        tasks_data.append({
-            "task_id": ObjectId(task_item.task_id),
-            "title": task_item.title or task["title"],
-            "is_completed": task_item.is_completed
-        })
+    tasks_data = await _resolve_card_tasks(card_in.tasks, ObjectId(current_user.id))
     
     # 准备卡片数据
     now = datetime.utcnow()
     card_data = {
         "user_id": ObjectId(current_user.id),
-        "date": card_date,
+        "date": card_date(day),
         "tasks": tasks_data,
         "accomplishments": [],
         "created_at": now,
-        "updated_at": now
+        "updated_at": now,
+        SYNC_FIELD: await new_sync_stamp(ObjectId(current_user.id))
     }
     
-    # 插入卡片
-    result = await card_collection.insert_one(card_data)
+    # 插入卡片，(user_id, date) 唯一索引保证同一日期只有一张卡片
+    # insert_one 会把生成的 _id 写回 card_data
+    try:
+        await card_collection.insert_one(card_data)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"该日期 ({day}) 的卡片已存在"
+        )
     
-    # 获取新创建的卡片
-    new_card = await card_collection.find_one({"_id": result.inserted_id})
+    await update_card_rollups(card_data["user_id"], added=[card_data])
+    await record_change(card_data["user_id"], "daily_cards")
     
-    return new_card
+    return card_data
 
 @router.put("/{card_id}", response_model=DailyCard)
 async def update_daily_card(
     card_id: str,
     card_in: DailyCardUpdate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     更新每日卡片
     """
     card_collection = get_collection("daily_cards")
     
-    # 查询卡片
-    card = await card_collection.find_one({
-        "_id": ObjectId(card_id),
-        "user_id": ObjectId(current_user.id)
-    })
-    
-    if not card:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="卡片不存在"
-        )
-    
     # 准备更新数据
     update_data = {}
     if card_in.tasks is not None:
-        # 验证任务数量
-        if len(card_in.tasks) < 1 or len(card_in.tasks) > 5:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="每日卡片应包含1-5个任务"
-            )
-        
-        # 转换任务数据
-        tasks_data = []
-        for task_item in card_in.tasks:
-            tasks_data.append({
-                "task_id": ObjectId(task_item.task_id),
-                "title": task_item.title,
-                "is_completed": task_item.is_completed
-            })
-        
-        update_data["tasks"] = tasks_data
+        # 验证任务是否存在并属于当前用户
+        update_data["tasks"] = await _resolve_card_tasks(card_in.tasks, ObjectId(current_user.id))
     
     update_data["updated_at"] = datetime.utcnow()
     
-    # 更新卡片
-    await card_collection.update_one(
-        {"_id": ObjectId(card_id)},
-        {"$set": update_data}
+    # 更新卡片，所有权校验在过滤条件中完成；取回更新前的文档以维护生产力统计
+    card = await card_collection.find_one_and_update(
+        {"_id": ObjectId(card_id), "user_id": ObjectId(current_user.id)},
+        stamp_update({"$set": update_data}, await new_sync_stamp(ObjectId(current_user.id))),
+        return_document=ReturnDocument.BEFORE
     )
     
-    # 获取更新后的卡片
-    updated_card = await card_collection.find_one({"_id": ObjectId(card_id)})
+    if not card:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="卡片不存在"
+        )
+    
+    updated_card = {**card, **update_data}
+    await update_card_rollups(card["user_id"], removed=[card], added=[updated_card])
+    await record_change(card["user_id"], "daily_cards")
     
     return updated_card
 
@@ -185,37 +354,38 @@ async def update_daily_card(
 async def add_accomplishment(
     card_id: str,
     accomplishment_in: AccomplishmentCreate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     添加成就到每日卡片
     """
     card_collection = get_collection("daily_cards")
     
-    # 查询卡片
-    card = await card_collection.find_one({
-        "_id": ObjectId(card_id),
-        "user_id": ObjectId(current_user.id)
-    })
-    
-    if not card:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="卡片不存在"
-        )
-    
     # 准备成就数据
     accomplishment_data = accomplishment_in.dict()
     if accomplishment_data.get("task_id"):
         accomplishment_data["task_id"] = ObjectId(accomplishment_data["task_id"])
     
-    # 更新卡片
-    await card_collection.update_one(
-        {"_id": ObjectId(card_id)},
-        {
+    # 更新卡片，所有权校验在过滤条件中完成；只取回卡片日期用于生产力统计
+    card = await card_collection.find_one_and_update(
+        {"_id": ObjectId(card_id), "user_id": ObjectId(current_user.id)},
+        stamp_update({
             "$push": {"accomplishments": accomplishment_data},
             "$set": {"updated_at": datetime.utcnow()}
-        }
+        }, await new_sync_stamp(ObjectId(current_user.id))),
+        projection={"date": 1}
+    )
+    
+    if not card:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="卡片不存在"
+        )
+    
+    await update_card_rollups(
+        ObjectId(current_user.id),
+        added=[{"date": card["date"], "accomplishments": [accomplishment_data]}]
     )
+    await record_change(ObjectId(current_user.id), "daily_cards")
     
     return accomplishment_data
@@ -0,0 +1,158 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from bson import ObjectId
+
+from app.api.conditional import check_etag, make_etag
+from app.api.pagination import SortKeys, encode_cursor, page_size
+from app.api.responses import ResponseSerializer
+from app.api.routes.tasks import TASK_RANK_SORT, TASK_SORT, VALID_LIST_TYPES
+from app.core.deps import get_current_identity
+from app.core.db import get_collection
+from app.schemas.dashboard import Dashboard
+from app.schemas.daily_card import card_date
+from app.schemas.user import CurrentUser
+from app.services.changes import VERSION_COLLECTION
+
+router = APIRouter()
+
+# 首页数据的预编译序列化器
+dashboard_serializer = ResponseSerializer(Dashboard)
+
+# 列表计数聚合使用的覆盖索引
+_COUNTS_INDEX = "user_id_list_type_is_completed"
+
+async def _read_user(user_id: ObjectId, today: datetime) -> Optional[Dict[str, Any]]:
+    """
+    一次聚合读取用户信息、今日卡片和各集合的版本号
+    
+    以用户文档为起点，今日卡片和版本号通过不相关的 $lookup 子管道读取，
+    子管道中的等值条件分别命中 (user_id, date) 唯一索引和版本文档的 _id。
+    
+    Returns:
+        包含 email、username、today_card 和 versions 的用户文档，用户不存在时为None
+    """
+    rows = await get_collection("users").aggregate([
+        {"$match": {"_id": user_id}},
+        {"$project": {"email": 1, "username": 1}},
+        {"$lookup": {
+            "from": "daily_cards",
+            "pipeline": [{"$match": {"user_id": user_id, "date": today}}],
+            "as": "today_card"
+        }},
+        {"$lookup": {
+            "from": VERSION_COLLECTION,
+            "pipeline": [{"$match": {"_id": user_id}}, {"$project": {"_id": 0}}],
+            "as": "versions"
+        }},
+    ]).to_list(length=1)
+    if not rows:
+        return None
+    
+    user = rows[0]
+    user["today_card"] = user["today_card"][0] if user["today_card"] else None
+    user["versions"] = user["versions"][0] if user["versions"] else {}
+    return user
+
+async def _read_lists(user_id: ObjectId, sort_keys: SortKeys, limit: int) -> Dict[str, Dict[str, Any]]:
+    """
+    一次聚合读取三个列表的前 limit 个任务及各列表的计数
+    
+    主管道按列表分组计数，只用到 list_type 和 is_completed，由复合索引覆盖；
+    每个列表通过 $unionWith 子管道按 (user_id, list_type, 排序键) 索引范围扫描，
+    只读取 limit+1 个任务，与单独请求 /tasks 的第一页一致。
+    计数行的 _id 是 {"list_type": ...} 文档，任务的 _id 是ObjectId，以此区分两类结果。
+    """
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": {"list_type": "$list_type"},
+            "total": {"$sum": 1},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$is_completed", True]}, 1, 0]}}
+        }},
+    ]
+    for list_type in VALID_LIST_TYPES:
+        pipeline.append({"$unionWith": {"coll": "tasks", "pipeline": [
+            {"$match": {"user_id": user_id, "list_type": list_type}},
+            {"$sort": dict(sort_keys)},
+            {"$limit": limit + 1},
+        ]}})
+    rows = await get_collection("tasks").aggregate(pipeline, hint=_COUNTS_INDEX).to_list(length=None)
+    
+    counts: Dict[str, Dict[str, Any]] = {}
+    tasks: Dict[str, List[Dict[str, Any]]] = {list_type: [] for list_type in VALID_LIST_TYPES}
+    for row in rows:
+        if isinstance(row["_id"], dict):
+            counts[row["_id"]["list_type"]] = row
+        else:
+            tasks[row["list_type"]].append(row)
+    
+    lists = {}
+    for list_type in VALID_LIST_TYPES:
+        items = tasks[list_type]
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1], sort_keys)
+        lists[list_type] = {
+            "items": items,
+            "total": counts.get(list_type, {}).get("total", 0),
+            "completed": counts.get(list_type, {}).get("completed", 0),
+            "next_cursor": next_cursor,
+        }
+    return lists
+
+@router.get("", response_model=Dashboard)
+async def read_dashboard(
+    request: Request,
+    response: Response,
+    sort: str = "updated",
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    获取首页所需的全部数据
+    
+    一次请求返回当前用户信息、三个列表（每个列表最多 limit 个任务，附带计数和继续分页的游标）
+    以及今天的卡片，代替分别请求三个列表、今日卡片和 /auth/me。
+    共两次查询：一次聚合读取用户信息、今日卡片和版本号（版本号用于ETag），
+    未命中缓存时再用一次聚合读取三个列表及其计数。
+    sort 与 /tasks 相同（updated/rank），next_cursor 可配合 list_type 和 sort 参数继续读取 /tasks。
+    """
+    if sort not in ("updated", "rank"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的排序方式。有效值: updated, rank"
+        )
+    
+    user_id = ObjectId(current_user.id)
+    today = card_date(datetime.utcnow().date())
+    
+    user = await _read_user(user_id, today)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="用户不存在"
+        )
+    
+    versions = user.pop("versions")
+    today_card = user.pop("today_card")
+    etag = make_etag(
+        request,
+        current_user.id,
+        current_user.username,
+        versions.get("tasks", 0),
+        versions.get("daily_cards", 0),
+        today
+    )
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    lists = await _read_lists(user_id, TASK_RANK_SORT if sort == "rank" else TASK_SORT, page_size(limit))
+    
+    return dashboard_serializer.response({
+        "user": user,
+        "lists": lists,
+        "today_card": today_card,
+    }, response)
@@ -0,0 +1,365 @@
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Type
+from datetime import datetime
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+from bson.json_util import RELAXED_JSON_OPTIONS
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+from app.api.routes.tasks import VALID_LIST_TYPES
+from app.core.config import settings
+from app.core.deps import get_current_identity
+from app.core.db import get_collection
+from app.schemas.user import CurrentUser
+from app.schemas.task import TaskImport
+from app.schemas.daily_card import DailyCardImport, card_date
+from app.services.archive import ARCHIVE_COLLECTION
+from app.services.changes import record_change
+from app.services.productivity import update_card_rollups, update_task_rollups
+from app.services.ranking import new_rank, schedule_rebalance
+from app.services.sync import SYNC_COLLECTIONS, SYNC_FIELD, reserve_sync_stamps
+from app.services.tags import update_tag_counts
+
+router = APIRouter()
+
+# 导出记录类型 -> (集合名, 导入时校验记录的模型)
+RECORD_TYPES: Dict[str, Tuple[str, Type[BaseModel]]] = {
+    "task": ("tasks", TaskImport),
+    "archived_task": (ARCHIVE_COLLECTION, TaskImport),
+    "daily_card": ("daily_cards", DailyCardImport),
+}
+
+# 导入记录缺少字段时使用的默认值
+_IMPORT_DEFAULTS = {
+    "tasks": {"is_completed": False},
+    ARCHIVE_COLLECTION: {"is_completed": True},
+    "daily_cards": {"tasks": [], "accomplishments": []},
+}
+
+# 导入时每次从上传文件读取的字节数
+_READ_CHUNK_SIZE = 64 * 1024
+
+async def _export_lines(user_id: ObjectId) -> AsyncIterator[str]:
+    """按批次逐条读取用户数据并生成NDJSON文本块"""
+    for record_type, (collection_name, _) in RECORD_TYPES.items():
+        cursor = get_collection(collection_name).find(
+            {"user_id": user_id},
+            {"user_id": 0, SYNC_FIELD: 0},
+            batch_size=settings.EXPORT_BATCH_SIZE
+        )
+    
+        lines = []
+        async for doc in cursor:
+            lines.append(json_util.dumps({"type": record_type, "data": doc}, json_options=RELAXED_JSON_OPTIONS))
+            if len(lines) >= settings.EXPORT_BATCH_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+    
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+@router.get("/export")
+async def export_data(
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    以NDJSON流导出当前用户的全部任务和每日卡片
+    
+    每行是一条 {"type": ..., "data": ...} 记录，ObjectId 和日期使用MongoDB扩展JSON表示。
+    数据边读边写，内存占用与数据量无关。
+    """
+    return StreamingResponse(
+        _export_lines(ObjectId(current_user.id)),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="flowmaster-export.ndjson"'}
+    )
+
+def _invalid_record(line_number: int, fields: Optional[List[str]] = None) -> HTTPException:
+    detail = f"第 {line_number} 行不是有效的导出记录"
+    if fields:
+        detail += f"，无效字段: {', '.join(fields)}"
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+def _import_document(collection_name: str, model: Type[BaseModel], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    按记录类型的模型校验导入数据，构建待写入的文档（不含 user_id）
+    
+    只保留模型中的字段，写入的文档与路由创建的文档类型一致，导入后的数据可以正常读取。
+    
+    Raises:
+        ValidationError: 如果字段缺失或类型无效
+        ValueError: 如果列表类型或ID无效
+    """
+    doc = model(**data).dict(exclude_unset=True)
+    if collection_name == "daily_cards":
+        doc["date"] = card_date(doc["date"])
+        for task in doc.get("tasks", []):
+            if not ObjectId.is_valid(task["task_id"]):
+                raise ValueError("tasks.task_id")
+            task["task_id"] = ObjectId(task["task_id"])
+    elif doc["list_type"] not in VALID_LIST_TYPES:
+        raise ValueError("list_type")
+    
+    if "_id" in data:
+        if not isinstance(data["_id"], ObjectId):
+            raise ValueError("_id")
+        doc["_id"] = data["_id"]
+    
+    for field, value in _IMPORT_DEFAULTS[collection_name].items():
+        doc.setdefault(field, value)
+    now = datetime.utcnow()
+    for field in ("created_at", "updated_at"):
+        if doc.get(field) is None:
+            doc[field] = now
+    return doc
+
+async def _read_lines(file: UploadFile) -> AsyncIterator[bytes]:
+    """分块读取上传文件并逐行产出"""
+    remainder = b""
+    while True:
+        chunk = await file.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line
+    if remainder:
+        yield remainder
+
+async def _insert(collection_name: str, docs: List[Dict[str, Any]]) -> Set[int]:
+    """以无序批量插入写入文档，返回因唯一键重复未能写入的文档下标"""
+    if not docs:
+        return set()
+    try:
+        await get_collection(collection_name).insert_many(docs, ordered=False)
+        return set()
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        return {error["index"] for error in errors}
+
+async def _flush(
+    user_id: ObjectId,
+    collection_name: str,
+    docs: List[Dict[str, Any]],
+    result: Dict[str, int],
+    id_map: Dict[ObjectId, ObjectId]
+) -> List[Dict[str, Any]]:
+    """
+    写入一批文档，返回实际写入的文档
+    
+    文档保留导出文件中的 _id。_id 已属于当前用户的文档（重复导入同一文件）计为跳过；
+    属于其他用户时（如将一个账户的导出导入同一服务器上的新账户）改用新的 _id 写入，
+    新旧ID记入 id_map，供引用这些任务的每日卡片替换。
+    """
+    duplicates = await _insert(collection_name, docs)
+    
+    reassigned = []
+    if duplicates:
+        ids = [docs[index]["_id"] for index in duplicates]
+        cursor = get_collection(collection_name).find({"_id": {"$in": ids}, "user_id": user_id}, {"_id": 1})
+        owned = {doc["_id"] async for doc in cursor}
+        for index in sorted(duplicates):
+            doc = docs[index]
+            if doc["_id"] not in owned:
+                new_id = ObjectId()
+                id_map[doc["_id"]] = new_id
+                doc["_id"] = new_id
+                reassigned.append(index)
+    
+    # 改用新 _id 后仍然重复的（如同一天已有卡片）同样计为跳过
+    failed = {reassigned[i] for i in await _insert(collection_name, [docs[index] for index in reassigned])}
+    skipped = (duplicates - set(reassigned)) | failed
+    
+    result["inserted"] += len(docs) - len(skipped)
+    result["skipped"] += len(skipped)
+    result["reassigned"] += len(reassigned) - len(failed)
+    return [doc for index, doc in enumerate(docs) if index not in skipped]
+
+async def _bottom_rank(user_id: ObjectId, list_type: Optional[str]) -> Optional[str]:
+    """获取列表中排在最后面的任务的排序键"""
+    task = await get_collection("tasks").find_one(
+        {"user_id": user_id, "list_type": list_type, "rank": {"$type": "string"}},
+        {"rank": 1},
+        sort=[("rank", -1), ("_id", -1)]
+    )
+    return task["rank"] if task else None
+
+async def _assign_ranks(user_id: ObjectId, docs: List[Dict[str, Any]]) -> None:
+    """
+    为导入的任务重新分配排序键，依次排在所在列表的末尾
+    
+    导出文件中的排序键来自另一份数据，与当前列表中的键可能交错或相同，
+    因此只用来确定同一批导入任务之间的先后顺序；没有排序键的任务排在前面。
+    """
+    by_list: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for doc in docs:
+        by_list.setdefault(doc.get("list_type"), []).append(doc)
+    
+    for list_type, list_docs in by_list.items():
+        list_docs.sort(key=lambda doc: doc.get("rank") or "")
+        rank = await _bottom_rank(user_id, list_type)
+        for doc in list_docs:
+            rank = doc["rank"] = new_rank(rank, None)
+        schedule_rebalance(user_id, list_type, rank)
+
+def _remap_card_tasks(doc: Dict[str, Any], id_map: Dict[ObjectId, ObjectId]) -> None:
+    """将卡片引用的任务ID替换为导入时重新分配的ID"""
+    for task in doc.get("tasks", []):
+        task["task_id"] = id_map.get(task["task_id"], task["task_id"])
+    for accomplishment in doc.get("accomplishments", []):
+        task_id = accomplishment.get("task_id")
+        if task_id and ObjectId.is_valid(task_id) and ObjectId(task_id) in id_map:
+            accomplishment["task_id"] = str(id_map[ObjectId(task_id)])
+
+async def _flush_batch(
+    user_id: ObjectId,
+    collection_name: str,
+    docs: List[Dict[str, Any]],
+    result: Dict[str, int],
+    id_map: Dict[ObjectId, ObjectId]
+) -> None:
+    """为一批文档预留同步序号后写入，并为新写入的文档维护标签计数和生产力统计"""
+    if collection_name in SYNC_COLLECTIONS:
+        first_stamp = await reserve_sync_stamps(user_id, len(docs))
+        for i, doc in enumerate(docs):
+            doc[SYNC_FIELD] = first_stamp + i
+    if collection_name == "tasks":
+        await _assign_ranks(user_id, docs)
+    elif collection_name == "daily_cards":
+        for doc in docs:
+            _remap_card_tasks(doc, id_map)
+    inserted = await _flush(user_id, collection_name, docs, result, id_map)
+    if collection_name == "tasks":
+        await update_tag_counts(user_id, added=inserted)
+    if collection_name in ("tasks", ARCHIVE_COLLECTION):
+        await update_task_rollups(user_id, added=inserted)
+    elif collection_name == "daily_cards":
+        await update_card_rollups(user_id, added=inserted)
+
+@router.post("/import")
+async def import_data(
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    导入由 /export 生成的NDJSON文件
+    
+    文件被增量解析，每条记录按其类型的模型校验，每满 IMPORT_BATCH_SIZE 条即以 insert_many(ordered=False) 写入。
+    记录无效时返回400并指出行号，此前各批已写入的记录保留。
+    记录保留原有 _id，重复导入同一文件时已存在的记录会被跳过；_id 已被其他用户的记录占用时
+    改用新的 _id，计入 reassigned。
+    导入的任务重新分配排序键，排在所在列表的末尾。
+    """
+    user_id = ObjectId(current_user.id)
+    batches: Dict[str, List[Dict[str, Any]]] = {name: [] for name, _ in RECORD_TYPES.values()}
+    results = {name: {"inserted": 0, "skipped": 0, "reassigned": 0} for name in batches}
+    # 导出文件中的ID -> 重新分配的ID
+    id_map: Dict[ObjectId, ObjectId] = {}
+    
+    line_number = 0
+    async for line in _read_lines(file):
+        line_number += 1
+        if not line.strip():
+            continue
+    
+        try:
+            record = json_util.loads(line)
+            collection_name, model = RECORD_TYPES[record["type"]]
+            data = record["data"]
+        except (ValueError, LookupError, TypeError, BSONError):
+            raise _invalid_record(line_number)
+        if not isinstance(data, dict):
+            raise _invalid_record(line_number, ["data"])
+    
+        try:
+            doc = _import_document(collection_name, model, data)
+        except ValidationError as exc:
+            raise _invalid_record(line_number, [".".join(map(str, error["loc"])) for error in exc.errors()])
+        except ValueError as exc:
+            raise _invalid_record(line_number, [str(exc)])
+        doc["user_id"] = user_id
+    
+        batch = batches[collection_name]
+        batch.append(doc)
+        if len(batch) >= settings.IMPORT_BATCH_SIZE:
+            # 卡片引用的任务可能在写入时被重新分配ID，写入卡片之前先写入已读取的任务
+            names = list(batches) if collection_name == "daily_cards" else [collection_name]
+            for name in names:
+                if batches[name]:
+                    await _flush_batch(user_id, name, batches[name], results[name], id_map)
+                    batches[name].clear()
+    
+    for collection_name, batch in batches.items():
+        if batch:
+            await _flush_batch(user_id, collection_name, batch, results[collection_name], id_map)
+    
+    # 归档任务通过 include_archived 与任务列表一起读取，其变更计入任务集合的版本
+    changed = {
+        "tasks" if name == ARCHIVE_COLLECTION else name
+        for name, result in results.items() if result["inserted"]
+    }
+    await record_change(user_id, *changed)
+    
+    return results
+
+async def _main(task_count: int, port: int) -> int:
+    from app.core.benchmark import app_server, benchmark_client, insert_tasks, process_memory_kib, register_user
+    
+    # 导出和导入由独立的 uvicorn 工作进程处理，统计该进程的常驻内存峰值
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        started = time.perf_counter()
+        await insert_tasks(user_id, task_count)
+        print(f"Generated {task_count} tasks in {time.perf_counter() - started:.1f} s")
+    
+        async with app_server(port) as (server, http):
+            print(f"Worker RSS before exporting: {process_memory_kib(server.pid) / 1024:.1f} MiB")
+            with tempfile.TemporaryFile() as export_file:
+                records = 0
+                started = time.perf_counter()
+                async with http.stream("GET", "/api/export", headers=headers) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        export_file.write(chunk)
+                        records += chunk.count(b"\n")
+                elapsed = time.perf_counter() - started
+                size = export_file.tell()
+                print(
+                    f"Exported {records} records ({size / 2 ** 20:.1f} MiB) in {elapsed:.1f} s: {records / elapsed:.0f} records/s, "
+                    f"peak worker RSS {process_memory_kib(server.pid, 'VmHWM') / 1024:.1f} MiB"
+                )
+    
+                # 先删除账户的任务再导入，导入的记录保留原有 _id，与迁移到新服务器时相同
+                await get_collection("tasks").delete_many({"user_id": user_id})
+                export_file.seek(0)
+                started = time.perf_counter()
+                response = await http.post(
+                    "/api/import",
+                    files={"file": ("export.ndjson", export_file, "application/x-ndjson")},
+                    headers=headers
+                )
+                elapsed = time.perf_counter() - started
+                response.raise_for_status()
+                imported = response.json()["tasks"]["inserted"]
+                print(
+                    f"Imported {imported} tasks in {elapsed:.1f} s: {imported / elapsed:.0f} tasks/s, "
+                    f"peak worker RSS {process_memory_kib(server.pid, 'VmHWM') / 1024:.1f} MiB"
+                )
+    return 0 if imported == task_count else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="导出并重新导入一个大账户，测量吞吐量和工作进程的内存峰值（使用临时数据库）")
+    parser.add_argument("--tasks", type=int, default=1000000, help="生成的任务数")
+    parser.add_argument("--port", type=int, default=8765, help="被测工作进程监听的端口")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.tasks, args.port)))
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from contextlib import AsyncExitStack
+from datetime import timedelta
+from typing import Any, AsyncIterator
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from app.core.broker import event_broker
+from app.core.config import settings
+from app.core.deps import EVENTS_SCOPE, get_current_identity, get_stream_identity
+from app.core.security import create_access_token
+from app.schemas.token import Token
+from app.schemas.user import CurrentUser
+
+router = APIRouter()
+
+async def _event_lines(user_id: str) -> AsyncIterator[str]:
+    """
+    订阅用户的事件并编码为SSE消息，空闲时发送心跳注释
+    
+    订阅在响应开始发送时才创建，并总在生成器结束时移除：
+    响应未能开始（如客户端在此之前断开）时不会留下无人消费的订阅。
+    """
+    subscription = event_broker.subscribe(user_id)
+    try:
+        # 断线后客户端按 retry 间隔重连
+        yield f"retry: {int(settings.EVENTS_RETRY_SECONDS * 1000)}\n\n"
+        while True:
+            try:
+                event = await subscription.get(settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        event_broker.unsubscribe(subscription)
+
+@router.post("/token", response_model=Token)
+async def create_stream_token(
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    签发短期事件流令牌
+    
+    EventSource 不能设置 Authorization 请求头，客户端先用访问令牌换取事件流令牌，
+    再以 /events/stream?token=... 建立连接。令牌只能用于事件流，有效期为 EVENTS_TOKEN_SECONDS，
+    同样携带令牌版本号，吊销访问令牌后不能再用它建立连接。
+    """
+    claims = {"ver": current_user.token_version, "scope": EVENTS_SCOPE}
+    if settings.STATELESS_TOKENS:
+        claims["username"] = current_user.username
+    token = create_access_token(
+        subject=current_user.id,
+        expires_delta=timedelta(seconds=settings.EVENTS_TOKEN_SECONDS),
+        claims=claims
+    )
+    
+    return {
+        "access_token": token,
+        "token_type": "bearer"
+    }
+
+@router.get("/stream")
+async def stream_events(
+    current_user: CurrentUser = Depends(get_stream_identity)
+) -> Any:
+    """
+    以Server-Sent Events推送当前用户的数据变更通知
+    
+    每条 change 事件只包含集合名和新版本号，客户端据此调用 /sync 增量同步。
+    客户端消费过慢时积压的事件被丢弃并替换为一条 resync 事件。
+    令牌可以放在 Authorization 请求头中，或以 token 查询参数传递事件流令牌（见 /events/token）。
+    """
+    return StreamingResponse(
+        _event_lines(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _main(connections: int, batch_size: int, port: int, hold: float) -> int:
+    from app.core.benchmark import app_server, benchmark_client, process_memory_kib, register_user
+    
+    # 连接由独立的 uvicorn 工作进程处理，只统计该进程的内存；令牌和数据库与本进程共用
+    async with benchmark_client() as client:
+        headers, _ = await register_user(client)
+        async with app_server(port) as (server, http):
+            baseline = process_memory_kib(server.pid)
+            print(f"Worker RSS before connecting: {baseline / 1024:.1f} MiB")
+            
+            # 保留每个连接的读取迭代器：迭代器被回收时会关闭所在的连接
+            readers = []
+
+            async def open_stream(stack: AsyncExitStack, token: str) -> None:
+                response = await stack.enter_async_context(
+                    http.stream("GET", "/api/events/stream", params={"token": token})
+                )
+                response.raise_for_status()
+                # 读到第一条消息时服务端的订阅已经建立
+                reader = response.aiter_raw()
+                await reader.__anext__()
+                readers.append(reader)
+            
+            async with AsyncExitStack() as stack:
+                started = time.perf_counter()
+                for opened in range(0, connections, batch_size):
+                    # 事件流令牌有效期很短，每批换取一个新令牌
+                    token = (await client.post("/api/events/token", headers=headers)).json()["access_token"]
+                    count = min(batch_size, connections - opened)
+                    await asyncio.gather(*(open_stream(stack, token) for _ in range(count)))
+                print(f"Opened {connections} streams in {time.perf_counter() - started:.1f} s")
+                
+                await asyncio.sleep(hold)
+                rss = process_memory_kib(server.pid)
+                events = (await http.get("/metrics")).json()["events"]
+                print(
+                    f"Worker RSS with {events['connections']} idle streams: {rss / 1024:.1f} MiB, "
+                    f"{(rss - baseline) / connections:.1f} KiB per connection"
+                )
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="测量一个工作进程保持大量空闲事件流连接的内存开销（使用临时数据库）")
+    parser.add_argument("--connections", type=int, default=2000, help="事件流连接数")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批同时建立的连接数")
+    parser.add_argument("--port", type=int, default=8765, help="被测工作进程监听的端口")
+    parser.add_argument("--hold", type=float, default=0.0, help="全部连接建立后保持的秒数（超过心跳间隔时包含心跳的开销）")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.connections, args.batch_size, args.port, args.hold)))
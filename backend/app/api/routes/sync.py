@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status
+from bson import ObjectId, Timestamp
+
+from app.api.pagination import decode_cursor, encode_cursor
+from app.api.responses import ResponseSerializer
+from app.core.config import settings
+from app.core.deps import get_current_identity
+from app.core.db import get_collection
+from app.schemas.user import CurrentUser
+from app.schemas.sync import SyncResponse
+from app.services.sync import SYNC_COLLECTIONS, SYNC_FIELD, TOMBSTONE_COLLECTION, settled_sync_stamp
+
+router = APIRouter()
+
+# 变更按同步序号升序下发，同一用户的同步序号唯一
+SYNC_SORT = [(SYNC_FIELD, 1)]
+
+# 同步令牌：(已下发到的同步序号, 令牌签发时间)
+SYNC_TOKEN_KEYS = [(SYNC_FIELD, 1), ("issued_at", 1)]
+
+# 同步响应的预编译序列化器，全量同步时一次返回大量文档
+sync_serializer = ResponseSerializer(SyncResponse)
+
+def _stamp(doc: Dict[str, Any]) -> int:
+    """文档的同步序号，尚未补写同步序号的历史文档视为0"""
+    stamp = doc.get(SYNC_FIELD)
+    return stamp if isinstance(stamp, int) else 0
+
+def _decode_token(token: str) -> Tuple[int, datetime]:
+    """解析同步令牌，并检查其是否仍在删除记录的保留期内"""
+    try:
+        stamp, issued_at = decode_cursor(token, SYNC_TOKEN_KEYS)
+    except HTTPException:
+        # 旧版本以BSON时间戳作为同步序号，其令牌无法换算为新的序号
+        try:
+            (legacy,) = decode_cursor(token, SYNC_SORT)
+        except HTTPException:
+            legacy = None
+        if isinstance(legacy, Timestamp):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="同步令牌已过期，请重新全量同步"
+            )
+        stamp = issued_at = None
+    if not isinstance(stamp, int) or isinstance(stamp, bool) or stamp < 0 or not isinstance(issued_at, datetime):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的同步令牌"
+        )
+    
+    # 早于保留期的删除记录可能已被清理，增量结果不再完整
+    if issued_at < datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="同步令牌已过期，请重新全量同步"
+        )
+    return stamp, issued_at
+
+@router.get("", response_model=SyncResponse)
+async def sync_changes(
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    增量同步任务和每日卡片
+    
+    返回同步令牌之后新建、更新或删除的任务和每日卡片，按同步序号升序最多返回 limit 条变更。
+    不带 since 时返回全部数据（不含删除记录）。将响应中的 token 作为下次请求的 since；
+    has_more 为 true 时应立即继续请求。令牌早于删除记录保留期时返回410，客户端需全量同步。
+    刚发生的写入可能在下次同步时再次下发，客户端按ID覆盖即可。
+    """
+    user_id = ObjectId(current_user.id)
+    if limit is None:
+        limit = settings.SYNC_PAGE_SIZE_DEFAULT
+    limit = max(1, min(limit, settings.SYNC_PAGE_SIZE_MAX))
+    
+    since_stamp, issued_at = _decode_token(since) if since else (0, None)
+    
+    # 先读取已全部可见的序号，再查询变更：查询到的文档不会早于这一时刻
+    settled = await settled_sync_stamp(user_id)
+    
+    query = {"user_id": user_id}
+    sources = list(SYNC_COLLECTIONS)
+    if since:
+        query[SYNC_FIELD] = {"$gt": since_stamp}
+        sources.append(TOMBSTONE_COLLECTION)
+    
+    # 每个来源各取 limit+1 条，合并后按同步序号取前 limit 条；
+    # 未取到的文档序号都大于同一来源已取到的文档，所以合并结果不会遗漏
+    changes = []
+    for collection in sources:
+        docs = await get_collection(collection).find(query).sort(SYNC_SORT).limit(limit + 1).to_list(length=limit + 1)
+        changes.extend((_stamp(doc), collection, doc) for doc in docs)
+    changes.sort(key=lambda change: change[0])
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    result = {"tasks": [], "daily_cards": [], "deleted": []}
+    for _, collection, doc in changes:
+        if collection == TOMBSTONE_COLLECTION:
+            result["deleted"].append({"collection": doc["collection"], "id": doc["doc_id"]})
+        else:
+            result[collection].append(doc)
+    
+    # 序号在写入前预留，较小的序号可能稍后才可见：令牌不越过已全部可见的序号，
+    # 越过的部分下次同步时会重复下发。令牌没有前进时不再提示继续请求，避免重复取同一页
+    token_stamp = changes[-1][0] if changes else since_stamp
+    if settled is None or token_stamp > settled:
+        token_stamp = max(since_stamp, settled or 0)
+        has_more = has_more and token_stamp > since_stamp
+    
+    # 未取完时保留原令牌的签发时间，剩余的删除记录可能早于本次请求
+    if not (since and has_more):
+        issued_at = datetime.utcnow()
+    result["token"] = encode_cursor({SYNC_FIELD: token_stamp, "issued_at": issued_at}, SYNC_TOKEN_KEYS)
+    result["has_more"] = has_more
+    
+    return sync_serializer.response(result)
@@ -0,0 +1,78 @@
+import re
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from bson import ObjectId
+
+from app.api.routes.tasks import VALID_LIST_TYPES
+from app.core.config import settings
+from app.core.deps import get_current_identity
+from app.core.db import get_collection
+from app.schemas.user import CurrentUser
+from app.schemas.tag import TagFacetList
+from app.services.tags import TAG_COLLECTION, tag_key
+
+router = APIRouter()
+
+def _limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return settings.TAG_RESULT_LIMIT_DEFAULT
+    return max(1, min(limit, settings.TAG_RESULT_LIMIT_MAX))
+
+def _facet(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉计数已减到0的列表，标签从某个列表中移除后只清零而不删除该列表的计数"""
+    doc["counts"] = {list_type: n for list_type, n in doc.get("counts", {}).items() if n > 0}
+    return doc
+
+@router.get("", response_model=TagFacetList)
+async def read_tag_facets(
+    list_type: str = None,
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    获取当前用户的标签统计，按任务数倒序
+    
+    指定 list_type 时只返回该列表中出现的标签，并按该列表中的任务数排序。
+    """
+    tag_collection = get_collection(TAG_COLLECTION)
+    
+    count_field = "total"
+    if list_type:
+        if list_type not in VALID_LIST_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的列表类型。有效类型: {', '.join(VALID_LIST_TYPES)}"
+            )
+        count_field = f"counts.{list_type}"
+    
+    tags = await tag_collection.find(
+        {"user_id": ObjectId(current_user.id), count_field: {"$gt": 0}},
+        {"_id": 0, "tag": 1, "total": 1, "counts": 1}
+    ).sort(count_field, -1).limit(_limit(limit)).to_list(length=None)
+    
+    return {"items": [_facet(tag) for tag in tags]}
+
+@router.get("/autocomplete", response_model=TagFacetList)
+async def autocomplete_tags(
+    prefix: str = "",
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    按前缀补全当前用户的标签，不区分大小写
+    
+    前缀和标签都按小写形式（tag_key）比较，锚定的前缀正则在 (user_id, tag_key) 索引上是一次范围扫描，
+    与标签总数无关。
+    """
+    tag_collection = get_collection(TAG_COLLECTION)
+    
+    tags = await tag_collection.find(
+        {
+            "user_id": ObjectId(current_user.id),
+            "tag_key": {"$regex": f"^{re.escape(tag_key(prefix))}"},
+            "total": {"$gt": 0}
+        },
+        {"_id": 0, "tag": 1, "total": 1, "counts": 1}
+    ).sort("tag_key", 1).limit(_limit(limit)).to_list(length=None)
+    
+    return {"items": [_facet(tag) for tag in tags]}
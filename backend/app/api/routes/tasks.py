@@ -1,24 +1,210 @@
-from typing import Any, List
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
-from app.core.deps import get_current_user
+from app.api.conditional import check_collection_etag
+from app.api.fields import resolve_projection
+from app.api.pagination import fetch_merged_page, fetch_page, page_size
+from app.api.responses import ResponseSerializer
+from app.core.config import settings
+from app.core.deps import get_current_identity
 from app.core.db import get_collection
-from app.schemas.user import UserInDB
-from app.schemas.task import Task, TaskCreate, TaskUpdate
+from app.schemas.user import CurrentUser
+from app.services.archive import ARCHIVE_COLLECTION
+from app.services.changes import record_change
+from app.services.productivity import update_task_rollups
+from app.services.ranking import RANK_SORT, new_rank, rebalance_list, schedule_rebalance
+from app.services.sync import SYNC_FIELD, new_sync_stamp, record_deletions, reserve_sync_stamps, stamp_update
+from app.services.tags import update_tag_counts
+from app.schemas.task import (
+    Task,
+    TaskBatchOperationResult,
+    TaskBatchRequest,
+    TaskBatchResponse,
+    TaskCreate,
+    TaskPage,
+    TaskReorder,
+    TaskSearchPage,
+    TaskUpdate,
+    TASK_FIELDS,
+    TASK_VIEWS,
+)
 
 router = APIRouter()
 
-@router.get("", response_model=List[Task])
+# 任务列表按最近更新排序，_id 保证排序唯一
+TASK_SORT = [("updated_at", -1), ("_id", -1)]
+
+# 手动排序：按排序键升序，排序键相同时（并发插入同一位置）以 _id 区分
+TASK_RANK_SORT = RANK_SORT
+
+# 有效的列表类型
+VALID_LIST_TYPES = ["todo", "watch", "later"]
+
+# 任务列表和搜索结果的预编译序列化器，与路由的 response_model 设置一致
+task_page_serializer = ResponseSerializer(TaskPage, exclude_unset=True)
+task_search_serializer = ResponseSerializer(TaskSearchPage, exclude_unset=True)
+
+def _list_type_error(list_type: Optional[str]) -> Optional[str]:
+    """列表类型无效时返回错误信息"""
+    if list_type not in VALID_LIST_TYPES:
+        return f"无效的列表类型。有效类型: {', '.join(VALID_LIST_TYPES)}"
+    return None
+
+async def _top_rank(user_id: ObjectId, list_type: str) -> Optional[str]:
+    """获取列表中排在最前面的任务的排序键"""
+    task = await get_collection("tasks").find_one(
+        {"user_id": user_id, "list_type": list_type, "rank": {"$type": "string"}},
+        {"rank": 1},
+        sort=TASK_RANK_SORT
+    )
+    return task["rank"] if task else None
+
+def _new_task_document(task_in: TaskCreate, user_id: ObjectId, now: datetime, rank: str, stamp: int) -> dict:
+    """构建新任务文档"""
+    task_data = task_in.dict()
+    task_data["user_id"] = user_id
+    task_data["rank"] = rank
+    task_data["is_completed"] = False
+    task_data["created_at"] = now
+    task_data["updated_at"] = now
+    task_data[SYNC_FIELD] = stamp
+    return task_data
+
+def _task_update(update_data: dict, now: datetime, stamp: int) -> dict:
+    """由 TaskUpdate 中设置的字段构建更新操作"""
+    update_data = dict(update_data)
+    update_data["updated_at"] = now
+    update = {"$set": update_data}
+    
+    # 完成时间记录任务最近一次变为完成的时间：标记完成时只在没有完成时间时写入
+    # （$min 不会覆盖更早的时间，重复标记完成不改变完成时间），取消完成时清除完成时间
+    if update_data.get("is_completed") is True:
+        update["$min"] = {"completed_at": now}
+    elif update_data.get("is_completed") is False:
+        update["$unset"] = {"completed_at": ""}
+    
+    return stamp_update(update, stamp)
+
+# 参与标签计数和生产力统计的任务字段
+_COUNTED_FIELDS = ("tags", "list_type", "is_completed", "completed_at")
+
+# 更新条件因并发修改而不成立时的最多尝试次数
+_UPDATE_ATTEMPTS = 3
+
+def _apply_update(task: dict, update: dict) -> dict:
+    """
+    在更新前的任务文档上本地应用更新操作，得到更新后的文档
+    
+    只用于批量操作：bulk_write 不返回更新后的文档，只需推算 _COUNTED_FIELDS 中的字段。
+    单个任务的更新使用 ReturnDocument.AFTER 取回服务器上实际写入的文档。
+    """
+    task = dict(task)
+    task.update(update.get("$set", {}))
+    for field, value in update.get("$min", {}).items():
+        if field not in task:
+            task[field] = value
+        elif task[field] is not None:
+            task[field] = min(task[field], value)
+    for field in update.get("$unset", {}):
+        task.pop(field, None)
+    return task
+
+def _task_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="任务不存在"
+    )
+
+async def _update_counted_task(user_id: ObjectId, task_id: str, update: dict) -> Tuple[dict, dict]:
+    """
+    更新可能改变标签计数或生产力统计的任务，返回 (更新前的计数字段, 更新后的任务)
+    
+    先读取任务的计数字段，再以它们作为条件执行 find_one_and_update(ReturnDocument.AFTER)：
+    条件成立说明读取到的就是被更新的状态；期间任务被其他请求修改时条件不成立，重新读取后重试。
+    
+    Raises:
+        HTTPException: 如果任务不存在（404），或多次重试仍与并发修改冲突（409）
+    """
+    task_collection = get_collection("tasks")
+    query = {"_id": ObjectId(task_id), "user_id": user_id}
+    for _ in range(_UPDATE_ATTEMPTS):
+        before = await task_collection.find_one(query, {field: 1 for field in _COUNTED_FIELDS})
+        if not before:
+            raise _task_not_found()
+        after = await task_collection.find_one_and_update(
+            {**query, **{field: before.get(field) for field in _COUNTED_FIELDS}},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if after:
+            return before, after
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="任务正在被其他请求修改，请重试"
+    )
+
+def _complete_update(now: datetime, stamp: int) -> dict:
+    """构建将任务标记为完成的更新操作，完成时间的规则与 _task_update 相同"""
+    return _task_update({"is_completed": True}, now, stamp)
+
+def _move_update(list_type: str, now: datetime, rank: str, stamp: int) -> dict:
+    """构建将任务移动到其他列表（排在目标列表最前面）的更新操作"""
+    return stamp_update({"$set": {
+        "list_type": list_type,
+        "rank": rank,
+        "updated_at": now
+    }}, stamp)
+
+@router.get("", response_model=TaskPage, response_model_exclude_unset=True)
 async def read_tasks(
+    request: Request,
+    response: Response,
     list_type: str = None,
-    current_user: UserInDB = Depends(get_current_user)
+    sort: str = "updated",
+    include_archived: bool = False,
+    view: str = "full",
+    fields: str = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     获取当前用户的任务列表
+    
+    通过 view（board/full）或逗号分隔的 fields 参数选择返回字段，
+    只有被请求的字段会从数据库读取并出现在响应中。
+    结果默认按 (updated_at, _id) 倒序分页；sort=rank 时按手动排序的顺序返回，需同时指定 list_type。
+    将响应中的 next_cursor 作为 cursor 参数获取下一页。
+    已归档的任务默认不返回，include_archived=true 时与活动任务合并分页。
+    响应带有ETag，携带匹配的 If-None-Match 时直接返回304，不执行查询。
     """
+    if sort not in ("updated", "rank"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的排序方式。有效值: updated, rank"
+        )
+    if sort == "rank" and not list_type:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="按手动顺序排序时必须指定列表类型"
+        )
+    
+    not_modified = await check_collection_etag(request, response, ObjectId(current_user.id), "tasks")
+    if not_modified:
+        return not_modified
+    
     task_collection = get_collection("tasks")
+    projection = resolve_projection(view, fields, TASK_VIEWS, TASK_FIELDS)
     
     # 构建查询条件
     query = {"user_id": ObjectId(current_user.id)}
@@ -26,39 +212,254 @@ async def read_tasks(
         query["list_type"] = list_type
     
     # 查询任务
-    tasks = await task_collection.find(query).to_list(length=100)
-    
-    return tasks
+    sort_keys = TASK_RANK_SORT if sort == "rank" else TASK_SORT
+    if include_archived:
+        page = await fetch_merged_page(
+            [task_collection, get_collection(ARCHIVE_COLLECTION)],
+            query, sort_keys, page_size(limit), cursor, projection
+        )
+    else:
+        page = await fetch_page(
+            task_collection, query, sort_keys, page_size(limit), cursor, projection
+        )
+    return task_page_serializer.response(page, response)
 
 @router.post("", response_model=Task, status_code=status.HTTP_201_CREATED)
 async def create_task(
     task_in: TaskCreate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     创建新任务
     """
     task_collection = get_collection("tasks")
     
-    # 准备任务数据
-    task_data = task_in.dict()
-    task_data["user_id"] = ObjectId(current_user.id)
-    task_data["is_completed"] = False
-    task_data["created_at"] = datetime.utcnow()
-    task_data["updated_at"] = datetime.utcnow()
+    error = _list_type_error(task_in.list_type)
+    if error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+    
+    # 准备任务数据，新任务排在所在列表的最前面
+    user_id = ObjectId(current_user.id)
+    rank = new_rank(None, await _top_rank(user_id, task_in.list_type))
+    task_data = _new_task_document(task_in, user_id, datetime.utcnow(), rank, await new_sync_stamp(user_id))
+    
+    # 插入任务，insert_one 会把生成的 _id 写回 task_data
+    await task_collection.insert_one(task_data)
+    await update_tag_counts(task_data["user_id"], added=[task_data])
+    await record_change(task_data["user_id"], "tasks")
+    schedule_rebalance(user_id, task_data["list_type"], rank)
+    
+    return task_data
+
+@router.post("/batch", response_model=TaskBatchResponse)
+async def batch_tasks(
+    batch_in: TaskBatchRequest,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    批量执行任务的创建、更新、移动、完成和删除操作
+    
+    所有操作先一次性校验，再用一次 $in 查询校验所有权，最后通过一次 bulk_write 执行。
+    每个操作单独返回结果，个别操作失败不影响其他操作。同一任务在一个批次中只能出现一次。
+    """
+    task_collection = get_collection("tasks")
+    operations = batch_in.operations
+    
+    if len(operations) > settings.TASK_BATCH_MAX_OPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次批量操作最多包含 {settings.TASK_BATCH_MAX_OPS} 个操作"
+        )
+    
+    # 各操作相互独立地校验和执行，同一任务的多个操作无法保证先后顺序
+    task_ids = [
+        operation.task_id.lower() for operation in operations
+        if operation.op != "create" and operation.task_id
+    ]
+    if len(task_ids) != len(set(task_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="同一任务在一次批量操作中只能出现一次"
+        )
+    
+    user_id = ObjectId(current_user.id)
+    now = datetime.utcnow()
+    results = [None] * len(operations)
+    
+    # 每个操作占用一个同步序号，一次预留整个批次（失败的操作留下的空号不影响同步）
+    first_stamp = await reserve_sync_stamps(user_id, len(operations)) if operations else 0
+    writes = []  # (操作序号, 写操作, 任务ID, 变更前的任务, 变更后的任务)
+    pending = []  # 需要校验所有权的操作: (操作序号, 任务ID, 更新操作，删除时为None)
+
+    def fail(index: int, error: str, task_id: str = None) -> None:
+        results[index] = TaskBatchOperationResult(
+            index=index, op=operations[index].op, ok=False, task_id=task_id, error=error
+        )
+    
+    # 新建和移动的任务依次排到目标列表最前面，每个列表只查询一次当前的首个排序键
+    top_ranks = {}
+
+    async def next_rank(list_type: str) -> str:
+        if list_type not in top_ranks:
+            top_ranks[list_type] = await _top_rank(user_id, list_type)
+        top_ranks[list_type] = new_rank(None, top_ranks[list_type])
+        return top_ranks[list_type]
+    
+    # 一次遍历校验全部操作
+    for index, operation in enumerate(operations):
+        if operation.op == "create":
+            try:
+                task_in = TaskCreate(**(operation.data or {}))
+            except ValidationError as exc:
+                fail(index, str(exc))
+                continue
+            error = _list_type_error(task_in.list_type)
+            if error:
+                fail(index, error)
+                continue
+            task_data = _new_task_document(
+                task_in, user_id, now, await next_rank(task_in.list_type), first_stamp + index
+            )
+            task_data["_id"] = ObjectId()
+            writes.append((index, InsertOne(task_data), task_data["_id"], None, task_data))
+            continue
+    
+        if not operation.task_id or not ObjectId.is_valid(operation.task_id):
+            fail(index, "无效的任务ID", operation.task_id)
+            continue
+    
+        if operation.op == "update":
+            try:
+                update_data = TaskUpdate(**(operation.data or {})).dict(exclude_unset=True)
+            except ValidationError as exc:
+                fail(index, str(exc), operation.task_id)
+                continue
+            error = "list_type" in update_data and _list_type_error(update_data["list_type"])
+            if error:
+                fail(index, error, operation.task_id)
+                continue
+            update = _task_update(update_data, now, first_stamp + index)
+        elif operation.op == "move":
+            error = _list_type_error(operation.list_type)
+            if error:
+                fail(index, error, operation.task_id)
+                continue
+            update = _move_update(
+                operation.list_type, now, await next_rank(operation.list_type), first_stamp + index
+            )
+        elif operation.op == "complete":
+            update = _complete_update(now, first_stamp + index)
+        else:
+            update = None
+    
+        pending.append((index, ObjectId(operation.task_id), update))
+    
+    # 一次 $in 查询校验所有权，同时取回维护标签计数和生产力统计所需的字段
+    owned = {}
+    if pending:
+        cursor = task_collection.find(
+            {"_id": {"$in": list({task_id for _, task_id, _ in pending})}, "user_id": user_id},
+            {"tags": 1, "list_type": 1, "is_completed": 1, "completed_at": 1}
+        )
+        owned = {task["_id"]: task async for task in cursor}
+    
+    for index, task_id, update in pending:
+        before = owned.get(task_id)
+        if before is None:
+            fail(index, "任务不存在", str(task_id))
+            continue
+        query = {"_id": task_id, "user_id": user_id}
+        if update:
+            writes.append((index, UpdateOne(query, update), task_id, before, _apply_update(before, update)))
+        else:
+            writes.append((index, DeleteOne(query), task_id, before, None))
+    
+    # 一次 bulk_write 执行全部写操作
+    write_errors = {}
+    if writes:
+        try:
+            await task_collection.bulk_write([write for _, write, _, _, _ in writes], ordered=False)
+        except BulkWriteError as exc:
+            write_errors = {error["index"]: error["errmsg"] for error in exc.details.get("writeErrors", [])}
+    
+    removed, added = [], []
+    for position, (index, _, task_id, before, after) in enumerate(writes):
+        if position in write_errors:
+            fail(index, write_errors[position], str(task_id))
+        else:
+            results[index] = TaskBatchOperationResult(
+                index=index, op=operations[index].op, ok=True, task_id=str(task_id)
+            )
+            removed.append(before)
+            added.append(after)
+    
+    await update_tag_counts(user_id, removed=removed, added=added)
+    await update_task_rollups(user_id, removed=removed, added=added)
+    await record_deletions(user_id, "tasks", [
+        task["_id"] for task, after in zip(removed, added) if after is None
+    ])
+    if removed:  # removed 与成功的操作一一对应
+        await record_change(user_id, "tasks")
+    for list_type, rank in top_ranks.items():
+        if rank:
+            schedule_rebalance(user_id, list_type, rank)
+    
+    return {"results": results}
+
+@router.get("/search", response_model=TaskSearchPage, response_model_exclude_unset=True)
+async def search_tasks(
+    q: str,
+    list_type: str = None,
+    is_completed: Optional[bool] = None,
+    view: str = "full",
+    fields: str = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    按标题、描述和标签全文搜索当前用户的任务
+    
+    结果按相关度排序（标题权重最高，其次是标签和描述），可按列表类型和完成状态过滤。
+    """
+    task_collection = get_collection("tasks")
+    projection = resolve_projection(view, fields, TASK_VIEWS, TASK_FIELDS) or {}
+    projection["score"] = {"$meta": "textScore"}
+    
+    if not q.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="搜索关键词不能为空"
+        )
+    if offset < 0 or offset > settings.SEARCH_MAX_OFFSET:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"offset 应在 0 到 {settings.SEARCH_MAX_OFFSET} 之间"
+        )
+    
+    # user_id 等值条件命中全文索引的前缀，只扫描当前用户的索引条目
+    query = {"user_id": ObjectId(current_user.id), "$text": {"$search": q}}
+    if list_type:
+        query["list_type"] = list_type
+    if is_completed is not None:
+        query["is_completed"] = is_completed
     
-    # 插入任务
-    result = await task_collection.insert_one(task_data)
+    limit = page_size(limit)
+    tasks = await task_collection.find(query, projection).sort(
+        [("score", {"$meta": "textScore"})]
+    ).skip(offset).limit(limit + 1).to_list(length=limit + 1)
     
-    # 获取新创建的任务
-    new_task = await task_collection.find_one({"_id": result.inserted_id})
+    next_offset = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_offset = offset + limit
     
-    return new_task
+    return task_search_serializer.response({"items": tasks, "next_offset": next_offset})
 
 @router.get("/{task_id}", response_model=Task)
 async def read_task(
     task_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     获取特定任务
@@ -83,59 +484,55 @@ async def read_task(
 async def update_task(
     task_id: str,
     task_in: TaskUpdate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     更新任务
     """
     task_collection = get_collection("tasks")
     
-    # 查询任务
-    task = await task_collection.find_one({
-        "_id": ObjectId(task_id),
-        "user_id": ObjectId(current_user.id)
-    })
-    
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="任务不存在"
-        )
-    
     # 准备更新数据
     update_data = task_in.dict(exclude_unset=True)
-    update_data["updated_at"] = datetime.utcnow()
-    
-    # 如果任务被标记为完成，设置完成时间
-    if "is_completed" in update_data and update_data["is_completed"] and not task.get("is_completed"):
-        update_data["completed_at"] = datetime.utcnow()
-    
-    # 更新任务
-    await task_collection.update_one(
-        {"_id": ObjectId(task_id)},
-        {"$set": update_data}
-    )
+    error = "list_type" in update_data and _list_type_error(update_data["list_type"])
+    if error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+    user_id = ObjectId(current_user.id)
+    update = _task_update(update_data, datetime.utcnow(), await new_sync_stamp(user_id))
+    
+    if not any(field in update_data for field in _COUNTED_FIELDS):
+        # 不影响计数的更新一次往返完成，所有权校验在过滤条件中完成
+        updated_task = await task_collection.find_one_and_update(
+            {"_id": ObjectId(task_id), "user_id": user_id},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_task:
+            raise _task_not_found()
+        await record_change(user_id, "tasks")
+        return updated_task
     
-    # 获取更新后的任务
-    updated_task = await task_collection.find_one({"_id": ObjectId(task_id)})
+    task, updated_task = await _update_counted_task(user_id, task_id, update)
+    await update_tag_counts(user_id, removed=[task], added=[updated_task])
+    await update_task_rollups(user_id, removed=[task], added=[updated_task])
+    await record_change(user_id, "tasks")
     
     return updated_task
 
-@router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT, response_model=None)
 async def delete_task(
     task_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     删除任务
     """
     task_collection = get_collection("tasks")
     
-    # 查询任务
-    task = await task_collection.find_one({
-        "_id": ObjectId(task_id),
-        "user_id": ObjectId(current_user.id)
-    })
+    # 删除任务，所有权校验在过滤条件中完成
+    task = await task_collection.find_one_and_delete(
+        {"_id": ObjectId(task_id), "user_id": ObjectId(current_user.id)},
+        projection={"user_id": 1, "tags": 1, "list_type": 1, "is_completed": 1, "completed_at": 1}
+    )
     
     if not task:
         raise HTTPException(
@@ -143,46 +540,49 @@ async def delete_task(
             detail="任务不存在"
         )
     
-    # 删除任务
-    await task_collection.delete_one({"_id": ObjectId(task_id)})
+    await update_tag_counts(task["user_id"], removed=[task])
+    await update_task_rollups(task["user_id"], removed=[task])
+    await record_deletions(task["user_id"], "tasks", [task["_id"]])
+    await record_change(task["user_id"], "tasks")
     
     return None
 
 @router.put("/{task_id}/complete", response_model=Task)
 async def complete_task(
     task_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     将任务标记为完成
     """
     task_collection = get_collection("tasks")
     
-    # 查询任务
-    task = await task_collection.find_one({
-        "_id": ObjectId(task_id),
-        "user_id": ObjectId(current_user.id)
-    })
-    
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="任务不存在"
-        )
-    
-    # 更新任务
-    now = datetime.utcnow()
-    await task_collection.update_one(
-        {"_id": ObjectId(task_id)},
-        {"$set": {
-            "is_completed": True,
-            "completed_at": now,
-            "updated_at": now
-        }}
+    user_id = ObjectId(current_user.id)
+    update = _complete_update(datetime.utcnow(), await new_sync_stamp(user_id))
+    query = {"_id": ObjectId(task_id), "user_id": user_id}
+    
+    # 任务只有在已完成且有完成时间时才计入生产力统计（见 productivity._task_contributions）。
+    # 以“尚未计入”为条件更新：条件成立时更新前的任务不计入统计，更新后的任务计入完成当天；
+    # 否则任务已经计入，$min 保留原完成时间，统计不变。常见情况下一次往返完成更新。
+    updated_task = await task_collection.find_one_and_update(
+        {**query, "$or": [{"is_completed": {"$ne": True}}, {"completed_at": {"$not": {"$type": "date"}}}]},
+        update,
+        return_document=ReturnDocument.AFTER
     )
+    if updated_task:
+        await update_task_rollups(user_id, added=[updated_task])
+    else:
+        updated_task = await task_collection.find_one_and_update(
+            {**query, "is_completed": True, "completed_at": {"$type": "date"}},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_task:
+            # 任务不存在，或在两次更新之间被取消完成，按计数字段重新处理
+            task, updated_task = await _update_counted_task(user_id, task_id, update)
+            await update_task_rollups(user_id, removed=[task], added=[updated_task])
     
-    # 获取更新后的任务
-    updated_task = await task_collection.find_one({"_id": ObjectId(task_id)})
+    await record_change(user_id, "tasks")
     
     return updated_task
 
@@ -190,44 +590,218 @@ async def complete_task(
 async def move_task(
     task_id: str,
     list_type: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_identity)
 ) -> Any:
     """
     将任务移动到不同的列表
     """
+    # 验证列表类型
+    error = _list_type_error(list_type)
+    if error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+    
+    # 更新任务
+    user_id = ObjectId(current_user.id)
+    update = _move_update(
+        list_type, datetime.utcnow(), new_rank(None, await _top_rank(user_id, list_type)),
+        await new_sync_stamp(user_id)
+    )
+    task, updated_task = await _update_counted_task(user_id, task_id, update)
+    await update_tag_counts(user_id, removed=[task], added=[updated_task])
+    await update_task_rollups(user_id, removed=[task], added=[updated_task])
+    await record_change(user_id, "tasks")
+    schedule_rebalance(user_id, list_type, updated_task["rank"])
+    
+    return updated_task
+
+@router.put("/{task_id}/rank", response_model=Task)
+async def reorder_task(
+    task_id: str,
+    reorder_in: TaskReorder,
+    current_user: CurrentUser = Depends(get_current_identity)
+) -> Any:
+    """
+    调整任务在列表中的位置
+    
+    新的排序键取相邻两个任务排序键的中间值，只写入被移动的任务这一个文档。
+    排序键过长时在后台重排整个列表。
+    """
     task_collection = get_collection("tasks")
+    user_id = ObjectId(current_user.id)
     
-    # 验证列表类型
-    valid_list_types = ["todo", "watch", "later"]
-    if list_type not in valid_list_types:
+    neighbour_ids = [i for i in (reorder_in.prev_id, reorder_in.next_id) if i]
+    if not all(ObjectId.is_valid(i) for i in [task_id, *neighbour_ids]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"无效的列表类型。有效类型: {', '.join(valid_list_types)}"
+            detail="无效的任务ID"
         )
     
-    # 查询任务
-    task = await task_collection.find_one({
-        "_id": ObjectId(task_id),
-        "user_id": ObjectId(current_user.id)
-    })
+    # 一次查询取回被移动的任务和相邻任务
+    cursor = task_collection.find(
+        {"_id": {"$in": [ObjectId(i) for i in [task_id, *neighbour_ids]]}, "user_id": user_id},
+        {"list_type": 1, "rank": 1}
+    )
+    tasks = {str(task["_id"]): task async for task in cursor}
+    
+    for i in [task_id, *neighbour_ids]:
+        if i not in tasks:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"任务 {i} 不存在"
+            )
+    
+    task = tasks[task_id]
+    neighbours = [tasks.get(reorder_in.prev_id), tasks.get(reorder_in.next_id)]
+    if any(neighbour and neighbour["list_type"] != task["list_type"] for neighbour in neighbours):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="相邻任务不在同一列表中"
+        )
+    ranks = [neighbour.get("rank") if neighbour else None for neighbour in neighbours]
+    
+    # 相邻任务的排序键相同（并发插入同一位置）或尚未排序时无法在两者之间插入：
+    # 立即重排整个列表，重排保持当前的读取顺序，再按新的排序键计算
+    unranked = any(neighbour and not rank for neighbour, rank in zip(neighbours, ranks))
+    if unranked or (ranks[0] and ranks[0] == ranks[1]):
+        await rebalance_list(user_id, task["list_type"])
+        cursor = task_collection.find({"_id": {"$in": [ObjectId(i) for i in neighbour_ids]}}, {"rank": 1})
+        rebalanced = {str(neighbour["_id"]): neighbour.get("rank") async for neighbour in cursor}
+        ranks = [rebalanced.get(i) if i else None for i in (reorder_in.prev_id, reorder_in.next_id)]
+    
+    try:
+        rank = new_rank(*ranks)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="任务顺序已变化，请刷新后重试"
+        )
     
-    if not task:
+    # 调整顺序不改变 updated_at，避免影响按更新时间排序的视图
+    updated_task = await task_collection.find_one_and_update(
+        {"_id": task["_id"], "user_id": user_id},
+        stamp_update({"$set": {"rank": rank}}, await new_sync_stamp(user_id)),
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if not updated_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="任务不存在"
         )
     
-    # 更新任务
-    now = datetime.utcnow()
-    await task_collection.update_one(
-        {"_id": ObjectId(task_id)},
-        {"$set": {
-            "list_type": list_type,
-            "updated_at": now
-        }}
-    )
-    
-    # 获取更新后的任务
-    updated_task = await task_collection.find_one({"_id": ObjectId(task_id)})
+    await record_change(user_id, "tasks")
+    schedule_rebalance(user_id, task["list_type"], rank)
     
     return updated_task
+
+def _benchmark_operations(task_ids: List[ObjectId]) -> List[Dict[str, Any]]:
+    """为每个任务生成一个批量操作，依次为更新、完成、移动和创建"""
+    operations = []
+    for index, task_id in enumerate(task_ids):
+        kind = ("update", "complete", "move", "create")[index % 4]
+        if kind == "update":
+            operations.append({"op": "update", "task_id": str(task_id), "data": {"title": f"Renamed {index}"}})
+        elif kind == "complete":
+            operations.append({"op": "complete", "task_id": str(task_id)})
+        elif kind == "move":
+            operations.append({"op": "move", "task_id": str(task_id), "list_type": "later"})
+        else:
+            operations.append({"op": "create", "data": {"title": f"Created {index}", "list_type": "todo"}})
+    return operations
+
+def _single_request(client: Any, headers: Dict[str, str], operation: Dict[str, Any]) -> Any:
+    """与批量操作等价的单个请求"""
+    path = f"/api/tasks/{operation.get('task_id')}"
+    if operation["op"] == "update":
+        return client.put(path, json=operation["data"], headers=headers)
+    if operation["op"] == "complete":
+        return client.put(f"{path}/complete", headers=headers)
+    if operation["op"] == "move":
+        return client.put(f"{path}/move", params={"list_type": operation["list_type"]}, headers=headers)
+    return client.post("/api/tasks", json=operation["data"], headers=headers)
+
+async def _benchmark_batch(client: Any, headers: Dict[str, str], user_id: ObjectId, operations: int, repeat: int) -> None:
+    from app.core.benchmark import insert_tasks
+    from app.core.monitoring import command_counter
+    
+    await insert_tasks(user_id, operations * repeat * 2)
+    task_ids = [
+        task["_id"] async for task in get_collection("tasks").find({"user_id": user_id, "is_completed": False}, {"_id": 1})
+    ]
+    
+    async def singles(batch: List[Dict[str, Any]]) -> None:
+        for operation in batch:
+            response = await _single_request(client, headers, operation)
+            response.raise_for_status()
+    
+    async def batched(batch: List[Dict[str, Any]]) -> None:
+        response = await client.post("/api/tasks/batch", json={"operations": batch}, headers=headers)
+        response.raise_for_status()
+        assert all(result["ok"] for result in response.json()["results"])
+    
+    print(f"{operations} operations (update, complete, move, create), median of {repeat}")
+    for label, run in ((f"{operations} single requests", singles), ("1 batch request", batched)):
+        timings, commands = [], 0
+        for _ in range(repeat):
+            batch, task_ids = _benchmark_operations(task_ids[:operations]), task_ids[operations:]
+            before = command_counter.total()
+            started = time.perf_counter()
+            await run(batch)
+            timings.append(time.perf_counter() - started)
+            commands += command_counter.total() - before
+        elapsed = statistics.median(timings)
+        print(f"{label:<22} {elapsed * 1000:8.1f} ms {elapsed * 1000 / operations:6.2f} ms/op {commands / repeat:7.1f} commands")
+
+async def _benchmark_search(
+    client: Any, headers: Dict[str, str], user_id: ObjectId, task_count: int, repeat: int, budget_ms: float
+) -> int:
+    from app.core.benchmark import format_percentiles, insert_tasks, percentiles, timed
+    
+    # 生成的标题由常用词和任务序号组成：常用词命中大量任务，序号只命中一个任务
+    await insert_tasks(user_id, task_count)
+    queries = [
+        ("common word", {"q": "report"}),
+        ("two common words", {"q": "report budget"}),
+        ("common word in one list", {"q": "review", "list_type": "watch"}),
+        ("common word, open tasks", {"q": "plan", "is_completed": "false"}),
+        ("tag", {"q": "work"}),
+        ("rare word", {"q": str(task_count // 2)}),
+        ("no match", {"q": "nonexistent"}),
+    ]
+    
+    print(f"GET /api/tasks/search over {task_count} tasks, {repeat} requests per query, p95 budget {budget_ms:.0f} ms")
+    over_budget = []
+    for label, params in queries:
+        samples = await timed(lambda: client.get("/api/tasks/search", params=params, headers=headers), repeat)
+        print(f"{label:<26} {format_percentiles(samples)}")
+        if percentiles(samples)["p95"] > budget_ms:
+            over_budget.append(label)
+    
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+async def _main(benchmark: str, operations: int, task_count: int, repeat: int, budget_ms: float) -> int:
+    from app.core.benchmark import benchmark_client, register_user
+    
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        if benchmark == "search":
+            return await _benchmark_search(client, headers, user_id, task_count, repeat, budget_ms)
+        await _benchmark_batch(client, headers, user_id, operations, repeat)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任务接口的基准测试（使用临时数据库）")
+    parser.add_argument(
+        "benchmark",
+        choices=["batch", "search"],
+        help="batch: 比较逐个请求与一次批量请求执行相同操作的耗时和往返次数；search: 测量全文搜索的延迟"
+    )
+    parser.add_argument("--operations", type=int, default=settings.TASK_BATCH_MAX_OPS, help="batch 每轮的操作数")
+    parser.add_argument("--tasks", type=int, default=100000, help="search 的任务数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（search 为每种查询的请求数）")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="search 每种查询的p95预算，超出时以非零状态退出")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.benchmark, args.operations, args.tasks, args.repeat, args.budget_ms)))
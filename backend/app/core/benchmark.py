@@ -0,0 +1,227 @@
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.db import close_mongo_connection, connect_to_mongo, db, get_collection
+
+# 生成任务时使用的标签和列表类型
+_TAGS = ["work", "home", "errand", "reading", "health", "finance", "travel", "ideas"]
+_LIST_TYPES = ["todo", "watch", "later"]
+_WORDS = ["report", "review", "plan", "email", "call", "draft", "update", "fix", "meeting", "notes", "budget", "design"]
+
+# 生成的任务每批写入的文档数
+INSERT_BATCH_SIZE = 10000
+
+@asynccontextmanager
+async def benchmark_client() -> AsyncIterator[Any]:
+    """
+    连接一个临时的基准测试数据库并返回直接调用应用的HTTP客户端
+    
+    数据库名在配置的库名后加随机后缀，退出时删除，不影响正式数据。
+    请求经 ASGI 直接交给应用处理，测得的耗时包括路由、序列化和数据库访问，不含网络。
+    """
+    # 应用在此处才导入：各模块的基准测试入口导入本模块时，应用可能尚未加载完毕
+    from httpx import AsyncClient
+    
+    from app.core.indexes import ensure_indexes
+    from app.main import app
+    
+    settings.MONGODB_DB_NAME = f"{settings.MONGODB_DB_NAME}_bench_{uuid.uuid4().hex[:8]}"
+    await connect_to_mongo()
+    try:
+        await ensure_indexes()
+        async with AsyncClient(app=app, base_url="http://bench") as client:
+            yield client
+    finally:
+        await db.client.drop_database(settings.MONGODB_DB_NAME)
+        await close_mongo_connection()
+
+@asynccontextmanager
+async def app_server(port: int) -> AsyncIterator[Tuple[Any, Any]]:
+    """
+    在子进程中启动一个 uvicorn 工作进程，连接 benchmark_client 创建的临时数据库
+    
+    需要在 benchmark_client 的上下文中使用。请求经真实的HTTP连接发送，响应按流读取，
+    可以单独统计工作进程的内存；两个进程使用相同的密钥，令牌可以互通。
+    
+    Yields:
+        (工作进程, 连接到该进程的HTTP客户端)
+    
+    Raises:
+        RuntimeError: 如果工作进程未能在30秒内启动
+    """
+    import httpx
+    
+    env = {
+        **os.environ,
+        "MONGODB_URL": settings.MONGODB_URL,
+        "MONGODB_DB_NAME": settings.MONGODB_DB_NAME,
+        "SECRET_KEY": settings.SECRET_KEY,
+    }
+    server = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--port", str(port), "--no-access-log", "--log-level", "warning",
+        env=env
+    )
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=0)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as http:
+            for _ in range(300):
+                try:
+                    if (await http.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("工作进程未能启动")
+            yield server, http
+    finally:
+        server.terminate()
+        await server.wait()
+
+def process_memory_kib(pid: int, field: str = "VmRSS") -> int:
+    """
+    读取进程的内存用量（KiB），仅支持Linux
+    
+    Args:
+        pid: 进程ID
+        field: /proc/<pid>/status 中的字段，VmRSS 为当前常驻内存，VmHWM 为常驻内存峰值
+    """
+    with open(f"/proc/{pid}/status") as status_file:
+        for line in status_file:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise RuntimeError(f"无法读取进程内存: {field}")
+
+def _password(username: str) -> str:
+    return f"{username}-benchmark-password"
+
+async def login(client: Any, username: str = "bench") -> Dict[str, str]:
+    """
+    以 register_user 注册的用户登录
+    
+    令牌的声明取决于登录时的配置（如 STATELESS_TOKENS），修改配置后需要重新登录。
+    
+    Returns:
+        带有访问令牌的请求头
+    """
+    response = await client.post("/api/auth/login", data={"username": username, "password": _password(username)})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def register_user(client: Any, username: str = "bench") -> Tuple[Dict[str, str], ObjectId]:
+    """
+    注册并登录用户
+    
+    Returns:
+        (带有访问令牌的请求头, 用户ID)
+    """
+    response = await client.post(
+        "/api/auth/register",
+        json={"email": f"{username}@example.com", "username": username, "password": _password(username)}
+    )
+    response.raise_for_status()
+    return await login(client, username), ObjectId(response.json()["id"])
+
+def synthetic_task(user_id: ObjectId, index: int, now: datetime, completed_ratio: float = 0.3, days: int = 365) -> Dict[str, Any]:
+    """
+    生成一个与创建接口写入的结构相同的任务文档
+    
+    更新时间在最近 days 天内均匀分布；已完成任务的完成时间不晚于更新时间。
+    """
+    updated_at = now - timedelta(seconds=random.uniform(0, days * 86400))
+    title = " ".join(random.sample(_WORDS, 3))
+    task = {
+        "user_id": user_id,
+        "title": f"{title} {index}",
+        "description": f"Synthetic task {index}: {' '.join(random.sample(_WORDS, 6))}",
+        "list_type": _LIST_TYPES[index % len(_LIST_TYPES)],
+        "priority": random.randint(1, 5),
+        "due_date": None,
+        "tags": random.sample(_TAGS, random.randint(0, 3)),
+        "is_completed": random.random() < completed_ratio,
+        "created_at": updated_at - timedelta(days=random.uniform(0, 30)),
+        "updated_at": updated_at,
+    }
+    if task["is_completed"]:
+        task["completed_at"] = updated_at
+    return task
+
+async def insert_tasks(user_id: ObjectId, count: int, **options: Any) -> None:
+    """
+    直接向数据库写入 count 个生成的任务，并补齐排序键、同步序号和标签计数
+    
+    Args:
+        user_id: 用户ID
+        count: 任务数
+        **options: 传给 synthetic_task 的参数
+    """
+    # 在此处导入以免加载服务模块时循环导入
+    from app.services.ranking import evenly_spaced_ranks
+    from app.services.sync import SYNC_FIELD, reserve_sync_stamps
+    from app.services.tags import rebuild_tag_counts
+    
+    now = datetime.utcnow()
+    first_stamp = await reserve_sync_stamps(user_id, count)
+    ranks = evenly_spaced_ranks(count)
+    task_collection = get_collection("tasks")
+    for start in range(0, count, INSERT_BATCH_SIZE):
+        batch = []
+        for index in range(start, min(start + INSERT_BATCH_SIZE, count)):
+            task = synthetic_task(user_id, index, now, **options)
+            task["rank"] = ranks[index]
+            task[SYNC_FIELD] = first_stamp + index
+            batch.append(task)
+        await task_collection.insert_many(batch, ordered=False)
+    await rebuild_tag_counts(user_id)
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """
+    计算耗时样本的分位数
+    
+    Args:
+        samples: 耗时（秒）
+    
+    Returns:
+        p50、p95、p99 和 max，单位毫秒
+    """
+    ordered = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+    
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": ordered[-1] * 1000}
+
+def format_percentiles(samples: Sequence[float]) -> str:
+    """以一行文本输出耗时分位数"""
+    return " ".join(f"{name} {value:.1f} ms" for name, value in percentiles(samples).items())
+
+async def timed(request: Callable[[], Awaitable[Any]], count: int, concurrency: int = 1) -> List[float]:
+    """
+    执行 count 次请求，最多 concurrency 个同时进行，返回每次的耗时（秒）
+    
+    请求返回的响应必须成功（2xx 或 304），否则抛出异常。
+    """
+    samples = []
+    remaining = iter(range(count))
+
+    async def worker() -> None:
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await request()
+            samples.append(time.perf_counter() - started)
+            if response.status_code != 304:
+                response.raise_for_status()
+    
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return samples
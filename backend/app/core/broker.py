@@ -0,0 +1,160 @@
+import asyncio
+from typing import Any, Dict, Iterable, Optional, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.core.db import get_collection
+
+# 服务器不是副本集，不支持变更流
+_NOT_REPLICA_SET = 40573
+
+class Subscription:
+    """一个事件流连接的订阅，事件在有界队列中等待发送"""
+
+    def __init__(self, user_id: str, max_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def push(self, event: Dict[str, Any]) -> bool:
+        """
+        将事件放入队列
+
+        队列已满说明客户端消费过慢：丢弃积压的事件，只保留一个 resync 事件，
+        客户端收到后通过增量同步补齐。resync 被取走之前的新事件同样丢弃。
+
+        Returns:
+            事件是否入队（False 表示发生了丢弃）
+        """
+        if self.overflowed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            self.overflowed = True
+            return False
+
+    async def get(self, timeout: float) -> Dict[str, Any]:
+        """
+        等待下一个事件
+
+        Raises:
+            asyncio.TimeoutError: 如果超时仍没有事件
+        """
+        event = await asyncio.wait_for(self.queue.get(), timeout)
+        if event["type"] == "resync":
+            self.overflowed = False
+        return event
+
+class EventBroker:
+    """
+    进程内的用户变更事件分发器
+
+    修改数据的路由通过 publish 通知本进程中该用户的所有事件流连接。
+    服务器是副本集时，改为监听版本号集合的变更流，所有工作进程都能收到
+    任意进程中发生的变更；此时本地发布被跳过，避免重复推送。
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self.change_stream_active = False
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """为用户的一个连接创建订阅"""
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """移除订阅"""
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def _dispatch(self, user_id: str, versions: Dict[str, int]) -> None:
+        for subscription in self._subscriptions.get(user_id, ()):
+            for collection, version in versions.items():
+                self.published += 1
+                if not subscription.push({"type": "change", "collection": collection, "version": version}):
+                    self.dropped += 1
+
+    def publish(self, user_id: Any, versions: Dict[str, int]) -> None:
+        """
+        发布用户数据的变更
+
+        Args:
+            user_id: 用户ID
+            versions: 发生变更的集合名到新版本号的字典
+        """
+        if not self.change_stream_active:
+            self._dispatch(str(user_id), versions)
+
+    async def _watch_forever(self, collection_name: str, fields: Set[str]) -> None:
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        resume_token = None
+        while True:
+            try:
+                async with get_collection(collection_name).watch(pipeline, resume_after=resume_token) as stream:
+                    self.change_stream_active = True
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        if change["operationType"] == "update":
+                            changed = change["updateDescription"]["updatedFields"]
+                        else:
+                            changed = change["fullDocument"]
+                        versions = {k: v for k, v in changed.items() if k in fields}
+                        if versions:
+                            self._dispatch(str(change["documentKey"]["_id"]), versions)
+            except OperationFailure as exc:
+                self.change_stream_active = False
+                if exc.code == _NOT_REPLICA_SET:
+                    print("Change streams unavailable, publishing events in-process only")
+                    return
+                print(f"Change stream failed: {exc}")
+                resume_token = None
+            except PyMongoError as exc:
+                self.change_stream_active = False
+                print(f"Change stream interrupted: {exc}")
+            await asyncio.sleep(settings.EVENTS_RETRY_SECONDS)
+
+    def start(self, collection_name: str, fields: Iterable[str]) -> None:
+        """
+        启动变更流监听任务
+
+        Args:
+            collection_name: 记录用户版本号的集合
+            fields: 作为事件下发的版本号字段，文档中的其他字段（如同步计数器）的变更被忽略
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch_forever(collection_name, set(fields)))
+
+    def stop(self) -> None:
+        """停止变更流监听任务"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.change_stream_active = False
+
+    def stats(self) -> Dict[str, Any]:
+        """获取事件分发统计信息"""
+        return {
+            "users": len(self._subscriptions),
+            "connections": sum(len(s) for s in self._subscriptions.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+            "change_stream_active": self.change_stream_active,
+        }
+
+# 全局事件分发器
+event_broker = EventBroker(queue_size=settings.EVENTS_QUEUE_SIZE)
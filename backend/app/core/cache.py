@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+from app.core.config import settings
+
+class TTLCache:
+    """
+    有界的进程内TTL缓存（LRU淘汰）
+
+    条目在写入后 ttl 秒过期；条目数超过 max_size 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        获取缓存值
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，不存在或已过期时返回None
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        写入缓存值
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """使指定键失效"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含命中数、未命中数、命中率和当前大小的字典
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+        }
+
+# 已认证用户缓存，键为令牌主题（用户ID）
+user_cache = TTLCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+def invalidate_user(user_id: Any) -> None:
+    """
+    用户文档被写入后使其缓存失效
+
+    Args:
+        user_id: 用户ID
+    """
+    user_cache.invalidate(str(user_id))
+
+async def _main(requests: int, concurrency: int, task_count: int) -> int:
+    # 以模块方式运行时本文件是 __main__，应用使用的缓存实例在 app.core.cache 中
+    from app.core import cache
+    from app.core.benchmark import benchmark_client, format_percentiles, insert_tasks, register_user, timed
+
+    # 缓存只用于数据库认证路径
+    settings.STATELESS_TOKENS = False
+    max_size = cache.user_cache.max_size
+
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        await insert_tasks(user_id, task_count)
+
+        print(f"GET /api/tasks with {task_count} tasks, {requests} requests, concurrency {concurrency}")
+        for label, size in (("cache disabled", 0), ("cache enabled", max_size or 1)):
+            cache.user_cache.max_size = size
+            cache.user_cache.clear()
+            cache.user_cache.hits = cache.user_cache.misses = 0
+            started = time.perf_counter()
+            samples = await timed(lambda: client.get("/api/tasks", headers=headers), requests, concurrency)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<15} {requests / elapsed:8.1f} req/s  {format_percentiles(samples)}")
+        print(f"Cache hit rate with cache enabled: {cache.user_cache.stats()['hit_rate']:.1%}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比较启用和禁用用户缓存时已认证请求的吞吐量（使用临时数据库）")
+    parser.add_argument("--requests", type=int, default=2000, help="每种配置的请求数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同时进行的请求数")
+    parser.add_argument("--tasks", type=int, default=20, help="用户的任务数")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.requests, args.concurrency, args.tasks)))
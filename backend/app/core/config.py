@@ -22,10 +22,81 @@ class Settings(BaseSettings):
     # 安全配置
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24小时
+    STATELESS_TOKENS: bool = False  # 令牌内嵌身份声明，认证时不访问数据库
+    TOKEN_REVOCATION_REFRESH_SECONDS: float = 30.0
+    
+    # 用户缓存配置
+    USER_CACHE_MAX_SIZE: int = 10000  # 0表示禁用缓存
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    
+    # 密码哈希工作池配置
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # thread 或 process
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    
+    # bcrypt成本配置
+    BCRYPT_ROUNDS: Optional[int] = None  # 固定成本，设置后跳过启动校准
+    BCRYPT_TARGET_HASH_MS: float = 250.0  # 单次哈希的目标耗时
+    BCRYPT_MIN_ROUNDS: int = 10
+    BCRYPT_MAX_ROUNDS: int = 15
+    
+    # 分页配置
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+    DAILY_CARD_SUMMARY_MAX_DAYS: int = 366  # 卡片统计摘要单次查询的最大天数
+    SEARCH_MAX_OFFSET: int = 1000  # 全文搜索按相关度排序，只支持有限深度的翻页
+    TAG_RESULT_LIMIT_DEFAULT: int = 20
+    TAG_RESULT_LIMIT_MAX: int = 100
+    
+    # 批量操作配置
+    TASK_BATCH_MAX_OPS: int = 100
+    
+    # 手动排序配置
+    TASK_RANK_MAX_LENGTH: int = 16  # 排序键超过该长度时在后台重排所在列表
+    
+    # 任务归档配置
+    TASK_ARCHIVE_AFTER_DAYS: Optional[int] = None  # 完成超过该天数的任务移入归档集合，为空表示不归档
+    TASK_ARCHIVE_BATCH_SIZE: int = 500
+    TASK_ARCHIVE_INTERVAL_SECONDS: float = 3600.0
+    
+    # 生产力分析配置
+    ANALYTICS_DEFAULT_DAYS: int = 30  # 未指定日期范围时统计最近的天数
+    ANALYTICS_MAX_DAYS: int = 366  # 单次查询的最大天数
+    
+    # 任务推荐配置
+    RECOMMENDATION_LIMIT_DEFAULT: int = 5  # 每日卡片最多5个任务
+    RECOMMENDATION_LIMIT_MAX: int = 50
+    RECOMMENDATION_HISTORY_SIZE: int = 500  # 用于计算历史偏好的最近完成任务数
+    RECOMMENDATION_CACHE_MAX_SIZE: int = 10000  # 0表示禁用缓存
+    RECOMMENDATION_CACHE_TTL_SECONDS: float = 300.0
+    
+    # 导入导出配置
+    EXPORT_BATCH_SIZE: int = 1000  # 导出时Motor游标每批读取的文档数
+    IMPORT_BATCH_SIZE: int = 1000  # 导入时每次insert_many写入的文档数
+    
+    # 增量同步配置
+    SYNC_PAGE_SIZE_DEFAULT: int = 500
+    SYNC_PAGE_SIZE_MAX: int = 1000
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30  # 删除记录保留天数，更早的同步令牌需要全量同步
+    SYNC_SETTLE_SECONDS: float = 5.0  # 同步序号预留后写入可见的最长时间，同步令牌不会越过更近的预留
+    
+    # 事件推送配置
+    EVENTS_CHANGE_STREAMS: bool = True  # 副本集上通过变更流在工作进程间分发事件
+    EVENTS_QUEUE_SIZE: int = 100  # 每个连接最多积压的事件数
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    EVENTS_RETRY_SECONDS: float = 5.0
+    EVENTS_TOKEN_SECONDS: int = 60  # 事件流令牌的有效期，令牌放在URL中，只用于建立连接
     
     # MongoDB配置
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "flowmaster"
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None  # 为空表示无限等待
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGODB_COMPRESSORS: Optional[str] = None  # 例如 "zstd,snappy,zlib"
+    MONGODB_READ_PREFERENCE: str = "primary"
+    MONGODB_WARMUP_TIMEOUT_SECONDS: float = 10.0
     
     class Config:
         case_sensitive = True
@@ -1,5 +1,7 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
+from app.core.monitoring import command_counter, pool_listener
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -7,11 +9,45 @@ class Database:
 
 db = Database()
 
+def _client_options() -> dict:
+    """根据配置构建连接池相关的客户端参数"""
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": settings.MONGODB_READ_PREFERENCE,
+        "event_listeners": [pool_listener, command_counter],
+    }
+    if settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    return options
+
+async def warm_up_pool():
+    """预热连接池，直到已建立的连接数达到 minPoolSize 或超时"""
+    min_pool_size = settings.MONGODB_MIN_POOL_SIZE
+    
+    # 确认服务器可达
+    await db.client.admin.command("ping")
+    if min_pool_size <= 0:
+        return
+    
+    # 并发请求迫使连接池同时建立多个连接
+    await asyncio.gather(*(db.client.admin.command("ping") for _ in range(min_pool_size)))
+    
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.MONGODB_WARMUP_TIMEOUT_SECONDS
+    while pool_listener.connections_open < min_pool_size and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+    print(f"MongoDB pool warmed up: {pool_listener.connections_open} connections")
+
 async def connect_to_mongo():
     """连接到MongoDB数据库"""
-    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db.client = AsyncIOMotorClient(settings.MONGODB_URL, **_client_options())
     db.db = db.client[settings.MONGODB_DB_NAME]
     print(f"Connected to MongoDB: {settings.MONGODB_URL}")
+    await warm_up_pool()
 
 async def close_mongo_connection():
     """关闭MongoDB连接"""
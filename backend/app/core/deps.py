@@ -1,30 +1,50 @@
+import argparse
+import asyncio
+import sys
+import time
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
 from bson import ObjectId
 
+from app.core.cache import user_cache
 from app.core.config import settings
 from app.core.db import get_collection
+from app.core.revocation import revocation_list
 from app.schemas.token import TokenPayload
-from app.schemas.user import UserInDB
+from app.schemas.user import CurrentUser, UserInDB
 
 # OAuth2密码流的令牌URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+# 请求头中的令牌可以缺省，用于同时接受其他方式传递令牌的路由
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
+
+# 事件流令牌的用途声明
+EVENTS_SCOPE = "events"
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="无法验证凭据",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_token(token: str, scope: Optional[str] = None) -> TokenPayload:
     """
-    获取当前用户
+    解码并校验JWT令牌
     
     Args:
         token: JWT令牌
-        
+        scope: 要求的令牌用途；为空时只接受访问令牌，受限令牌不能用于其他接口
+    
     Returns:
-        当前用户对象
-        
+        令牌载荷
+    
     Raises:
-        HTTPException: 如果令牌无效或用户不存在
+        HTTPException: 如果令牌无效
     """
     try:
         # 解码JWT令牌
@@ -33,20 +53,156 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         )
         token_data = TokenPayload(**payload)
     except (JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="无法验证凭据",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _credentials_exception()
+    
+    if not token_data.sub or token_data.scope != scope:
+        raise _credentials_exception()
+    
+    return token_data
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+    """
+    获取当前用户
+    
+    Args:
+        token: JWT令牌
+    
+    Returns:
+        当前用户对象
+    
+    Raises:
+        HTTPException: 如果令牌无效或用户不存在
+    """
+    return await _load_user(decode_token(token))
+
+async def _load_user(token_data: TokenPayload) -> UserInDB:
+    """读取令牌对应的用户并校验令牌版本"""
+    # 优先从进程内缓存获取用户
+    current_user = user_cache.get(token_data.sub)
+    if current_user is None:
+        # 从数据库获取用户
+        user_collection = get_collection("users")
+        user = await user_collection.find_one({"_id": ObjectId(token_data.sub)})
+    
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="用户不存在"
+            )
     
-    # 从数据库获取用户
-    user_collection = get_collection("users")
-    user = await user_collection.find_one({"_id": ObjectId(token_data.sub)})
+        current_user = UserInDB(**user)
+        user_cache.set(token_data.sub, current_user)
     
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
+    # 令牌版本号低于用户当前版本号时已被吊销；缺少版本号的旧令牌视为版本0。
+    # 缓存的用户可能早于其他工作进程中的吊销，同时对照定期刷新的吊销列表校验
+    token_version = token_data.ver if token_data.ver is not None else 0
+    if (
+        token_version < current_user.token_version
+        or revocation_list.is_revoked(token_data.sub, token_version)
+    ):
+        raise _credentials_exception()
+    
+    return current_user
+
+async def get_current_identity(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    """
+    获取当前用户的最小身份信息
+    
+    启用 STATELESS_TOKENS 时，直接使用令牌中内嵌的身份声明并对照吊销列表校验，
+    不访问数据库；否则回退到 get_current_user。
+    
+    Args:
+        token: JWT令牌
+    
+    Returns:
+        当前用户身份
+    
+    Raises:
+        HTTPException: 如果令牌无效、已吊销或用户不存在
+    """
+    return await _load_identity(decode_token(token))
+
+async def get_stream_identity(
+    token: Optional[str] = Query(None),
+    header_token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> CurrentUser:
+    """
+    获取事件流连接的用户身份
+    
+    浏览器的 EventSource 不能设置请求头，令牌改由查询参数传递；
+    查询参数只接受 /events/token 签发的短期事件流令牌，避免长期访问令牌出现在URL和访问日志中。
+    
+    Args:
+        token: 查询参数中的事件流令牌
+        header_token: Authorization 请求头中的访问令牌
+    
+    Returns:
+        当前用户身份
+    
+    Raises:
+        HTTPException: 如果没有令牌，或令牌无效、已吊销
+    """
+    if token:
+        return await _load_identity(decode_token(token, scope=EVENTS_SCOPE))
+    if header_token:
+        return await _load_identity(decode_token(header_token))
+    raise _credentials_exception()
+
+async def _load_identity(token_data: TokenPayload) -> CurrentUser:
+    """由已校验的令牌载荷得到用户身份，无状态令牌不访问数据库"""
+    if settings.STATELESS_TOKENS and token_data.username and token_data.ver is not None:
+        if revocation_list.is_revoked(token_data.sub, token_data.ver):
+            raise _credentials_exception()
+    
+        return CurrentUser(
+            id=token_data.sub,
+            username=token_data.username,
+            token_version=token_data.ver
         )
     
-    return UserInDB(**user)
+    current_user = await _load_user(token_data)
+    
+    return CurrentUser(
+        id=str(current_user.id),
+        username=current_user.username,
+        token_version=current_user.token_version
+    )
+
+async def _main(requests: int, concurrency: int) -> int:
+    from app.core.benchmark import benchmark_client, format_percentiles, insert_tasks, login, register_user, timed
+    from app.core.monitoring import command_counter
+    
+    # 每种配置都从空缓存开始；数据库认证的两种配置分别禁用和启用用户缓存
+    max_size = user_cache.max_size
+    modes = (
+        ("database", False, 0),
+        ("database + user cache", False, max_size or 1),
+        ("stateless tokens", True, 0),
+    )
+    
+    async with benchmark_client() as client:
+        _, user_id = await register_user(client)
+        await insert_tasks(user_id, 20)
+        
+        print(f"GET /api/tasks, {requests} requests, concurrency {concurrency}")
+        for label, stateless, cache_size in modes:
+            settings.STATELESS_TOKENS = stateless
+            user_cache.max_size = cache_size
+            user_cache.clear()
+            # 登录时的配置决定令牌是否内嵌身份声明
+            headers = await login(client)
+            
+            before = command_counter.total()
+            started = time.perf_counter()
+            samples = await timed(lambda: client.get("/api/tasks", headers=headers), requests, concurrency)
+            elapsed = time.perf_counter() - started
+            commands = (command_counter.total() - before) / requests
+            print(f"{label:<22} {requests / elapsed:8.1f} req/s  {commands:.2f} commands/req  {format_percentiles(samples)}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比较无状态令牌与数据库认证的已认证请求吞吐量（使用临时数据库）")
+    parser.add_argument("--requests", type=int, default=2000, help="每种配置的请求数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同时进行的请求数")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.requests, args.concurrency)))
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.monitoring import Timing
+
+class HashWorkerPool:
+    """
+    密码哈希工作池
+
+    将bcrypt等CPU密集型调用移出事件循环，在线程池或进程池中执行。
+    并发数由 max_workers 限制，排队数超过 max_queue 时直接返回503，
+    避免登录高峰拖慢其他请求。
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"无效的工作池类型: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.rejected = 0
+        self.wait_time = Timing()
+        self.hash_time = Timing()
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._initializer: Optional[Callable] = None
+        self._initargs: Tuple = ()
+
+    def set_initializer(self, initializer: Callable, initargs: Tuple = ()) -> None:
+        """
+        设置进程池工作进程的初始化函数
+
+        已创建的进程池会被关闭，下次使用时以新的初始化函数重建。
+
+        Args:
+            initializer: 初始化函数（必须可被pickle）
+            initargs: 初始化函数参数
+        """
+        self._initializer = initializer
+        self._initargs = initargs
+        if self.kind == "process":
+            self.shutdown()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=self._initializer,
+                    initargs=self._initargs,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """
+        在工作池中执行函数
+
+        Args:
+            func: 要执行的函数（进程池模式下必须可被pickle）
+            *args: 函数参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            HTTPException: 如果工作池已饱和
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="服务繁忙，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        self._pending += 1
+        enqueued_at = time.perf_counter()
+        try:
+            async with self._semaphore:
+                started_at = time.perf_counter()
+                self.wait_time.observe(started_at - enqueued_at)
+
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._get_executor(), func, *args)
+
+                self.hash_time.observe(time.perf_counter() - started_at)
+                return result
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        """关闭工作池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取工作池统计信息
+
+        Returns:
+            包含排队情况、拒绝数、等待耗时和哈希耗时的字典
+        """
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "wait_time": self.wait_time.snapshot(),
+            "hash_time": self.hash_time.snapshot(),
+        }
+
+# 全局密码哈希工作池
+hash_pool = HashWorkerPool(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+async def _main(logins: int, concurrency: int, reads: int) -> int:
+    # 以模块方式运行时本文件是 __main__，应用使用的工作池在 app.core.hash_pool 中
+    from app.core.benchmark import benchmark_client, format_percentiles, insert_tasks, register_user, timed
+    from app.core.hash_pool import hash_pool as pool
+    from app.core.security import calibrate_bcrypt_cost
+
+    # 与应用启动时相同地校准成本，校准结果由 calibrate_bcrypt_cost 输出
+    calibrate_bcrypt_cost()
+    print(f"{pool.kind} pool with {pool.max_workers} workers, queue {pool.max_queue}")
+
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        await insert_tasks(user_id, 50)
+
+        def read() -> Any:
+            return client.get("/api/tasks", headers=headers)
+
+        baseline = await timed(read, reads)
+        print(f"GET /api/tasks idle        {format_percentiles(baseline)}")
+
+        credentials = {"username": "storm", "password": "storm-password"}
+        response = await client.post("/api/auth/register", json={**credentials, "email": "storm@example.com"})
+        response.raise_for_status()
+        statuses: Counter = Counter()
+
+        async def login() -> None:
+            response = await client.post("/api/auth/login", data=credentials)
+            statuses[response.status_code] += 1
+
+        async def storm() -> None:
+            remaining = iter(range(logins))
+
+            async def worker() -> None:
+                for _ in remaining:
+                    await login()
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        # 登录高峰持续期间不断读取任务列表
+        started = time.perf_counter()
+        storming = asyncio.ensure_future(storm())
+        during = []
+        while not storming.done():
+            during.extend(await timed(read, 1))
+        await storming
+        elapsed = time.perf_counter() - started
+
+        print(f"GET /api/tasks login storm {format_percentiles(during)}")
+        print(
+            f"{logins} logins in {elapsed:.1f} s ({logins / elapsed:.1f}/s), "
+            f"responses {dict(sorted(statuses.items()))}, hash wait {pool.wait_time.snapshot()['avg_ms']:.1f} ms avg"
+        )
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在登录高峰期间测量任务列表的读取延迟（使用临时数据库）")
+    parser.add_argument("--logins", type=int, default=200, help="登录请求数")
+    parser.add_argument("--concurrency", type=int, default=50, help="同时进行的登录请求数")
+    parser.add_argument("--reads", type=int, default=200, help="空闲时的读取次数")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.logins, args.concurrency, args.reads)))
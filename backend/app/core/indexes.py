@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, db, get_collection
+
+# 索引注册表：集合名 -> 索引定义（对应 ARCHITECTURE.md §4.2）
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel(
+            [("token_version", ASCENDING)],
+            name="token_version_revoked",
+            partialFilterExpression={"token_version": {"$gt": 0}},
+        ),
+    ],
+    "tasks": [
+        IndexModel(
+            [("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_updated_at",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("list_type", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_list_type_updated_at",
+        ),
+        # 按用户划分的加权全文索引，user_id 前缀要求查询带有 user_id 等值条件
+        IndexModel(
+            [("user_id", ASCENDING), ("title", TEXT), ("description", TEXT), ("tags", TEXT)],
+            name="user_id_text",
+            weights={"title": 10, "tags": 5, "description": 1},
+            default_language="none",
+        ),
+        IndexModel([("user_id", ASCENDING), ("sync_ts", ASCENDING)], name="user_id_sync_ts"),
+        IndexModel(
+            [("user_id", ASCENDING), ("list_type", ASCENDING), ("rank", ASCENDING), ("_id", ASCENDING)],
+            name="user_id_list_type_rank",
+        ),
+        # 仪表板的列表计数只需这两个字段，计数聚合由该索引覆盖，不读取任务文档
+        IndexModel(
+            [("user_id", ASCENDING), ("list_type", ASCENDING), ("is_completed", ASCENDING)],
+            name="user_id_list_type_is_completed",
+        ),
+        # 只索引已完成的任务，归档任务按完成时间扫描
+        IndexModel(
+            [("completed_at", ASCENDING)],
+            name="completed_at_archivable",
+            partialFilterExpression={"is_completed": True},
+        ),
+    ],
+    "tasks_archive": [
+        IndexModel(
+            [("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_updated_at",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("list_type", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_list_type_updated_at",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("list_type", ASCENDING), ("rank", ASCENDING), ("_id", ASCENDING)],
+            name="user_id_list_type_rank",
+        ),
+    ],
+    "task_tags": [
+        IndexModel([("user_id", ASCENDING), ("tag", ASCENDING)], name="user_id_tag_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("total", DESCENDING)], name="user_id_total"),
+        IndexModel([("user_id", ASCENDING), ("tag_key", ASCENDING)], name="user_id_tag_key"),
+    ],
+    "productivity_rollups": [
+        IndexModel(
+            [("user_id", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)],
+            name="user_id_period_start_unique",
+            unique=True,
+        ),
+    ],
+    "daily_cards": [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING)], name="user_id_date_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("sync_ts", ASCENDING)], name="user_id_sync_ts"),
+    ],
+    "tombstones": [
+        IndexModel([("user_id", ASCENDING), ("sync_ts", ASCENDING)], name="user_id_sync_ts"),
+        # 删除记录超过保留期后由TTL监视器自动清理
+        IndexModel(
+            [("deleted_at", ASCENDING)],
+            name="deleted_at_ttl",
+            expireAfterSeconds=settings.SYNC_TOMBSTONE_RETENTION_DAYS * 86400,
+        ),
+    ],
+}
+
+# 参与比较的索引选项，其余选项（如 v、ns）由服务端填充
+_INDEX_OPTIONS = (
+    "unique",
+    "sparse",
+    "partialFilterExpression",
+    "expireAfterSeconds",
+    "weights",
+    "default_language",
+    "collation",
+)
+
+class QueryShape(NamedTuple):
+    """
+    路由发出的一种查询形态，用于执行计划校验
+
+    设置 pipeline 时校验以 filter 为 $match 的聚合，否则校验 find；
+    covered 表示查询应由索引覆盖，执行计划中不能出现读取文档的 FETCH。
+    """
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, Any]]] = None
+    pipeline: Optional[List[Dict[str, Any]]] = None
+    hint: Optional[str] = None
+    covered: bool = False
+
+_SAMPLE_ID = ObjectId()
+_SAMPLE_TIME = datetime(2024, 1, 1)
+_TASK_SORT = [("updated_at", DESCENDING), ("_id", DESCENDING)]
+_SAMPLE_STAMP = 1000
+_SYNC_SORT = [("sync_ts", ASCENDING)]
+
+# 路由中出现的全部查询形态
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("auth.user_by_email", "users", {"email": "user@example.com"}),
+    QueryShape("auth.user_by_username", "users", {"username": "user"}),
+    QueryShape("auth.revoked_users", "users", {"token_version": {"$gt": 0}}),
+    QueryShape("tasks.list", "tasks", {"user_id": _SAMPLE_ID}, _TASK_SORT),
+    QueryShape("tasks.list_by_type", "tasks", {"user_id": _SAMPLE_ID, "list_type": "todo"}, _TASK_SORT),
+    QueryShape(
+        "tasks.list_page",
+        "tasks",
+        {"$and": [
+            {"user_id": _SAMPLE_ID},
+            {"$or": [
+                {"updated_at": {"$lt": _SAMPLE_TIME}},
+                {"updated_at": _SAMPLE_TIME, "_id": {"$lt": _SAMPLE_ID}},
+            ]},
+        ]},
+        _TASK_SORT,
+    ),
+    QueryShape(
+        "tasks.list_by_rank",
+        "tasks",
+        {"user_id": _SAMPLE_ID, "list_type": "todo"},
+        [("rank", ASCENDING), ("_id", ASCENDING)],
+    ),
+    QueryShape(
+        "tasks.top_rank",
+        "tasks",
+        {"user_id": _SAMPLE_ID, "list_type": "todo", "rank": {"$type": "string"}},
+        [("rank", ASCENDING), ("_id", ASCENDING)],
+    ),
+    QueryShape("tasks.by_id", "tasks", {"_id": _SAMPLE_ID, "user_id": _SAMPLE_ID}),
+    QueryShape(
+        "tasks.search",
+        "tasks",
+        {"user_id": _SAMPLE_ID, "$text": {"$search": "report"}, "list_type": "todo"},
+        [("score", {"$meta": "textScore"})],
+    ),
+    QueryShape(
+        "tasks.archivable",
+        "tasks",
+        {
+            "is_completed": True,
+            "completed_at": {"$lt": _SAMPLE_TIME},
+            "$or": [{"archive_claim": {"$exists": False}}, {"archive_claim": {"$lt": _SAMPLE_ID}}],
+        },
+    ),
+    QueryShape("tasks.archive_batch", "tasks", {"_id": {"$in": [_SAMPLE_ID]}, "archive_claim": _SAMPLE_ID}),
+    QueryShape(
+        "dashboard.counts",
+        "tasks",
+        {"user_id": _SAMPLE_ID},
+        pipeline=[{"$group": {
+            "_id": {"list_type": "$list_type"},
+            "total": {"$sum": 1},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$is_completed", True]}, 1, 0]}},
+        }}],
+        hint="user_id_list_type_is_completed",
+        covered=True,
+    ),
+    QueryShape("data.export_tasks", "tasks", {"user_id": _SAMPLE_ID}),
+    QueryShape("data.export_archive", "tasks_archive", {"user_id": _SAMPLE_ID}),
+    QueryShape("data.export_daily_cards", "daily_cards", {"user_id": _SAMPLE_ID}),
+    QueryShape("tasks_archive.list", "tasks_archive", {"user_id": _SAMPLE_ID}, _TASK_SORT),
+    QueryShape("tags.facets", "task_tags", {"user_id": _SAMPLE_ID, "total": {"$gt": 0}}, [("total", DESCENDING)]),
+    QueryShape(
+        "tags.autocomplete",
+        "task_tags",
+        {"user_id": _SAMPLE_ID, "tag_key": {"$regex": "^wo"}, "total": {"$gt": 0}},
+        [("tag_key", ASCENDING)],
+    ),
+    QueryShape("recommendations.open_tasks", "tasks", {"user_id": _SAMPLE_ID, "is_completed": False}),
+    QueryShape("recommendations.history", "tasks", {"user_id": _SAMPLE_ID, "is_completed": True}, _TASK_SORT),
+    QueryShape(
+        "analytics.productivity",
+        "productivity_rollups",
+        {"user_id": _SAMPLE_ID, "period": "day", "start": {"$gte": _SAMPLE_TIME, "$lte": _SAMPLE_TIME}},
+        [("start", ASCENDING)],
+    ),
+    QueryShape("daily_cards.list", "daily_cards", {"user_id": _SAMPLE_ID}, [("date", DESCENDING)]),
+    QueryShape(
+        "daily_cards.list_page",
+        "daily_cards",
+        {"$and": [{"user_id": _SAMPLE_ID}, {"date": {"$lt": _SAMPLE_TIME}}]},
+        [("date", DESCENDING)],
+    ),
+    QueryShape(
+        "daily_cards.date_range",
+        "daily_cards",
+        {"user_id": _SAMPLE_ID, "date": {"$gte": _SAMPLE_TIME, "$lte": _SAMPLE_TIME}},
+        [("date", DESCENDING)],
+    ),
+    QueryShape("daily_cards.by_date", "daily_cards", {"user_id": _SAMPLE_ID, "date": _SAMPLE_TIME}),
+    QueryShape("daily_cards.by_id", "daily_cards", {"_id": _SAMPLE_ID, "user_id": _SAMPLE_ID}),
+    QueryShape("sync.tasks", "tasks", {"user_id": _SAMPLE_ID, "sync_ts": {"$gt": _SAMPLE_STAMP}}, _SYNC_SORT),
+    QueryShape("sync.daily_cards", "daily_cards", {"user_id": _SAMPLE_ID, "sync_ts": {"$gt": _SAMPLE_STAMP}}, _SYNC_SORT),
+    QueryShape("sync.tombstones", "tombstones", {"user_id": _SAMPLE_ID, "sync_ts": {"$gt": _SAMPLE_STAMP}}, _SYNC_SORT),
+]
+
+def _normalized_key(declared: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """将声明的索引键转换为服务端存储的形式（全文索引字段合并为 _fts/_ftsx）"""
+    key = []
+    for field, direction in declared["key"].items():
+        if direction == TEXT:
+            if ("_fts", TEXT) not in key:
+                key.extend([("_fts", TEXT), ("_ftsx", 1)])
+        else:
+            key.append((field, direction))
+    return key
+
+def _same_index(current: Dict[str, Any], declared: Dict[str, Any]) -> bool:
+    if list(current["key"]) != _normalized_key(declared):
+        return False
+    return all(current.get(option) == declared.get(option) for option in _INDEX_OPTIONS)
+
+async def ensure_indexes() -> None:
+    """
+    按注册表幂等地创建索引
+
+    缺失的索引会被创建；同名但定义不同的索引会被删除后重建；
+    注册表之外的索引保持不变。
+    """
+    for collection_name, models in INDEXES.items():
+        collection = get_collection(collection_name)
+        existing = await collection.index_information()
+
+        missing = []
+        for model in models:
+            declared = model.document
+            current = existing.get(declared["name"])
+            if current is not None:
+                if _same_index(current, declared):
+                    continue
+                print(f"Rebuilding index {collection_name}.{declared['name']}")
+                await collection.drop_index(declared["name"])
+            missing.append(model)
+
+        if missing:
+            await collection.create_indexes(missing)
+            print(f"Created indexes on {collection_name}: {', '.join(m.document['name'] for m in missing)}")
+
+def _plan_stages(plan: Dict[str, Any]):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+def _winning_plans(explanation: Dict[str, Any]):
+    """find 的执行计划在顶层；聚合的执行计划在顶层（整个管道下推时）或首个 $cursor 阶段中"""
+    if "queryPlanner" in explanation:
+        yield explanation["queryPlanner"]["winningPlan"]
+    for stage in explanation.get("stages", []):
+        if "$cursor" in stage:
+            yield stage["$cursor"]["queryPlanner"]["winningPlan"]
+
+async def _explain(shape: QueryShape) -> Dict[str, Any]:
+    if shape.pipeline is None:
+        cursor = get_collection(shape.collection).find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        if shape.hint:
+            cursor = cursor.hint(shape.hint)
+        return await cursor.explain()
+
+    options = {"hint": shape.hint} if shape.hint else {}
+    return await db.db.command(
+        "aggregate",
+        shape.collection,
+        pipeline=[{"$match": shape.filter}, *shape.pipeline],
+        explain=True,
+        **options
+    )
+
+async def verify_query_plans() -> List[str]:
+    """
+    对每种查询形态执行 explain()，检查是否退化为全集合扫描
+
+    Returns:
+        使用了 COLLSCAN（或应由索引覆盖却读取了文档）的查询形态名称列表，为空表示全部走索引
+    """
+    failures = []
+    for shape in QUERY_SHAPES:
+        stages = [stage for plan in _winning_plans(await _explain(shape)) for stage in _plan_stages(plan)]
+        if "COLLSCAN" in stages or (shape.covered and "FETCH" in stages):
+            failures.append(shape.name)
+    return failures
+
+async def _main(verify: bool) -> int:
+    await connect_to_mongo()
+    try:
+        await ensure_indexes()
+        if not verify:
+            return 0
+
+        failures = await verify_query_plans()
+        for name in failures:
+            print(f"COLLSCAN: {name}")
+        print(f"Checked {len(QUERY_SHAPES)} query shapes, {len(failures)} without index")
+        return 1 if failures else 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="创建索引并校验查询执行计划")
+    parser.add_argument("--verify", action="store_true", help="校验所有查询形态均使用索引")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.verify)))
@@ -0,0 +1,147 @@
+import threading
+import time
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+class Timing:
+    """累计耗时统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    MongoDB连接池（CMAP）事件监听器
+
+    统计已建立连接数、使用中连接数、检出等待耗时和检出失败次数，
+    用于按工作进程评估连接池大小。事件可能来自多个线程，计数均在锁内更新。
+    """
+
+    def __init__(self):
+        self.connections_open = 0
+        self.connections_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.checkout_wait = Timing()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def connection_check_out_started(self, event):
+        # 同一次检出的开始和结束事件在同一线程中触发
+        self._local.started_at = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        reason = str(event.reason)
+        with self._lock:
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        started_at = getattr(self._local, "started_at", None)
+        with self._lock:
+            self.checkouts += 1
+            self.connections_in_use += 1
+            if started_at is not None:
+                self.checkout_wait.observe(time.perf_counter() - started_at)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.connections_in_use -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        Returns:
+            包含连接数、检出次数、检出失败和检出等待耗时的字典
+        """
+        with self._lock:
+            return {
+                "connections_open": self.connections_open,
+                "connections_in_use": self.connections_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "checkout_wait": self.checkout_wait.snapshot(),
+            }
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    MongoDB命令计数监听器
+
+    按命令名统计发往服务器的命令数（即往返次数）。对比请求前后的快照即可
+    得到单个端点产生的往返次数，防止读-写-再读的模式回归。
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self.counts[event.command_name] = self.counts.get(event.command_name, 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        获取按命令名统计的计数快照
+
+        Returns:
+            命令名到计数的字典
+        """
+        with self._lock:
+            return dict(self.counts)
+
+    def total(self) -> int:
+        """获取命令总数"""
+        with self._lock:
+            return sum(self.counts.values())
+
+# 全局连接池监听器
+pool_listener = PoolStatsListener()
+
+# 全局命令计数器
+command_counter = CommandCounter()
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.db import get_collection
+
+class TokenRevocationList:
+    """
+    令牌吊销列表
+
+    只记录 token_version 大于0的用户（即曾吊销过令牌的用户）的当前版本号。
+    令牌中携带的版本号低于当前版本即视为已吊销。列表定期从数据库整体刷新，
+    因此其他工作进程中的吊销最多延迟一个刷新周期生效。无状态令牌完全依赖此列表；
+    读取用户文档的认证路径也对照此列表，弥补进程内用户缓存在其他进程吊销后的延迟。
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        """
+        检查令牌是否已被吊销
+
+        Args:
+            user_id: 用户ID
+            token_version: 令牌中的版本号
+
+        Returns:
+            令牌是否已被吊销
+        """
+        return token_version < self._versions.get(user_id, 0)
+
+    def revoke(self, user_id: Any, token_version: int) -> None:
+        """
+        在本进程中立即生效一次吊销
+
+        Args:
+            user_id: 用户ID
+            token_version: 用户新的令牌版本号
+        """
+        user_id = str(user_id)
+        if token_version > self._versions.get(user_id, 0):
+            self._versions[user_id] = token_version
+
+    async def refresh(self) -> None:
+        """从数据库重新加载所有用户的令牌版本号"""
+        user_collection = get_collection("users")
+        cursor = user_collection.find(
+            {"token_version": {"$gt": 0}},
+            {"token_version": 1}
+        )
+        versions = {}
+        async for user in cursor:
+            versions[str(user["_id"])] = user["token_version"]
+        self._versions = versions
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as exc:
+                print(f"Failed to refresh token revocation list: {exc}")
+            await asyncio.sleep(settings.TOKEN_REVOCATION_REFRESH_SECONDS)
+
+    def start(self) -> None:
+        """启动后台刷新任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    def stop(self) -> None:
+        """停止后台刷新任务"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取吊销列表统计信息"""
+        return {
+            "enabled": settings.STATELESS_TOKENS,
+            "size": len(self._versions),
+        }
+
+# 全局令牌吊销列表
+revocation_list = TokenRevocationList()
@@ -1,22 +1,32 @@
+import time
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any, Dict, Optional, Union
 
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.hash_pool import hash_pool
 
 # 密码哈希上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# 当前生效的bcrypt成本及实测单次哈希耗时
+bcrypt_cost: Dict[str, Any] = {"rounds": None, "hash_ms": None, "calibrated": False}
+
 # JWT相关函数
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[Dict[str, Any]] = None
+) -> str:
     """
     创建JWT访问令牌
     
     Args:
         subject: 令牌主题（通常是用户ID）
         expires_delta: 过期时间增量
-        
+        claims: 额外的令牌声明（如用户名和令牌版本）
+    
     Returns:
         编码后的JWT令牌
     """
@@ -25,7 +35,8 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = dict(claims or {})
+    to_encode.update({"exp": expire, "sub": str(subject)})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
     return encoded_jwt
 
@@ -37,7 +48,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Args:
         plain_password: 明文密码
         hashed_password: 哈希后的密码
-        
+    
     Returns:
         密码是否匹配
     """
@@ -49,8 +60,110 @@ def get_password_hash(password: str) -> str:
     
     Args:
         password: 明文密码
-        
+    
     Returns:
         哈希后的密码
     """
     return pwd_context.hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    在密码哈希工作池中验证密码，不阻塞事件循环
+    
+    Args:
+        plain_password: 明文密码
+        hashed_password: 哈希后的密码
+    
+    Returns:
+        密码是否匹配
+    
+    Raises:
+        HTTPException: 如果工作池已饱和（503）
+    """
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    在密码哈希工作池中计算密码哈希，不阻塞事件循环
+    
+    Args:
+        password: 明文密码
+    
+    Returns:
+        哈希后的密码
+    
+    Raises:
+        HTTPException: 如果工作池已饱和（503）
+    """
+    return await hash_pool.run(get_password_hash, password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    检查密码哈希是否需要以当前配置的成本重新计算（成本低于最低成本时）
+    
+    Args:
+        hashed_password: 哈希后的密码
+    
+    Returns:
+        是否需要重新哈希
+    """
+    return pwd_context.needs_update(hashed_password)
+
+# bcrypt成本相关函数
+def configure_bcrypt_rounds(rounds: int, min_rounds: Optional[int] = None) -> None:
+    """
+    设置bcrypt成本
+    
+    新哈希使用 rounds；已有哈希的成本在 [min_rounds, max(rounds, BCRYPT_MAX_ROUNDS)] 范围内即视为有效，
+    只有低于 min_rounds 的哈希在登录时被重新计算。各工作进程分别校准时选出的成本可能不同，
+    接受一个范围可以避免同一密码在不同进程之间来回重新哈希。
+    
+    Args:
+        rounds: 新哈希使用的bcrypt成本（log2轮数）
+        min_rounds: 不需要重新哈希的最低成本，默认与 rounds 相同
+    """
+    min_rounds = rounds if min_rounds is None else min(min_rounds, rounds)
+    pwd_context.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=min_rounds,
+        bcrypt__max_rounds=max(rounds, settings.BCRYPT_MAX_ROUNDS)
+    )
+    bcrypt_cost["rounds"] = rounds
+
+def _measure_hash_ms(rounds: int) -> float:
+    start = time.perf_counter()
+    pwd_context.hash("calibration", rounds=rounds)
+    return (time.perf_counter() - start) * 1000
+
+def calibrate_bcrypt_cost() -> Dict[str, Any]:
+    """
+    校准bcrypt成本
+    
+    在当前机器上测量最低成本的哈希耗时，按每增加一轮耗时翻倍推算，
+    选出不超过 BCRYPT_TARGET_HASH_MS 的最高成本。设置了 BCRYPT_ROUNDS
+    时直接使用该值，低于该值的已有哈希在登录时升级；校准得到的成本因进程和机器负载而异，
+    此时只有低于 BCRYPT_MIN_ROUNDS 的哈希才重新计算。
+    
+    Returns:
+        包含所选成本和实测哈希耗时的字典
+    """
+    if settings.BCRYPT_ROUNDS is not None:
+        rounds = min_rounds = settings.BCRYPT_ROUNDS
+    else:
+        min_rounds = settings.BCRYPT_MIN_ROUNDS
+        rounds = settings.BCRYPT_MIN_ROUNDS
+        base_ms = _measure_hash_ms(rounds)
+        while (
+            rounds < settings.BCRYPT_MAX_ROUNDS
+            and base_ms * 2 ** (rounds + 1 - settings.BCRYPT_MIN_ROUNDS) <= settings.BCRYPT_TARGET_HASH_MS
+        ):
+            rounds += 1
+    
+    configure_bcrypt_rounds(rounds, min_rounds)
+    hash_pool.set_initializer(configure_bcrypt_rounds, (rounds, min_rounds))
+    
+    bcrypt_cost["hash_ms"] = _measure_hash_ms(rounds)
+    bcrypt_cost["calibrated"] = settings.BCRYPT_ROUNDS is None
+    print(f"bcrypt cost: {rounds} rounds, {bcrypt_cost['hash_ms']:.1f} ms per hash")
+    
+    return dict(bcrypt_cost)
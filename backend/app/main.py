@@ -1,6 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.api.conditional import conditional_stats
+from app.api.responses import MongoJSONResponse
+from app.core.broker import event_broker
+from app.core.cache import user_cache
 from app.core.config import settings
+from app.core.hash_pool import hash_pool
+from app.core.monitoring import command_counter, pool_listener
+from app.core.revocation import revocation_list
+from app.core.security import bcrypt_cost
+from app.services.archive import task_archiver
+from app.services.recommendations import recommendation_cache
 from app.api.routes import api_router
 from app.api.events import create_start_app_handler, create_stop_app_handler
 
@@ -12,6 +22,7 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=MongoJSONResponse,
 )
 
 # 配置CORS
@@ -35,6 +46,22 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 async def health_check():
     return {"status": "ok", "message": "FlowMaster API is running"}
 
+# 运行指标端点
+@app.get("/metrics")
+async def metrics():
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hash": hash_pool.stats(),
+        "bcrypt": bcrypt_cost,
+        "mongo_pool": pool_listener.stats(),
+        "mongo_commands": command_counter.snapshot(),
+        "token_revocation": revocation_list.stats(),
+        "conditional_get": dict(conditional_stats),
+        "events": event_broker.stats(),
+        "task_archive": task_archiver.stats(),
+        "recommendations": recommendation_cache.stats(),
+    }
+
 # 根路径重定向到文档
 @app.get("/")
 async def root():
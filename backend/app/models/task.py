@@ -44,6 +44,7 @@ class TaskInDB(TaskBase):
     user_id: PyObjectId
     is_completed: bool = False
     completed_at: Optional[datetime] = None
+    rank: Optional[str] = None  # 列表内的排序键，按字符串升序排列
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
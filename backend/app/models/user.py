@@ -44,6 +44,7 @@ class UserInDBBase(UserBase):
     preferences: Dict[str, Any] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_login: Optional[datetime] = None
+    token_version: int = 0
     
     class Config:
         arbitrary_types_allowed = True
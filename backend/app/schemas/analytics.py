@@ -0,0 +1,53 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+from app.schemas.common import ObjectIdStr
+
+class ProductivityCounts(BaseModel):
+    """一段时间内的生产力计数"""
+    completed: Dict[str, int] = {}  # 按列表类型统计的完成任务数
+    completed_total: int = 0
+    card_tasks: int = 0  # 每日卡片中计划的任务数
+    card_tasks_completed: int = 0
+    accomplishments: Dict[str, int] = {}  # 按来源统计的成就数
+    accomplishment_total: int = 0
+
+class ProductivityBucket(ProductivityCounts):
+    """一天或一周的生产力计数"""
+    start: date
+
+class ProductivityReport(BaseModel):
+    """生产力分析响应模型"""
+    start: date
+    end: date
+    period: str
+    items: List[ProductivityBucket]
+    totals: ProductivityCounts
+
+class ProductivityInsights(BaseModel):
+    """用户行为洞察响应模型"""
+    start: date
+    end: date
+    active_days: int  # 至少完成一个任务的天数
+    daily_average: float  # 平均每天完成的任务数
+    best_weekday: Optional[int] = None  # 完成任务最多的星期几，0为周一
+    top_list_type: Optional[str] = None  # 完成任务最多的列表
+    card_completion_rate: Optional[float] = None  # 卡片中计划任务的完成比例
+    current_streak: int  # 截至 end 连续完成任务的天数
+    longest_streak: int  # 范围内最长的连续天数
+    week_over_week: Optional[float] = None  # 最近7天完成数相对前7天的变化比例
+
+class TaskRecommendation(BaseModel):
+    """推荐加入每日卡片的任务"""
+    task_id: ObjectIdStr
+    title: str
+    list_type: str
+    priority: Optional[int] = None
+    due_date: Optional[datetime] = None
+    score: float
+    reason: str  # 对得分贡献最大的特征
+
+class TaskRecommendationList(BaseModel):
+    """任务推荐响应模型"""
+    items: List[TaskRecommendation]
@@ -0,0 +1,17 @@
+from typing import Any
+from typing_extensions import Annotated
+from bson import ObjectId
+from pydantic import AliasChoices, BeforeValidator, Field
+
+def _object_id_to_str(value: Any) -> Any:
+    """将MongoDB的ObjectId转换为字符串"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+# 接受ObjectId或字符串，统一以字符串输出
+ObjectIdStr = Annotated[str, BeforeValidator(_object_id_to_str)]
+
+def id_field() -> Any:
+    """文档ID字段，可从MongoDB文档的 _id 或 id 读取"""
+    return Field(validation_alias=AliasChoices("_id", "id"))
@@ -1,10 +1,24 @@
-from datetime import datetime, date
+from datetime import datetime, date, time
 from typing import Optional, List
 from pydantic import BaseModel
 
+from app.schemas.common import ObjectIdStr, id_field
+
+def card_date(value: date) -> datetime:
+    """
+    将卡片日期转换为存储格式
+
+    BSON没有纯日期类型，卡片日期统一存储为当天UTC零点的datetime，
+    读取时由 date 类型的字段还原为日期。
+    """
+    return datetime.combine(value, time.min)
+
+# 字段名 date 会在类体中遮蔽同名类型，带默认值的 date 字段使用此别名标注
+CardDate = date
+
 class CardTaskBase(BaseModel):
     """卡片任务基本信息"""
-    task_id: str
+    task_id: ObjectIdStr
     title: str
     is_completed: bool = False
 
@@ -16,7 +30,7 @@ class AccomplishmentBase(BaseModel):
     """成就基本信息"""
     title: str
     source: str
-    task_id: Optional[str] = None
+    task_id: Optional[ObjectIdStr] = None
 
 class AccomplishmentCreate(AccomplishmentBase):
     """创建成就请求模型"""
@@ -35,16 +49,24 @@ class DailyCardBase(BaseModel):
 class DailyCardCreate(BaseModel):
     """创建每日卡片请求模型"""
     tasks: List[CardTaskBase]
-    date: Optional[date] = None
+    date: Optional[CardDate] = None
 
 class DailyCardUpdate(BaseModel):
     """更新每日卡片请求模型"""
     tasks: Optional[List[CardTaskBase]] = None
 
+class DailyCardImport(BaseModel):
+    """导入记录中的每日卡片"""
+    date: date
+    tasks: List[CardTaskBase] = []
+    accomplishments: List[AccomplishmentBase] = []
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class DailyCardInDBBase(DailyCardBase):
     """数据库中的每日卡片模型基类"""
-    id: str
-    user_id: str
+    id: ObjectIdStr = id_field()
+    user_id: ObjectIdStr
     created_at: datetime
     updated_at: datetime
 
@@ -54,3 +76,38 @@ class DailyCardInDBBase(DailyCardBase):
 class DailyCard(DailyCardInDBBase):
     """API响应中的每日卡片模型"""
     pass
+
+class DailyCardView(BaseModel):
+    """按视图或字段集裁剪的每日卡片模型，未投影的字段不出现在响应中"""
+    id: ObjectIdStr = id_field()
+    user_id: Optional[ObjectIdStr] = None
+    date: Optional[CardDate] = None
+    tasks: Optional[List[CardTask]] = None
+    accomplishments: Optional[List[Accomplishment]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class DailyCardPage(BaseModel):
+    """每日卡片列表的一页"""
+    items: List[DailyCardView]
+    next_cursor: Optional[str] = None
+
+class DailyCardSummary(BaseModel):
+    """每日卡片的统计摘要"""
+    date: date
+    task_count: int
+    completed_count: int
+    accomplishment_count: int
+
+class DailyCardSummaryList(BaseModel):
+    """每日卡片统计摘要列表"""
+    items: List[DailyCardSummary]
+
+# 每日卡片列表的预定义视图，None 表示完整文档
+DAILY_CARD_VIEWS = {
+    "compact": ("date", "tasks"),
+    "full": None,
+}
+
+# 可通过 fields 参数请求的每日卡片字段
+DAILY_CARD_FIELDS = tuple(name for name in DailyCardView.model_fields if name != "id")
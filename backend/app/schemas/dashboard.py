@@ -0,0 +1,19 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+from app.schemas.daily_card import DailyCard
+from app.schemas.task import Task
+from app.schemas.user import User
+
+class DashboardList(BaseModel):
+    """仪表板中的一个任务列表，只包含排在最前面的若干个任务"""
+    items: List[Task]
+    total: int  # 列表中的任务总数
+    completed: int  # 其中已完成的任务数
+    next_cursor: Optional[str] = None  # 以相同排序继续读取 /tasks 的游标
+
+class Dashboard(BaseModel):
+    """仪表板响应模型"""
+    user: User
+    lists: Dict[str, DashboardList]
+    today_card: Optional[DailyCard] = None
@@ -0,0 +1,19 @@
+from typing import List
+from pydantic import BaseModel
+
+from app.schemas.common import ObjectIdStr
+from app.schemas.task import Task
+from app.schemas.daily_card import DailyCard
+
+class SyncDeletion(BaseModel):
+    """增量同步中的删除记录"""
+    collection: str
+    id: ObjectIdStr
+
+class SyncResponse(BaseModel):
+    """增量同步响应模型"""
+    tasks: List[Task]
+    daily_cards: List[DailyCard]
+    deleted: List[SyncDeletion]
+    token: str
+    has_more: bool
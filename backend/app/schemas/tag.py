@@ -0,0 +1,12 @@
+from typing import Dict, List
+from pydantic import BaseModel
+
+class TagFacet(BaseModel):
+    """标签及其在各列表中的任务数"""
+    tag: str
+    total: int
+    counts: Dict[str, int] = {}
+
+class TagFacetList(BaseModel):
+    """标签统计响应模型"""
+    items: List[TagFacet]
@@ -1,7 +1,10 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
+from typing_extensions import Literal
 from pydantic import BaseModel
 
+from app.schemas.common import ObjectIdStr, id_field
+
 class TaskBase(BaseModel):
     """任务基本信息"""
     title: Optional[str] = None
@@ -20,14 +23,23 @@ class TaskUpdate(TaskBase):
     """更新任务请求模型"""
     is_completed: Optional[bool] = None
 
+class TaskImport(TaskCreate):
+    """导入记录中的任务：创建任务的字段加上完成状态、排序键和时间戳"""
+    is_completed: bool = False
+    completed_at: Optional[datetime] = None
+    rank: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class TaskInDBBase(TaskBase):
     """数据库中的任务模型基类"""
-    id: str
-    user_id: str
+    id: ObjectIdStr = id_field()
+    user_id: ObjectIdStr
     is_completed: bool
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
+    rank: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -35,3 +47,70 @@ class TaskInDBBase(TaskBase):
 class Task(TaskInDBBase):
     """API响应中的任务模型"""
     pass
+
+class TaskView(BaseModel):
+    """按视图或字段集裁剪的任务模型，未投影的字段不出现在响应中"""
+    id: ObjectIdStr = id_field()
+    user_id: Optional[ObjectIdStr] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    list_type: Optional[str] = None
+    priority: Optional[int] = None
+    due_date: Optional[datetime] = None
+    tags: Optional[List[str]] = None
+    is_completed: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    rank: Optional[str] = None
+
+class TaskPage(BaseModel):
+    """任务列表的一页"""
+    items: List[TaskView]
+    next_cursor: Optional[str] = None
+
+class TaskReorder(BaseModel):
+    """调整任务顺序的请求模型，以移动后相邻的两个任务指定位置"""
+    prev_id: Optional[str] = None  # 移动后排在其前面的任务，为空表示列表开头
+    next_id: Optional[str] = None  # 移动后排在其后面的任务，为空表示列表末尾
+
+class TaskSearchHit(TaskView):
+    """全文搜索结果中的任务，附带相关度得分"""
+    score: float
+
+class TaskSearchPage(BaseModel):
+    """全文搜索结果的一页"""
+    items: List[TaskSearchHit]
+    next_offset: Optional[int] = None
+
+class TaskBatchOperation(BaseModel):
+    """批量请求中的单个操作"""
+    op: Literal["create", "update", "move", "complete", "delete"]
+    task_id: Optional[str] = None  # create 以外的操作必填
+    data: Optional[Dict[str, Any]] = None  # create 和 update 的任务字段
+    list_type: Optional[str] = None  # move 的目标列表
+
+class TaskBatchRequest(BaseModel):
+    """批量任务操作请求模型"""
+    operations: List[TaskBatchOperation]
+
+class TaskBatchOperationResult(BaseModel):
+    """单个操作的执行结果"""
+    index: int
+    op: str
+    ok: bool
+    task_id: Optional[str] = None
+    error: Optional[str] = None
+
+class TaskBatchResponse(BaseModel):
+    """批量任务操作响应模型"""
+    results: List[TaskBatchOperationResult]
+
+# 任务列表的预定义视图，None 表示完整文档
+TASK_VIEWS = {
+    "board": ("title", "list_type", "priority", "is_completed", "rank"),
+    "full": None,
+}
+
+# 可通过 fields 参数请求的任务字段
+TASK_FIELDS = tuple(name for name in TaskView.model_fields if name != "id")
@@ -9,3 +9,6 @@ class Token(BaseModel):
 class TokenPayload(BaseModel):
     """令牌载荷模型"""
     sub: Optional[str] = None
+    username: Optional[str] = None
+    ver: Optional[int] = None
+    scope: Optional[str] = None  # 受限令牌的用途，如 "events"；访问令牌没有此声明
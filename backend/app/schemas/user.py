@@ -1,6 +1,8 @@
 from typing import Optional
 from pydantic import BaseModel, EmailStr
 
+from app.schemas.common import ObjectIdStr, id_field
+
 class UserBase(BaseModel):
     """用户基本信息"""
     email: Optional[EmailStr] = None
@@ -18,7 +20,7 @@ class UserUpdate(UserBase):
 
 class UserInDBBase(UserBase):
     """数据库中的用户模型基类"""
-    id: str
+    id: ObjectIdStr = id_field()
 
     class Config:
         orm_mode = True
@@ -26,6 +28,13 @@ class UserInDBBase(UserBase):
 class UserInDB(UserInDBBase):
     """数据库中的用户模型（包含密码哈希）"""
     password: str
+    token_version: int = 0
+
+class CurrentUser(BaseModel):
+    """已认证用户的最小身份信息"""
+    id: str
+    username: str
+    token_version: int = 0
 
 class User(UserInDBBase):
     """API响应中的用户模型（不包含密码）"""
@@ -0,0 +1 @@
+# 使目录成为Python包
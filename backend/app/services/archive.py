@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+from app.core.benchmark import benchmark_client, format_percentiles, insert_tasks, register_user, timed
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, db, get_collection
+from app.services.changes import record_change
+from app.services.sync import SYNC_FIELD, record_deletions
+from app.services.tags import update_tag_counts
+
+# 已归档任务所在的集合，文档结构与 tasks 相同
+ARCHIVE_COLLECTION = "tasks_archive"
+
+# 归档进程认领任务时写入的字段，值为每批生成的ObjectId
+CLAIM_FIELD = "archive_claim"
+
+# 认领超过该时间仍未完成归档（进程中途退出）的任务可以被其他进程重新认领
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+def _archivable(cutoff: datetime) -> Dict[str, Any]:
+    return {"is_completed": True, "completed_at": {"$lt": cutoff}}
+
+def _unclaimed(now: datetime) -> Dict[str, Any]:
+    return {"$or": [
+        {CLAIM_FIELD: {"$exists": False}},
+        {CLAIM_FIELD: {"$lt": ObjectId.from_datetime(now - CLAIM_TIMEOUT)}},
+    ]}
+
+async def _archive_batch(cutoff: datetime, batch_size: int) -> Tuple[int, int]:
+    """
+    归档一批任务：先认领，再复制到归档集合，最后一次删除本批认领的任务
+    
+    多个工作进程可能读到同一批任务，认领的 update_many 以任务未被认领为条件，
+    每个任务只会被一个进程认领，标签计数和删除记录只由认领它的进程维护。
+    复制是幂等的（按 _id 覆盖），中途失败后认领超时，任务由下一次运行重新归档。
+    读取后又被修改（如取消完成）的任务不会被删除，其归档副本随即被移除并释放认领。
+    
+    Returns:
+        (本批读取的任务数, 本进程归档的任务数)
+    """
+    task_collection = get_collection("tasks")
+    archive_collection = get_collection(ARCHIVE_COLLECTION)
+    
+    now = datetime.utcnow()
+    candidates = await task_collection.find(
+        {**_archivable(cutoff), **_unclaimed(now)}, {"_id": 1}
+    ).limit(batch_size).to_list(length=batch_size)
+    if not candidates:
+        return 0, 0
+    
+    # 认领字段没有索引，之后的每个查询都带上本批的 _id 列表，由 _id 索引定位
+    claim = ObjectId()
+    batch = {"_id": {"$in": [task["_id"] for task in candidates]}, CLAIM_FIELD: claim}
+    await task_collection.update_many(
+        {"_id": batch["_id"], **_archivable(cutoff), **_unclaimed(now)},
+        {"$set": {CLAIM_FIELD: claim}}
+    )
+    claimed = await task_collection.find(batch, {CLAIM_FIELD: 0}).to_list(length=None)
+    if not claimed:
+        return len(candidates), 0
+    
+    await archive_collection.bulk_write(
+        [ReplaceOne({"_id": task["_id"]}, task, upsert=True) for task in claimed], ordered=False
+    )
+    # 每次修改都会更新同步序号：只删除读取之后未被修改的任务，归档副本与删除的文档一致
+    result = await task_collection.delete_many({
+        CLAIM_FIELD: claim,
+        "$or": [{"_id": task["_id"], SYNC_FIELD: task.get(SYNC_FIELD)} for task in claimed],
+    })
+    
+    archived = claimed
+    if result.deleted_count < len(claimed):
+        # 读取后被修改的任务仍在 tasks 中：移除其归档副本并释放认领，仍可归档的由下一批重新处理
+        remaining = {task["_id"] async for task in task_collection.find(batch, {"_id": 1})}
+        if remaining:
+            await archive_collection.delete_many({"_id": {"$in": list(remaining)}})
+            await task_collection.update_many(batch, {"$unset": {CLAIM_FIELD: ""}})
+        archived = [task for task in claimed if task["_id"] not in remaining]
+    
+    by_user: Dict[ObjectId, List[Dict[str, Any]]] = defaultdict(list)
+    for task in archived:
+        by_user[task["user_id"]].append(task)
+    for user_id, user_tasks in by_user.items():
+        # 对同步客户端和标签统计而言，归档等同于从活动任务中删除
+        await update_tag_counts(user_id, removed=user_tasks)
+        await record_deletions(user_id, "tasks", [task["_id"] for task in user_tasks])
+        await record_change(user_id, "tasks")
+    
+    return len(candidates), len(archived)
+
+async def archive_completed_tasks(days: int, batch_size: int) -> int:
+    """
+    将完成时间早于 days 天前的任务分批移入归档集合
+    
+    Args:
+        days: 完成后保留在 tasks 中的天数
+        batch_size: 每批处理的任务数
+    
+    Returns:
+        归档的任务数
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        count, archived = await _archive_batch(cutoff, batch_size)
+        total += archived
+        if count < batch_size:
+            return total
+        # 批次之间让出事件循环，避免长时间占用
+        await asyncio.sleep(0)
+
+class TaskArchiver:
+    """
+    已完成任务的后台归档任务
+    
+    按 TASK_ARCHIVE_INTERVAL_SECONDS 周期运行。多个工作进程同时运行时
+    可能读到同一批任务，每个任务由删除它的进程负责归档后的统计维护。
+    """
+
+    def __init__(self):
+        self.archived = 0
+        self.last_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                self.archived += await archive_completed_tasks(
+                    settings.TASK_ARCHIVE_AFTER_DAYS, settings.TASK_ARCHIVE_BATCH_SIZE
+                )
+                self.last_run = datetime.utcnow()
+            except Exception as exc:
+                print(f"Failed to archive completed tasks: {exc}")
+            await asyncio.sleep(settings.TASK_ARCHIVE_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        """启动后台归档任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    def stop(self) -> None:
+        """停止后台归档任务"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """获取归档统计信息"""
+        return {
+            "after_days": settings.TASK_ARCHIVE_AFTER_DAYS,
+            "archived": self.archived,
+            "last_run": self.last_run,
+        }
+
+# 全局任务归档器
+task_archiver = TaskArchiver()
+
+async def _working_set() -> str:
+    stats = await db.db.command("collStats", "tasks")
+    return (
+        f"{stats['count']} tasks, data {stats['size'] / 2 ** 20:.1f} MiB, "
+        f"indexes {stats['totalIndexSize'] / 2 ** 20:.1f} MiB"
+    )
+
+async def _benchmark(task_count: int, completed_ratio: float, years: int, days: int, batch_size: int, reads: int) -> int:
+    """在一个长期使用的生成账户上比较归档前后 tasks 集合的大小和任务列表的读取耗时"""
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        await insert_tasks(user_id, task_count, completed_ratio=completed_ratio, days=years * 365)
+    
+        async def report(label: str) -> None:
+            print(f"{label}: {await _working_set()}")
+            for params in ({}, {"list_type": "todo"}):
+                samples = await timed(lambda: client.get("/api/tasks", params=params, headers=headers), reads)
+                print(f"  GET /api/tasks {params or ''} {format_percentiles(samples)}")
+    
+        await report("Before archiving")
+        started = time.perf_counter()
+        archived = await archive_completed_tasks(days, batch_size)
+        print(f"Archived {archived} tasks in {time.perf_counter() - started:.1f} s")
+        await report("After archiving")
+    return 0
+
+async def _main(days: int, batch_size: int) -> int:
+    await connect_to_mongo()
+    try:
+        print(f"Archived {await archive_completed_tasks(days, batch_size)} tasks")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将早已完成的任务移入归档集合")
+    parser.add_argument("--days", type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS or 90, help="完成后保留的天数")
+    parser.add_argument("--batch-size", type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE)
+    parser.add_argument(
+        "--benchmark", type=int, default=0, metavar="TASKS",
+        help="在临时数据库中生成一个有 TASKS 个任务的长期账户，比较归档前后的集合大小和读取耗时"
+    )
+    parser.add_argument("--completed-ratio", type=float, default=0.9, help="基准测试中已完成任务的比例")
+    parser.add_argument("--years", type=int, default=4, help="基准测试账户的使用年数")
+    parser.add_argument("--reads", type=int, default=200, help="基准测试每种读取的请求次数")
+    args = parser.parse_args()
+    if args.benchmark:
+        sys.exit(asyncio.run(_benchmark(
+            args.benchmark, args.completed_ratio, args.years, args.days, args.batch_size, args.reads
+        )))
+    sys.exit(asyncio.run(_main(args.days, args.batch_size)))
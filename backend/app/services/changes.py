@@ -0,0 +1,43 @@
+from typing import Dict
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.broker import event_broker
+from app.core.db import get_collection
+
+# 每个用户一个文档：{_id: user_id, <集合名>: 版本号}
+VERSION_COLLECTION = "user_versions"
+
+async def record_change(user_id: ObjectId, *collections: str) -> None:
+    """
+    记录用户数据的一次变更，递增对应集合的版本号并通知事件流
+
+    所有修改任务或每日卡片的路由在写入成功后调用，版本号用于生成ETag。
+
+    Args:
+        user_id: 用户ID
+        *collections: 发生变更的集合名
+    """
+    if not collections:
+        return
+    versions = await get_collection(VERSION_COLLECTION).find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {name: 1 for name in collections}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    event_broker.publish(user_id, {name: versions[name] for name in collections})
+
+async def get_versions(user_id: ObjectId) -> Dict[str, int]:
+    """
+    获取用户各集合的当前版本号
+
+    Args:
+        user_id: 用户ID
+
+    Returns:
+        集合名到版本号的字典，从未变更的集合不在其中（视为0）
+    """
+    doc = await get_collection(VERSION_COLLECTION).find_one({"_id": user_id}, {"_id": 0})
+    return doc or {}
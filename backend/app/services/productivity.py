@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.db import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.archive import ARCHIVE_COLLECTION
+
+# 每个用户每个周期一个文档：{user_id, period: day|week, start, completed: {list_type: n}, completed_total,
+# card_tasks, card_tasks_completed, accomplishments: {source: n}, accomplishment_total}
+PRODUCTIVITY_COLLECTION = "productivity_rollups"
+
+# 统计周期，周从周一开始；日期均为UTC零点
+PERIODS = ("day", "week")
+
+def day_start(value: datetime) -> datetime:
+    """获取时间所在日的UTC零点"""
+    return datetime(value.year, value.month, value.day)
+
+def week_start(value: datetime) -> datetime:
+    """获取时间所在周（周一开始）的UTC零点"""
+    return day_start(value) - timedelta(days=value.weekday())
+
+def _key(value: Any) -> str:
+    """将列表类型、成就来源等取值转换为可用作字段名的形式"""
+    return str(value).replace(".", "_").lstrip("$") or "_"
+
+def _task_contributions(tasks: Iterable[Optional[Dict[str, Any]]]) -> Counter:
+    """统计任务对 (日期, 字段) 计数的贡献，已完成的任务计入完成当天"""
+    counter: Counter = Counter()
+    for task in tasks:
+        if not task or not task.get("is_completed") or not isinstance(task.get("completed_at"), datetime):
+            continue
+        day = day_start(task["completed_at"])
+        counter[(day, f"completed.{_key(task.get('list_type'))}")] += 1
+        counter[(day, "completed_total")] += 1
+    return counter
+
+def _card_contributions(cards: Iterable[Optional[Dict[str, Any]]]) -> Counter:
+    """统计每日卡片对 (日期, 字段) 计数的贡献，计入卡片所属的日期"""
+    counter: Counter = Counter()
+    for card in cards:
+        if not card or not isinstance(card.get("date"), datetime):
+            continue
+        day = day_start(card["date"])
+        tasks = card.get("tasks") or []
+        counter[(day, "card_tasks")] += len(tasks)
+        counter[(day, "card_tasks_completed")] += sum(1 for task in tasks if task.get("is_completed"))
+        for accomplishment in card.get("accomplishments") or []:
+            counter[(day, f"accomplishments.{_key(accomplishment.get('source'))}")] += 1
+            counter[(day, "accomplishment_total")] += 1
+    return counter
+
+def _increments(delta: Counter) -> Dict[Tuple[str, datetime], Dict[str, int]]:
+    """将按日的计数变化展开为各周期文档的 $inc 内容"""
+    increments: Dict[Tuple[str, datetime], Dict[str, int]] = defaultdict(dict)
+    for (day, field), count in delta.items():
+        if not count:
+            continue
+        for period, start in (("day", day), ("week", week_start(day))):
+            inc = increments[(period, start)]
+            inc[field] = inc.get(field, 0) + count
+    return increments
+
+async def _apply_delta(user_id: ObjectId, delta: Counter) -> None:
+    increments = _increments(delta)
+    if not increments:
+        return
+    
+    await get_collection(PRODUCTIVITY_COLLECTION).bulk_write([
+        UpdateOne({"user_id": user_id, "period": period, "start": start}, {"$inc": inc}, upsert=True)
+        for (period, start), inc in increments.items()
+    ], ordered=False)
+
+async def update_task_rollups(
+    user_id: ObjectId,
+    removed: Iterable[Optional[Dict[str, Any]]] = (),
+    added: Iterable[Optional[Dict[str, Any]]] = ()
+) -> None:
+    """
+    按任务变更增量维护生产力统计
+    
+    Args:
+        user_id: 用户ID
+        removed: 变更前的任务（删除的任务或更新前的状态），只需包含 is_completed、completed_at 和 list_type
+        added: 变更后的任务（新建的任务或更新后的状态）
+    """
+    delta = _task_contributions(added)
+    delta.subtract(_task_contributions(removed))
+    await _apply_delta(user_id, delta)
+
+async def update_card_rollups(
+    user_id: ObjectId,
+    removed: Iterable[Optional[Dict[str, Any]]] = (),
+    added: Iterable[Optional[Dict[str, Any]]] = ()
+) -> None:
+    """
+    按每日卡片变更增量维护生产力统计
+    
+    Args:
+        user_id: 用户ID
+        removed: 变更前的卡片，只需包含 date 以及发生变化的 tasks 或 accomplishments
+        added: 变更后的卡片；新增的成就可以只传入 {"date": ..., "accomplishments": [新成就]}
+    """
+    delta = _card_contributions(added)
+    delta.subtract(_card_contributions(removed))
+    await _apply_delta(user_id, delta)
+
+def _flatten(doc: Dict[str, Any], prefix: str = "") -> Dict[str, int]:
+    """将统计文档展开为 字段路径 -> 计数，忽略为0的计数"""
+    fields: Dict[str, int] = {}
+    for name, value in doc.items():
+        if isinstance(value, dict):
+            fields.update(_flatten(value, f"{prefix}{name}."))
+        elif value:
+            fields[f"{prefix}{name}"] = value
+    return fields
+
+def _nest(fields: Dict[str, int]) -> Dict[str, Any]:
+    """将 字段路径 -> 计数 还原为嵌套文档"""
+    doc: Dict[str, Any] = {}
+    for path, value in fields.items():
+        *parents, name = path.split(".")
+        target = doc
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return doc
+
+async def aggregate_rollups(user_id: Optional[ObjectId] = None) -> Dict[Tuple[ObjectId, str, datetime], Dict[str, int]]:
+    """
+    由全部任务（含归档任务）和每日卡片全量计算生产力统计
+    
+    与增量维护使用相同的贡献规则，结果可直接与存储的统计比较。
+    
+    Args:
+        user_id: 只计算指定用户，为空时计算全部用户
+    
+    Returns:
+        (用户ID, 周期, 起始日期) 到 字段路径 -> 计数 的映射
+    """
+    query: Dict[str, Any] = {} if user_id is None else {"user_id": user_id}
+    deltas: Dict[ObjectId, Counter] = defaultdict(Counter)
+    
+    # 归档只是把任务移出活动集合，已完成的归档任务仍计入历史统计
+    for collection_name in ("tasks", ARCHIVE_COLLECTION):
+        cursor = get_collection(collection_name).find(
+            {**query, "is_completed": True},
+            {"user_id": 1, "list_type": 1, "is_completed": 1, "completed_at": 1}
+        )
+        async for task in cursor:
+            deltas[task["user_id"]].update(_task_contributions([task]))
+    
+    cursor = get_collection("daily_cards").find(
+        query,
+        {"user_id": 1, "date": 1, "tasks.is_completed": 1, "accomplishments.source": 1}
+    )
+    async for card in cursor:
+        deltas[card["user_id"]].update(_card_contributions([card]))
+    
+    result: Dict[Tuple[ObjectId, str, datetime], Dict[str, int]] = {}
+    for uid, delta in deltas.items():
+        for (period, start), fields in _increments(delta).items():
+            fields = {field: count for field, count in fields.items() if count}
+            if fields:
+                result[(uid, period, start)] = fields
+    return result
+
+async def rebuild_rollups(user_id: Optional[ObjectId] = None) -> int:
+    """
+    由历史数据重建生产力统计（回填）
+    
+    Args:
+        user_id: 只重建指定用户，为空时重建全部用户
+    
+    Returns:
+        写入的统计文档数
+    """
+    rollups = await aggregate_rollups(user_id)
+    rollup_collection = get_collection(PRODUCTIVITY_COLLECTION)
+    await rollup_collection.delete_many({} if user_id is None else {"user_id": user_id})
+    
+    docs = [
+        {"user_id": uid, "period": period, "start": start, **_nest(fields)}
+        for (uid, period, start), fields in rollups.items()
+    ]
+    for start in range(0, len(docs), 1000):
+        await rollup_collection.insert_many(docs[start:start + 1000], ordered=False)
+    return len(docs)
+
+async def check_rollups(user_id: Optional[ObjectId] = None) -> List[str]:
+    """
+    将增量维护的生产力统计与全量计算结果比较
+    
+    Args:
+        user_id: 只检查指定用户，为空时检查全部用户
+    
+    Returns:
+        不一致的描述列表，为空表示一致
+    """
+    expected = await aggregate_rollups(user_id)
+    actual: Dict[Tuple[ObjectId, str, datetime], Dict[str, int]] = {}
+    cursor = get_collection(PRODUCTIVITY_COLLECTION).find(
+        {} if user_id is None else {"user_id": user_id},
+        {"_id": 0}
+    )
+    async for doc in cursor:
+        key = (doc.pop("user_id"), doc.pop("period"), doc.pop("start"))
+        fields = _flatten(doc)
+        if fields:
+            actual[key] = fields
+    
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key) != actual.get(key):
+            mismatches.append(
+                f"user={key[0]} {key[1]}={key[2]:%Y-%m-%d}: expected {expected.get(key)}, stored {actual.get(key)}"
+            )
+    return mismatches
+
+async def _main(command: str, user_id: Optional[str]) -> int:
+    await connect_to_mongo()
+    try:
+        uid = ObjectId(user_id) if user_id else None
+        if command == "rebuild":
+            print(f"Rebuilt {await rebuild_rollups(uid)} productivity documents")
+            return 0
+    
+        mismatches = await check_rollups(uid)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} inconsistent productivity documents")
+        return 1 if mismatches else 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="由历史数据重建或校验生产力统计")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user", help="只处理指定用户ID")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.command, args.user)))
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.changes import record_change
+from app.services.sync import reserve_sync_stamps, stamp_update
+
+# 排序键的数字表，字符顺序与MongoDB默认的二进制字符串比较顺序一致
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+# 手动排序：按排序键升序，排序键相同时以 _id 区分；没有排序键的历史任务排在最前面
+RANK_SORT = [("rank", 1), ("_id", 1)]
+
+# 排序键看作 [0, 1) 区间内的 BASE 进制小数的各位数字，不以 "0" 结尾，
+# 因此任意两个不同的键之间总能找到新的键
+def rank_between(lower: Optional[str], upper: Optional[str]) -> str:
+    """
+    生成位于两个排序键之间的新键
+    
+    Args:
+        lower: 下界（排在前面的任务），为空表示列表开头
+        upper: 上界（排在后面的任务），为空表示列表末尾
+    
+    Returns:
+        满足 lower < key < upper 的最短键之一
+    
+    Raises:
+        ValueError: 如果 lower 不小于 upper
+    """
+    lower = lower or ""
+    if upper is not None and lower >= upper:
+        raise ValueError(f"无效的排序区间: {lower!r} >= {upper!r}")
+    
+    # 在列表两端插入时紧挨着端点取值而不是取中点，连续插到开头或末尾时键长增长得更慢
+    at_start, at_end = not lower, upper is None
+    
+    digits = []
+    position = 0
+    while True:
+        low = DIGITS.index(lower[position]) if position < len(lower) else 0
+        high = DIGITS.index(upper[position]) if upper is not None and position < len(upper) else BASE
+        if high - low > 1:
+            if at_start:
+                digit = high - 1
+            elif at_end:
+                digit = low + 1
+            else:
+                digit = (low + high) // 2
+            digits.append(DIGITS[digit])
+            return "".join(digits)
+        digits.append(DIGITS[low])
+        if high - low == 1:
+            # 已经小于上界，后续各位只需大于下界
+            upper = None
+        position += 1
+
+def new_rank(lower: Optional[str], upper: Optional[str]) -> str:
+    """
+    生成位于两个排序键之间、带随机后缀的新键
+    
+    并发插入同一位置的请求读到相同的相邻键，rank_between 会为它们算出相同的键，
+    之后无法再在两者之间插入。追加两位随机数字后它们几乎总能得到不同的键；
+    rank_between 的结果不是上界的前缀，追加数字后仍位于区间之内。
+    
+    Raises:
+        ValueError: 如果 lower 不小于 upper
+    """
+    return rank_between(lower, upper) + DIGITS[random.randrange(BASE)] + DIGITS[random.randrange(1, BASE)]
+
+def evenly_spaced_ranks(count: int) -> List[str]:
+    """
+    生成 count 个等间距的排序键，每两个键之间都留有足够的空隙
+    
+    Args:
+        count: 键的数量
+    
+    Returns:
+        升序排列的排序键列表
+    """
+    width = 1
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+    step = BASE ** width // (count + 1)
+    
+    ranks = []
+    for index in range(1, count + 1):
+        value = index * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+async def rebalance_list(user_id: ObjectId, list_type: str) -> int:
+    """
+    为一个列表中的全部任务重新分配等间距的排序键
+    
+    保持任务列表按 RANK_SORT 读取时的顺序：没有排序键的历史任务排在最前面，
+    排序键相同的任务按 _id 排序。每个写操作都以原排序键为条件，期间被用户移动过的任务保持不变。
+    
+    Args:
+        user_id: 用户ID
+        list_type: 列表类型
+    
+    Returns:
+        更新的任务数
+    """
+    task_collection = get_collection("tasks")
+    tasks = await task_collection.find(
+        {"user_id": user_id, "list_type": list_type},
+        {"rank": 1}
+    ).sort(RANK_SORT).to_list(length=None)
+    if not tasks:
+        return 0
+    
+    changes = [
+        (task, rank)
+        for task, rank in zip(tasks, evenly_spaced_ranks(len(tasks)))
+        if task.get("rank") != rank
+    ]
+    if not changes:
+        return 0
+    
+    first_stamp = await reserve_sync_stamps(user_id, len(changes))
+    operations = [
+        UpdateOne(
+            {"_id": task["_id"], "rank": task.get("rank")},
+            stamp_update({"$set": {"rank": rank}}, first_stamp + i)
+        )
+        for i, (task, rank) in enumerate(changes)
+    ]
+    result = await task_collection.bulk_write(operations, ordered=False)
+    if result.modified_count:
+        await record_change(user_id, "tasks")
+    return result.modified_count
+
+# 等待执行的后台重排，避免同一列表被重复调度
+_pending_rebalances: Set[Tuple[ObjectId, str]] = set()
+
+async def _run_rebalance(key: Tuple[ObjectId, str]) -> None:
+    try:
+        await rebalance_list(*key)
+    except Exception as exc:
+        print(f"Failed to rebalance task ranks for {key}: {exc}")
+    finally:
+        _pending_rebalances.discard(key)
+
+def schedule_rebalance(user_id: ObjectId, list_type: str, rank: str) -> None:
+    """
+    排序键过长时在后台重排所在列表
+    
+    Args:
+        user_id: 用户ID
+        list_type: 列表类型
+        rank: 刚写入的排序键
+    """
+    key = (user_id, list_type)
+    if len(rank) <= settings.TASK_RANK_MAX_LENGTH or key in _pending_rebalances:
+        return
+    _pending_rebalances.add(key)
+    asyncio.create_task(_run_rebalance(key))
+
+async def _benchmark(reorders: int, task_count: int, block: int) -> int:
+    """在一个列表中随机移动任务，按块报告每次移动写入的任务文档数、耗时和排序键长度"""
+    from app.core.benchmark import benchmark_client, format_percentiles, insert_tasks, register_user
+    from app.services.sync import SYNC_FIELD
+    
+    async with benchmark_client() as client:
+        headers, user_id = await register_user(client)
+        # 生成的任务轮流放入各列表，只在 todo 列表中移动
+        await insert_tasks(user_id, task_count)
+        task_collection = get_collection("tasks")
+        query = {"user_id": user_id, "list_type": "todo"}
+        order = [task["_id"] async for task in task_collection.find(query, {"_id": 1}).sort(RANK_SORT)]
+
+        async def last_stamp() -> int:
+            task = await task_collection.find_one({"user_id": user_id}, {SYNC_FIELD: 1}, sort=[(SYNC_FIELD, -1)])
+            return task[SYNC_FIELD]
+        
+        # 每次写入任务都会取得新的同步序号，两次移动之间序号增长的任务即本次移动写入的文档
+        stamp = await last_stamp()
+        samples: List[float] = []
+        written: List[int] = []
+        longest = 0
+        print(f"Moving tasks in a list of {len(order)}")
+        for moved in range(1, reorders + 1):
+            task_id = order.pop(random.randrange(len(order)))
+            position = random.randrange(len(order) + 1)
+            body = {
+                "prev_id": str(order[position - 1]) if position > 0 else None,
+                "next_id": str(order[position]) if position < len(order) else None,
+            }
+            order.insert(position, task_id)
+            
+            started = time.perf_counter()
+            response = await client.put(f"/api/tasks/{task_id}/rank", json=body, headers=headers)
+            samples.append(time.perf_counter() - started)
+            response.raise_for_status()
+            longest = max(longest, len(response.json()["rank"]))
+            
+            # 后台重排写入的文档计入触发它的这次移动
+            while _pending_rebalances:
+                await asyncio.sleep(0.001)
+            written.append(await task_collection.count_documents({"user_id": user_id, SYNC_FIELD: {"$gt": stamp}}))
+            stamp = await last_stamp()
+            
+            if moved % block == 0 or moved == reorders:
+                print(
+                    f"Moves {moved - len(samples) + 1}-{moved}: "
+                    f"{sum(written) / len(written):.2f} tasks written per move (max {max(written)}), "
+                    f"longest rank {longest}, {format_percentiles(samples)}"
+                )
+                samples, written, longest = [], [], 0
+        
+        stored = [task["_id"] async for task in task_collection.find(query, {"_id": 1}).sort(RANK_SORT)]
+        if stored != order:
+            print("Stored order does not match the moves")
+            return 1
+        print("Stored order matches the moves")
+    return 0
+
+async def _main(user_id: Optional[str]) -> int:
+    await connect_to_mongo()
+    try:
+        query: Dict[str, Any] = {} if user_id is None else {"user_id": ObjectId(user_id)}
+        lists = await get_collection("tasks").aggregate([
+            {"$match": query},
+            {"$group": {"_id": {"user_id": "$user_id", "list_type": "$list_type"}}},
+        ]).to_list(length=None)
+    
+        updated = 0
+        for row in lists:
+            updated += await rebalance_list(row["_id"]["user_id"], row["_id"]["list_type"])
+        print(f"Rebalanced {len(lists)} lists, updated {updated} tasks")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重排任务排序键（同时为历史任务补写排序键）")
+    parser.add_argument("--user", help="只处理指定用户ID")
+    parser.add_argument(
+        "--benchmark", type=int, default=0, metavar="MOVES",
+        help="在临时数据库中随机移动任务 MOVES 次，检查每次移动的写入量是否保持不变"
+    )
+    parser.add_argument("--tasks", type=int, default=600, help="基准测试生成的任务数（平均分到各列表）")
+    parser.add_argument("--block", type=int, default=1000, help="基准测试每隔多少次移动报告一次")
+    args = parser.parse_args()
+    if args.benchmark:
+        sys.exit(asyncio.run(_benchmark(args.benchmark, args.tasks, args.block)))
+    sys.exit(asyncio.run(_main(args.user)))
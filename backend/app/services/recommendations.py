@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from itertools import chain
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import get_collection
+from app.schemas.daily_card import card_date
+from app.services.changes import get_versions
+
+# 各列表的基础权重：待办最优先，稍后最靠后
+LIST_WEIGHTS = {"todo": 1.0, "watch": 0.5, "later": 0.1}
+
+# 特征权重，得分为各特征值的加权和
+FEATURE_WEIGHTS = {
+    "priority": 1.0,  # 优先级，1最高
+    "due": 1.5,  # 截止日期临近或已过期
+    "age": 0.3,  # 创建时间越久越靠前，避免任务被长期搁置
+    "list": 0.8,  # 所在列表
+    "list_history": 0.4,  # 用户近期在该列表中完成任务的比例
+    "tag_history": 0.6,  # 用户近期完成的任务中带有相同标签的比例
+}
+FEATURES = tuple(FEATURE_WEIGHTS)
+_WEIGHTS = np.array([FEATURE_WEIGHTS[name] for name in FEATURES])
+
+# 推荐时读取的任务字段
+_TASK_PROJECTION = {"title": 1, "list_type": 1, "priority": 1, "due_date": 1, "tags": 1, "created_at": 1}
+
+class TaskFeatures(NamedTuple):
+    """一个用户全部未完成任务的特征数组，下标与 tasks 一一对应"""
+    tasks: List[Dict[str, Any]]
+    priority: np.ndarray  # 优先级，未设置为0
+    due_days: np.ndarray  # 距截止日期的天数（已过期为负），未设置为NaN
+    age_days: np.ndarray  # 创建至今的天数
+    list_types: np.ndarray  # 列表类型在 list_names 中的下标
+    list_names: List[str]
+    tag_owner: np.ndarray  # 每个 (任务, 标签) 对中任务的下标
+    tag_ids: np.ndarray  # 每个 (任务, 标签) 对中标签在 tag_names 中的下标
+    tag_names: List[str]
+
+class CompletionHistory(NamedTuple):
+    """用户近期完成任务的统计"""
+    total: int
+    list_counts: Dict[str, int]
+    tag_counts: Dict[str, int]
+
+def build_features(tasks: List[Dict[str, Any]], now: datetime) -> TaskFeatures:
+    """
+    将任务文档转换为特征数组
+    
+    逐个文档读取字段是唯一的Python循环，之后的计算全部是数组运算。
+    
+    Args:
+        tasks: 未完成的任务文档
+        now: 当前时间
+    
+    Returns:
+        任务特征
+    """
+    list_index: Dict[str, int] = {}
+    tag_index: Dict[str, int] = {}
+    
+    # 标签展开为 (任务, 标签) 对，同一任务中的重复标签只计一次
+    task_tags = [task.get("tags") or () for task in tasks]
+    tag_ids = np.array(
+        [tag_index.setdefault(tag, len(tag_index)) for tag in chain.from_iterable(task_tags)],
+        dtype=np.intp
+    )
+    tag_owner = np.repeat(np.arange(len(tasks)), [len(tags) for tags in task_tags])
+    pairs = np.unique(tag_owner * max(len(tag_index), 1) + tag_ids)
+    
+    return TaskFeatures(
+        tasks=tasks,
+        priority=np.array([task.get("priority") or 0 for task in tasks], dtype=np.float64),
+        due_days=np.array(
+            [(task["due_date"] - now).total_seconds() if task.get("due_date") else np.nan for task in tasks],
+            dtype=np.float64
+        ) / 86400,
+        age_days=np.array(
+            [(now - task["created_at"]).total_seconds() if task.get("created_at") else 0 for task in tasks],
+            dtype=np.float64
+        ) / 86400,
+        list_types=np.array(
+            [list_index.setdefault(task.get("list_type"), len(list_index)) for task in tasks],
+            dtype=np.intp
+        ),
+        list_names=list(list_index),
+        tag_owner=pairs // max(len(tag_index), 1),
+        tag_ids=pairs % max(len(tag_index), 1),
+        tag_names=list(tag_index),
+    )
+
+def score_tasks(features: TaskFeatures, history: CompletionHistory) -> np.ndarray:
+    """
+    一次向量化计算全部任务各特征的加权得分
+    
+    Args:
+        features: 任务特征
+        history: 近期完成任务的统计
+    
+    Returns:
+        形状为 (任务数, 特征数) 的矩阵，列顺序与 FEATURES 一致；按行求和即为任务得分
+    """
+    count = len(features.tasks)
+    matrix = np.zeros((count, len(FEATURES)))
+    
+    # 优先级 1-5 映射到 1.0-0.2，未设置为0
+    priority = np.clip(features.priority, 0, 5)
+    matrix[:, 0] = np.where(priority > 0, (6 - priority) / 5, 0)
+    
+    # 截止日期：两天内到期约为0.5，已过期趋近1，一周以后趋近0
+    has_due = ~np.isnan(features.due_days)
+    urgency = 1 / (1 + np.exp(np.clip(np.nan_to_num(features.due_days) - 2, -50, 50) / 2))
+    matrix[:, 1] = np.where(has_due, urgency, 0)
+    
+    # 搁置时间按对数增长，90天封顶
+    matrix[:, 2] = np.minimum(np.log1p(np.maximum(features.age_days, 0)) / np.log1p(90), 1)
+    
+    list_weights = np.array([LIST_WEIGHTS.get(name, 0.0) for name in features.list_names])
+    matrix[:, 3] = list_weights[features.list_types]
+    
+    # 历史偏好使用加一平滑后的完成比例，没有历史时各列表和标签相同
+    list_shares = np.array([
+        (history.list_counts.get(name, 0) + 1) / (history.total + len(LIST_WEIGHTS))
+        for name in features.list_names
+    ])
+    matrix[:, 4] = list_shares[features.list_types]
+    
+    # 多个标签取平均：按任务下标累加各标签的比例，再除以标签数
+    tag_shares = np.array([
+        (history.tag_counts.get(name, 0) + 1) / (history.total + 1)
+        for name in features.tag_names
+    ])
+    tag_sums = np.bincount(features.tag_owner, weights=tag_shares[features.tag_ids], minlength=count)
+    tag_counts = np.bincount(features.tag_owner, minlength=count)
+    matrix[:, 5] = np.divide(tag_sums, tag_counts, out=np.zeros(count), where=tag_counts > 0)
+    
+    return matrix * _WEIGHTS
+
+def top_tasks(features: TaskFeatures, contributions: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+    """
+    选出得分最高的 limit 个任务
+    
+    argpartition 在线性时间内选出前 limit 个，只对这些任务排序。
+    
+    Returns:
+        推荐列表，按得分降序，每项包含任务信息、得分和贡献最大的特征
+    """
+    scores = contributions.sum(axis=1)
+    if limit < len(scores):
+        candidates = np.argpartition(-scores, limit)[:limit]
+    else:
+        candidates = np.arange(len(scores))
+    # 得分相同时保持任务的原有顺序
+    ranked = candidates[np.lexsort((candidates, -scores[candidates]))]
+    
+    reasons = contributions[ranked].argmax(axis=1)
+    return [
+        {
+            "task_id": features.tasks[index]["_id"],
+            "title": features.tasks[index].get("title"),
+            "list_type": features.tasks[index].get("list_type"),
+            "priority": features.tasks[index].get("priority"),
+            "due_date": features.tasks[index].get("due_date"),
+            "score": round(float(scores[index]), 4),
+            "reason": FEATURES[reason],
+        }
+        for index, reason in zip(ranked.tolist(), reasons.tolist())
+    ]
+
+def _history(tasks: Iterable[Dict[str, Any]]) -> CompletionHistory:
+    list_counts: Counter = Counter()
+    tag_counts: Counter = Counter()
+    total = 0
+    for task in tasks:
+        total += 1
+        list_counts[task.get("list_type")] += 1
+        tag_counts.update(set(task.get("tags") or []))
+    return CompletionHistory(total, dict(list_counts), dict(tag_counts))
+
+# 推荐结果缓存，键为 (用户ID, 数据版本)，值为推荐列表
+recommendation_cache = TTLCache(
+    max_size=settings.RECOMMENDATION_CACHE_MAX_SIZE,
+    ttl=settings.RECOMMENDATION_CACHE_TTL_SECONDS,
+)
+
+async def recommend_tasks(user_id: ObjectId, limit: int) -> List[Dict[str, Any]]:
+    """
+    为每日卡片推荐任务
+    
+    从未完成且不在今天卡片上的任务中按得分选出前 limit 个。结果按用户缓存，
+    缓存键包含任务和卡片集合的版本号，任一集合发生变更后旧的缓存项不再命中，
+    在多个工作进程间同样成立；旧缓存项随TTL过期，TTL 也让截止日期等随时间变化的特征定期刷新。
+    
+    Args:
+        user_id: 用户ID
+        limit: 返回的任务数，不超过 RECOMMENDATION_LIMIT_MAX
+    
+    Returns:
+        推荐列表，按得分降序
+    """
+    versions = await get_versions(user_id)
+    now = datetime.utcnow()
+    cache_key = (str(user_id), versions.get("tasks", 0), versions.get("daily_cards", 0), now.date())
+    
+    cached = recommendation_cache.get(cache_key)
+    if cached is not None:
+        return cached[:limit]
+    
+    task_collection = get_collection("tasks")
+    tasks, completed, card = await asyncio.gather(
+        task_collection.find({"user_id": user_id, "is_completed": False}, _TASK_PROJECTION).to_list(length=None),
+        # 完成任务会更新 updated_at，按更新时间倒序即可取到最近完成的任务
+        task_collection.find(
+            {"user_id": user_id, "is_completed": True},
+            {"list_type": 1, "tags": 1}
+        ).sort([("updated_at", -1), ("_id", -1)]).limit(settings.RECOMMENDATION_HISTORY_SIZE).to_list(length=None),
+        get_collection("daily_cards").find_one(
+            {"user_id": user_id, "date": card_date(now.date())},
+            {"tasks.task_id": 1}
+        ),
+    )
+    
+    on_card = {item["task_id"] for item in (card or {}).get("tasks", [])}
+    if on_card:
+        tasks = [task for task in tasks if task["_id"] not in on_card]
+    
+    features = build_features(tasks, now)
+    ranked = top_tasks(features, score_tasks(features, _history(completed)), settings.RECOMMENDATION_LIMIT_MAX)
+    
+    recommendation_cache.set(cache_key, ranked)
+    return ranked[:limit]
+
+def _synthetic_tasks(count: int, now: datetime) -> Tuple[List[Dict[str, Any]], CompletionHistory]:
+    """生成用于评测的随机任务和完成历史"""
+    rng = random.Random(0)
+    tags = [f"tag{i}" for i in range(200)]
+    tasks = [
+        {
+            "_id": ObjectId(),
+            "title": f"task {i}",
+            "list_type": rng.choice(list(LIST_WEIGHTS)),
+            "priority": rng.choice([None, 1, 2, 3, 4, 5]),
+            "due_date": now + timedelta(days=rng.uniform(-10, 60)) if rng.random() < 0.4 else None,
+            "tags": rng.sample(tags, rng.randint(0, 3)),
+            "created_at": now - timedelta(days=rng.uniform(0, 365)),
+        }
+        for i in range(count)
+    ]
+    return tasks, _history(rng.sample(tasks, min(count, settings.RECOMMENDATION_HISTORY_SIZE)))
+
+def _main(count: int, repeat: int, budget_ms: float) -> int:
+    now = datetime.utcnow()
+    tasks, history = _synthetic_tasks(count, now)
+    
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        features = build_features(tasks, now)
+        extracted = time.perf_counter()
+        top_tasks(features, score_tasks(features, history), settings.RECOMMENDATION_LIMIT_MAX)
+        timings.append(((extracted - started) * 1000, (time.perf_counter() - extracted) * 1000))
+    
+    extract_ms, score_ms = sorted(timings, key=sum)[len(timings) // 2]
+    total_ms = extract_ms + score_ms
+    print(f"{count} tasks: features {extract_ms:.1f} ms, scoring {score_ms:.1f} ms, total {total_ms:.1f} ms (median of {repeat})")
+    if total_ms > budget_ms:
+        print(f"Over budget of {budget_ms:.0f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线评测推荐打分的耗时（使用随机生成的任务，不访问数据库）")
+    parser.add_argument("--tasks", type=int, default=100000, help="任务数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取中位数")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="耗时预算，超出时以非零状态退出")
+    args = parser.parse_args()
+    sys.exit(_main(args.tasks, args.repeat, args.budget_ms))
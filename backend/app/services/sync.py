@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from app.core.config import settings
+from app.core.db import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.changes import VERSION_COLLECTION
+
+# 同步序号字段：每个用户独立递增的整数，写入前从用户的同步计数器中预留
+SYNC_FIELD = "sync_ts"
+
+# user_versions 文档中的同步计数器（最近预留的序号）和最近几次预留的记录 [{at, n}]
+SYNC_COUNTER = "sync"
+SYNC_LOG = "sync_log"
+
+# 保留的预留记录数，保留期内预留过于频繁时同步令牌暂不前进
+SYNC_LOG_SIZE = 16
+
+# 删除记录集合：{user_id, collection, doc_id, sync_ts, deleted_at}，按保留期由TTL索引清理
+TOMBSTONE_COLLECTION = "tombstones"
+
+# 参与增量同步的集合
+SYNC_COLLECTIONS = ("tasks", "daily_cards")
+
+async def reserve_sync_stamps(user_id: ObjectId, count: int = 1) -> int:
+    """
+    为用户预留 count 个连续的同步序号
+    
+    序号在写入之前预留，预留到写入可见之间存在时间差，较小的序号可能晚于较大的序号可见；
+    每次预留的时间和数量记入预留记录，同步接口据此计算已全部可见的序号（见 settled_sync_stamp）。
+    
+    Args:
+        user_id: 用户ID
+        count: 预留的序号数
+    
+    Returns:
+        预留的第一个序号，序号从1开始
+    """
+    doc = await get_collection(VERSION_COLLECTION).find_one_and_update(
+        {"_id": user_id},
+        {
+            "$inc": {SYNC_COUNTER: count},
+            "$push": {SYNC_LOG: {"$each": [{"at": datetime.utcnow(), "n": count}], "$slice": -SYNC_LOG_SIZE}}
+        },
+        projection={SYNC_COUNTER: 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc[SYNC_COUNTER] - count + 1
+
+async def new_sync_stamp(user_id: ObjectId) -> int:
+    """为用户的一次写入预留同步序号"""
+    return await reserve_sync_stamps(user_id)
+
+def stamp_update(update: Dict[str, Any], stamp: int) -> Dict[str, Any]:
+    """为更新操作加上预留的同步序号"""
+    update.setdefault("$set", {})[SYNC_FIELD] = stamp
+    return update
+
+async def settled_sync_stamp(user_id: ObjectId) -> Optional[int]:
+    """
+    获取用户已全部可见的最大同步序号
+    
+    早于 SYNC_SETTLE_SECONDS 预留的序号视为已经写入；不大于返回值的序号以后不会再出现新的写入，
+    同步令牌可以安全地前进到这里。
+    
+    Args:
+        user_id: 用户ID
+    
+    Returns:
+        最大的已可见序号；保留的预留记录都在等待期内、无法确定时返回 None
+    """
+    doc = await get_collection(VERSION_COLLECTION).find_one(
+        {"_id": user_id}, {SYNC_COUNTER: 1, SYNC_LOG: 1}
+    )
+    if not doc or SYNC_COUNTER not in doc:
+        return 0
+    
+    # 从最近一次预留往前找第一条等待期之前的记录，它及之前预留的序号都已可见
+    settle_before = datetime.utcnow() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    stamp = doc[SYNC_COUNTER]
+    log = doc.get(SYNC_LOG, [])
+    for entry in reversed(log):
+        if entry["at"] <= settle_before:
+            return stamp
+        stamp -= entry["n"]
+    
+    # 记录未被截断时最早的记录之前没有预留
+    return stamp if len(log) < SYNC_LOG_SIZE else None
+
+async def record_deletions(user_id: ObjectId, collection: str, doc_ids: Iterable[ObjectId]) -> None:
+    """
+    为被删除的文档写入删除记录，供增量同步下发
+    
+    Args:
+        user_id: 用户ID
+        collection: 文档所在集合
+        doc_ids: 被删除的文档ID
+    """
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return
+    
+    now = datetime.utcnow()
+    first = await reserve_sync_stamps(user_id, len(doc_ids))
+    tombstones = [
+        {"user_id": user_id, "collection": collection, "doc_id": doc_id, SYNC_FIELD: first + i, "deleted_at": now}
+        for i, doc_id in enumerate(doc_ids)
+    ]
+    await get_collection(TOMBSTONE_COLLECTION).insert_many(tombstones, ordered=False)
+
+async def backfill_sync_stamps(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    为缺少同步序号或仍使用旧格式（BSON时间戳）同步序号的文档补写同步序号
+    
+    Args:
+        batch_size: 每批补写的文档数
+    
+    Returns:
+        集合名到补写文档数的字典
+    """
+    result = {}
+    for collection in (*SYNC_COLLECTIONS, TOMBSTONE_COLLECTION):
+        result[collection] = 0
+        while True:
+            docs = await get_collection(collection).find(
+                {SYNC_FIELD: {"$not": {"$type": "number"}}}, {"user_id": 1}
+            ).limit(batch_size).to_list(length=batch_size)
+            if not docs:
+                break
+    
+            by_user: Dict[ObjectId, List[ObjectId]] = {}
+            for doc in docs:
+                by_user.setdefault(doc["user_id"], []).append(doc["_id"])
+    
+            writes = []
+            for user_id, doc_ids in by_user.items():
+                first = await reserve_sync_stamps(user_id, len(doc_ids))
+                writes.extend(
+                    UpdateOne({"_id": doc_id}, stamp_update({}, first + i))
+                    for i, doc_id in enumerate(doc_ids)
+                )
+            await get_collection(collection).bulk_write(writes, ordered=False)
+            result[collection] += len(writes)
+    return result
+
+async def _main() -> int:
+    await connect_to_mongo()
+    try:
+        for collection, count in (await backfill_sync_stamps()).items():
+            print(f"Backfilled {count} documents in {collection}")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为历史任务、每日卡片和删除记录补写同步序号")
+    parser.parse_args()
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteMany, UpdateOne
+
+from app.core.db import connect_to_mongo, close_mongo_connection, get_collection
+
+# 每个用户每个标签一个文档：{user_id, tag, tag_key, counts: {list_type: n}, total}
+TAG_COLLECTION = "task_tags"
+
+def tag_key(tag: str) -> str:
+    """标签的小写形式，按前缀补全时不区分大小写"""
+    return tag.lower()
+
+def _contributions(tasks: Iterable[Optional[Dict[str, Any]]]) -> Counter:
+    """统计任务对 (标签, 列表类型) 计数的贡献，同一任务中的重复标签只计一次"""
+    counter: Counter = Counter()
+    for task in tasks:
+        if not task:
+            continue
+        for tag in set(task.get("tags") or []):
+            counter[(tag, task.get("list_type"))] += 1
+    return counter
+
+async def update_tag_counts(
+    user_id: ObjectId,
+    removed: Iterable[Optional[Dict[str, Any]]] = (),
+    added: Iterable[Optional[Dict[str, Any]]] = ()
+) -> None:
+    """
+    按任务变更增量维护标签计数
+    
+    Args:
+        user_id: 用户ID
+        removed: 变更前的任务（删除的任务或更新前的状态），只需包含 tags 和 list_type
+        added: 变更后的任务（新建的任务或更新后的状态）
+    """
+    delta = _contributions(added)
+    delta.subtract(_contributions(removed))
+    
+    increments: Dict[str, Dict[str, int]] = {}
+    for (tag, list_type), count in delta.items():
+        if count:
+            inc = increments.setdefault(tag, {"total": 0})
+            inc[f"counts.{list_type}"] = inc.get(f"counts.{list_type}", 0) + count
+            inc["total"] += count
+    
+    if not increments:
+        return
+    
+    operations: List[Any] = [
+        UpdateOne(
+            {"user_id": user_id, "tag": tag},
+            {"$inc": inc, "$setOnInsert": {"tag_key": tag_key(tag)}},
+            upsert=True
+        )
+        for tag, inc in increments.items()
+    ]
+    decremented = [tag for tag, inc in increments.items() if inc["total"] < 0]
+    if decremented:
+        # 计数归零的标签随同一次批量写入清理
+        operations.append(DeleteMany({"user_id": user_id, "tag": {"$in": decremented}, "total": {"$lte": 0}}))
+    
+    await get_collection(TAG_COLLECTION).bulk_write(operations, ordered=True)
+
+async def aggregate_tag_counts(user_id: Optional[ObjectId] = None) -> Dict[Tuple[ObjectId, str], Dict[str, Any]]:
+    """
+    通过全量聚合计算标签计数
+    
+    Args:
+        user_id: 只计算指定用户，为空时计算全部用户
+    
+    Returns:
+        (用户ID, 标签) 到 {"counts": ..., "total": ...} 的映射
+    """
+    pipeline: List[Dict[str, Any]] = []
+    if user_id is not None:
+        pipeline.append({"$match": {"user_id": user_id}})
+    pipeline += [
+        {"$project": {
+            "user_id": 1,
+            "list_type": 1,
+            "tags": {"$setUnion": [{"$ifNull": ["$tags", []]}, []]}
+        }},
+        {"$unwind": "$tags"},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "tag": "$tags", "list_type": "$list_type"},
+            "count": {"$sum": 1}
+        }},
+    ]
+    
+    result: Dict[Tuple[ObjectId, str], Dict[str, Any]] = {}
+    async for row in get_collection("tasks").aggregate(pipeline, allowDiskUse=True):
+        key = (row["_id"]["user_id"], row["_id"]["tag"])
+        entry = result.setdefault(key, {"counts": {}, "total": 0})
+        entry["counts"][row["_id"]["list_type"]] = row["count"]
+        entry["total"] += row["count"]
+    return result
+
+async def rebuild_tag_counts(user_id: Optional[ObjectId] = None) -> int:
+    """
+    由任务数据重建标签计数
+    
+    缺少 tag_key 的旧标签文档也随之补齐。
+    
+    Args:
+        user_id: 只重建指定用户，为空时重建全部用户
+    
+    Returns:
+        写入的标签文档数
+    """
+    counts = await aggregate_tag_counts(user_id)
+    tag_collection = get_collection(TAG_COLLECTION)
+    await tag_collection.delete_many({} if user_id is None else {"user_id": user_id})
+    
+    docs = [
+        {"user_id": uid, "tag": tag, "tag_key": tag_key(tag), "counts": entry["counts"], "total": entry["total"]}
+        for (uid, tag), entry in counts.items()
+    ]
+    for start in range(0, len(docs), 1000):
+        await tag_collection.insert_many(docs[start:start + 1000], ordered=False)
+    return len(docs)
+
+async def check_tag_counts(user_id: Optional[ObjectId] = None) -> List[str]:
+    """
+    将增量维护的标签计数与全量聚合结果比较
+    
+    Args:
+        user_id: 只检查指定用户，为空时检查全部用户
+    
+    Returns:
+        不一致的描述列表，为空表示一致
+    """
+    expected = await aggregate_tag_counts(user_id)
+    actual: Dict[Tuple[ObjectId, str], Dict[str, Any]] = {}
+    cursor = get_collection(TAG_COLLECTION).find(
+        {"total": {"$gt": 0}} if user_id is None else {"user_id": user_id, "total": {"$gt": 0}}
+    )
+    async for doc in cursor:
+        counts = {list_type: n for list_type, n in doc.get("counts", {}).items() if n}
+        actual[(doc["user_id"], doc["tag"])] = {"counts": counts, "total": doc["total"]}
+    
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key) != actual.get(key):
+            mismatches.append(f"user={key[0]} tag={key[1]!r}: expected {expected.get(key)}, stored {actual.get(key)}")
+    return mismatches
+
+async def _main(command: str, user_id: Optional[str]) -> int:
+    await connect_to_mongo()
+    try:
+        uid = ObjectId(user_id) if user_id else None
+        if command == "rebuild":
+            print(f"Rebuilt {await rebuild_tag_counts(uid)} tag documents")
+            return 0
+    
+        mismatches = await check_tag_counts(uid)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} inconsistent tag documents")
+        return 1 if mismatches else 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重建或校验任务标签计数")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user", help="只处理指定用户ID")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.command, args.user)))
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import uuid
+from typing import Any, Awaitable, Dict, Tuple
+
+# 测试使用独立的数据库和最低的bcrypt成本，必须在导入应用配置之前设置
+os.environ.setdefault("MONGODB_DB_NAME", f"flowmaster_test_{uuid.uuid4().hex[:8]}")
+os.environ.setdefault("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "2000")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.core.cache import user_cache
+from app.core.config import settings
+from app.core.db import close_mongo_connection, connect_to_mongo, db
+from app.core.indexes import ensure_indexes
+from app.core.monitoring import command_counter
+from app.core.security import configure_bcrypt_rounds
+from app.main import app
+
+configure_bcrypt_rounds(settings.BCRYPT_ROUNDS)
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """整个测试会话共用一个事件循环，Motor客户端和索引只需创建一次"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest_asyncio.fixture(scope="session")
+async def mongo_session():
+    """
+    连接测试数据库并创建索引，会话结束后删除数据库
+    
+    测试需要一个MongoDB服务（与 docker-compose 相同的 mongo:4.4 即可），
+    通过 MONGODB_URL 指定；服务不可用时跳过依赖数据库的测试。
+    """
+    try:
+        await connect_to_mongo()
+    except ServerSelectionTimeoutError as exc:
+        pytest.skip(f"MongoDB不可用: {exc}")
+    await ensure_indexes()
+    yield db.db
+    await db.client.drop_database(settings.MONGODB_DB_NAME)
+    await close_mongo_connection()
+
+@pytest_asyncio.fixture
+async def mongo(mongo_session):
+    """测试数据库；每个测试结束后清空所有集合（保留索引）和进程内缓存"""
+    yield mongo_session
+    for name in await mongo_session.list_collection_names():
+        await mongo_session[name].delete_many({})
+    user_cache.clear()
+
+@pytest_asyncio.fixture
+async def client(mongo):
+    """直接调用应用的HTTP客户端"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+@pytest_asyncio.fixture
+async def make_user(client):
+    """注册并登录用户，返回带有访问令牌的请求头"""
+    async def make(username: str = "alice") -> dict:
+        response = await client.post(
+            "/api/auth/register",
+            json={"email": f"{username}@example.com", "username": username, "password": "secret"}
+        )
+        assert response.status_code == 201, response.text
+        response = await client.post("/api/auth/login", data={"username": username, "password": "secret"})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    return make
+
+@pytest_asyncio.fixture
+async def auth_headers(make_user):
+    """默认测试用户的请求头"""
+    return await make_user()
+
+@pytest_asyncio.fixture
+async def create_task(client):
+    """通过接口创建任务，返回响应中的任务；未指定的字段使用默认标题和 todo 列表"""
+    async def create(headers: dict, **fields) -> dict:
+        response = await client.post(
+            "/api/tasks", json={"title": "Write report", "list_type": "todo", **fields}, headers=headers
+        )
+        assert response.status_code == 201, response.text
+        return response.json()
+    
+    return create
+
+async def count_commands(request: Awaitable[Any]) -> Tuple[Any, Dict[str, int]]:
+    """
+    执行请求并统计期间发往MongoDB的命令数（即往返次数）
+    
+    Returns:
+        (请求结果, 命令名到次数的字典)，只包含次数不为0的命令
+    """
+    before = command_counter.snapshot()
+    result = await request
+    after = command_counter.snapshot()
+    counts = {name: count - before.get(name, 0) for name, count in after.items()}
+    return result, {name: count for name, count in counts.items() if count}
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.services.archive import ARCHIVE_COLLECTION, CLAIM_FIELD, CLAIM_TIMEOUT, archive_completed_tasks
+from tests.conftest import count_commands
+
+async def test_concurrent_archivers_count_each_task_once(client, mongo, auth_headers, create_task):
+    """两个进程同时归档同一批任务，标签计数和删除记录只维护一次"""
+    active = await create_task(auth_headers, tags=["work"])
+    for i in range(20):
+        task = await create_task(auth_headers, title=f"Done {i}", tags=["work"])
+        await client.put(f"/api/tasks/{task['id']}/complete", headers=auth_headers)
+    await mongo["tasks"].update_many(
+        {"is_completed": True}, {"$set": {"completed_at": datetime.utcnow() - timedelta(days=100)}}
+    )
+    
+    results = await asyncio.gather(archive_completed_tasks(90, 50), archive_completed_tasks(90, 50))
+    
+    assert sum(results) == 20
+    assert await mongo[ARCHIVE_COLLECTION].count_documents({}) == 20
+    assert [str(task["_id"]) async for task in mongo["tasks"].find()] == [active["id"]]
+    assert await mongo["tombstones"].count_documents({}) == 20
+    assert len(await mongo["tombstones"].distinct("doc_id")) == 20
+    
+    tag = await mongo["task_tags"].find_one({"tag": "work"})
+    assert tag["total"] == 1
+
+async def test_archiving_a_batch_does_not_delete_tasks_one_by_one(client, mongo, auth_headers, create_task):
+    for i in range(20):
+        task = await create_task(auth_headers, title=f"Done {i}")
+        await client.put(f"/api/tasks/{task['id']}/complete", headers=auth_headers)
+    await mongo["tasks"].update_many({}, {"$set": {"completed_at": datetime.utcnow() - timedelta(days=100)}})
+    
+    archived, commands = await count_commands(archive_completed_tasks(90, 50))
+    
+    assert archived == 20
+    # 读取候选、认领、读取认领的任务、复制和删除各一次，与批次大小无关
+    assert commands["delete"] == 1
+    assert commands.get("findAndModify", 0) <= 2
+
+async def test_only_expired_claims_are_taken_over(client, mongo, auth_headers, create_task):
+    claimed = await create_task(auth_headers, title="Claimed")
+    abandoned = await create_task(auth_headers, title="Abandoned")
+    for task in (claimed, abandoned):
+        await client.put(f"/api/tasks/{task['id']}/complete", headers=auth_headers)
+    await mongo["tasks"].update_many({}, {"$set": {"completed_at": datetime.utcnow() - timedelta(days=100)}})
+    expired = ObjectId.from_datetime(datetime.utcnow() - CLAIM_TIMEOUT - timedelta(minutes=1))
+    await mongo["tasks"].update_one({"_id": ObjectId(claimed["id"])}, {"$set": {CLAIM_FIELD: ObjectId()}})
+    await mongo["tasks"].update_one({"_id": ObjectId(abandoned["id"])}, {"$set": {CLAIM_FIELD: expired}})
+    
+    assert await archive_completed_tasks(90, 50) == 1
+    
+    assert [str(task["_id"]) async for task in mongo[ARCHIVE_COLLECTION].find()] == [abandoned["id"]]
+    assert [str(task["_id"]) async for task in mongo["tasks"].find()] == [claimed["id"]]
@@ -0,0 +1,44 @@
+from bson import ObjectId
+
+from app.core.revocation import revocation_list
+from app.core.security import create_access_token
+
+async def _login(client, username: str = "alice") -> dict:
+    response = await client.post("/api/auth/login", data={"username": username, "password": "secret"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def test_revoke_invalidates_issued_tokens(client, auth_headers):
+    other_headers = await _login(client)
+    assert (await client.get("/api/tasks", headers=other_headers)).status_code == 200
+    
+    response = await client.post("/api/auth/revoke", headers=auth_headers)
+    assert response.status_code == 204
+    
+    for headers in (auth_headers, other_headers):
+        assert (await client.get("/api/tasks", headers=headers)).status_code == 401
+        assert (await client.get("/api/auth/me", headers=headers)).status_code == 401
+    
+    # 吊销之后签发的令牌正常使用
+    fresh_headers = await _login(client)
+    assert (await client.get("/api/tasks", headers=fresh_headers)).status_code == 200
+
+async def test_token_without_version_rejected_after_revoke(client, auth_headers):
+    user_id = (await client.get("/api/auth/me", headers=auth_headers)).json()["id"]
+    legacy_headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    assert (await client.get("/api/tasks", headers=legacy_headers)).status_code == 200
+    
+    await client.post("/api/auth/revoke", headers=auth_headers)
+    
+    assert (await client.get("/api/tasks", headers=legacy_headers)).status_code == 401
+
+async def test_revoke_in_another_process_rejects_cached_user(client, mongo, auth_headers):
+    """其他进程吊销后，本进程缓存的用户在吊销列表刷新后不再通过认证"""
+    user_id = (await client.get("/api/auth/me", headers=auth_headers)).json()["id"]
+    
+    await mongo["users"].update_one({"_id": ObjectId(user_id)}, {"$inc": {"token_version": 1}})
+    assert (await client.get("/api/tasks", headers=auth_headers)).status_code == 200
+    
+    await revocation_list.refresh()
+    
+    assert (await client.get("/api/tasks", headers=auth_headers)).status_code == 401
@@ -0,0 +1,50 @@
+import pytest
+
+async def _batch(client, headers, *operations):
+    return await client.post("/api/tasks/batch", json={"operations": list(operations)}, headers=headers)
+
+@pytest.mark.parametrize("second", [
+    {"op": "delete"},
+    {"op": "update", "data": {"title": "Renamed"}},
+    {"op": "move", "list_type": "later"},
+])
+async def test_duplicate_task_ids_rejected(client, mongo, auth_headers, create_task, second):
+    task = await create_task(auth_headers, tags=["work"])
+    
+    response = await _batch(
+        client, auth_headers,
+        {"op": "delete", "task_id": task["id"]},
+        {**second, "task_id": task["id"].upper()},
+    )
+    
+    assert response.status_code == 400
+    assert await mongo["tasks"].count_documents({}) == 1
+    tag = await mongo["task_tags"].find_one({"tag": "work"})
+    assert tag["total"] == 1
+
+async def test_invalid_list_type_fails_operation(client, mongo, auth_headers, create_task):
+    task = await create_task(auth_headers)
+    
+    response = await _batch(
+        client, auth_headers,
+        {"op": "create", "data": {"title": "Bad", "list_type": "someday"}},
+        {"op": "update", "task_id": task["id"], "data": {"list_type": "someday"}},
+        {"op": "create", "data": {"title": "Good", "list_type": "later"}},
+    )
+    
+    assert response.status_code == 200, response.text
+    assert [result["ok"] for result in response.json()["results"]] == [False, False, True]
+    assert await mongo["tasks"].count_documents({"list_type": "someday"}) == 0
+
+@pytest.mark.parametrize("method, path, body", [
+    ("post", "", {"title": "Bad", "list_type": "someday"}),
+    ("put", "/{id}", {"list_type": "someday"}),
+])
+async def test_single_task_routes_validate_list_type(client, auth_headers, create_task, method, path, body):
+    task = await create_task(auth_headers)
+    
+    response = await getattr(client, method)(
+        "/api/tasks" + path.format(id=task["id"]), json=body, headers=auth_headers
+    )
+    
+    assert response.status_code == 400
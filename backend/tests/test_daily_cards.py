@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import count_commands
+
+async def test_get_or_create_today_card_is_atomic(client, mongo, auth_headers):
+    """多个设备同时请求今天的卡片，只创建一张卡片，所有请求返回同一张卡片"""
+    responses = await asyncio.gather(*(
+        client.put("/api/daily-cards/today", headers=auth_headers) for _ in range(20)
+    ))
+    
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert await mongo["daily_cards"].count_documents({}) == 1
+
+async def test_get_or_create_returns_existing_card(client, auth_headers):
+    created = await client.put("/api/daily-cards/today", headers=auth_headers)
+    fetched = await client.get("/api/daily-cards/today", headers=auth_headers)
+    again = await client.put("/api/daily-cards/today", headers=auth_headers)
+    
+    assert fetched.status_code == 200
+    assert fetched.json()["id"] == again.json()["id"] == created.json()["id"]
+
+async def test_get_or_create_today_card_round_trips(client, mongo, auth_headers):
+    await client.get("/api/auth/me", headers=auth_headers)
+    
+    created, counts = await count_commands(client.put("/api/daily-cards/today", headers=auth_headers))
+    
+    assert created.status_code == 200
+    # upsert、新建卡片的同步序号（预留和写入）、版本号
+    assert counts == {"findAndModify": 3, "update": 1}
+    card = await mongo["daily_cards"].find_one({})
+    assert isinstance(card["sync_ts"], int)
+    
+    again, counts = await count_commands(client.put("/api/daily-cards/today", headers=auth_headers))
+    
+    assert again.json()["id"] == created.json()["id"]
+    # 卡片已存在时只有一次 upsert
+    assert counts == {"findAndModify": 1}
+
+async def _create_tasks(client, headers, count: int) -> list:
+    tasks = []
+    for index in range(count):
+        response = await client.post(
+            "/api/tasks", json={"title": f"Task {index}", "list_type": "todo"}, headers=headers
+        )
+        tasks.append(response.json())
+    return tasks
+
+@pytest.mark.parametrize("size", [1, 3, 5])
+async def test_card_task_validation_is_one_query(client, auth_headers, size):
+    """无论卡片包含多少任务，校验都只需一次 $in 查询"""
+    tasks = await _create_tasks(client, auth_headers, size)
+    card_tasks = [{"task_id": task["id"], "title": task["title"]} for task in tasks]
+    
+    response, counts = await count_commands(
+        client.post("/api/daily-cards", json={"tasks": card_tasks}, headers=auth_headers)
+    )
+    assert response.status_code == 201, response.text
+    assert counts.get("find") == 1
+    
+    response, counts = await count_commands(
+        client.put(f"/api/daily-cards/{response.json()['id']}", json={"tasks": card_tasks[::-1]}, headers=auth_headers)
+    )
+    assert response.status_code == 200, response.text
+    assert counts.get("find") == 1
+
+async def test_malformed_task_id_is_rejected_before_io(client, auth_headers):
+    await client.get("/api/auth/me", headers=auth_headers)  # 认证用户进入缓存
+    
+    response, counts = await count_commands(client.post(
+        "/api/daily-cards", json={"tasks": [{"task_id": "not-an-id", "title": "x"}]}, headers=auth_headers
+    ))
+    
+    assert response.status_code == 400
+    assert counts == {}
+
+async def test_foreign_task_is_rejected(client, mongo, make_user):
+    alice = await make_user("alice")
+    bob = await make_user("bob")
+    [own] = await _create_tasks(client, alice, 1)
+    [foreign] = await _create_tasks(client, bob, 1)
+    
+    response, counts = await count_commands(client.post(
+        "/api/daily-cards",
+        json={"tasks": [{"task_id": own["id"], "title": "a"}, {"task_id": foreign["id"], "title": "b"}]},
+        headers=alice
+    ))
+    
+    assert response.status_code == 404
+    assert foreign["id"] in response.json()["detail"]
+    assert counts == {"find": 1}
+    assert await mongo["daily_cards"].count_documents({}) == 0
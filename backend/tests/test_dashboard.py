@@ -0,0 +1,52 @@
+from tests.conftest import count_commands
+
+async def test_dashboard_lists_and_counts(client, auth_headers, create_task):
+    todo = [await create_task(auth_headers, title=f"Todo {i}") for i in range(3)]
+    watch = await create_task(auth_headers, list_type="watch")
+    await client.put(f"/api/tasks/{todo[0]['id']}/complete", headers=auth_headers)
+    
+    response = await client.get("/api/dashboard", params={"limit": 2}, headers=auth_headers)
+    
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["user"]["username"] == "alice"
+    assert body["user"]["email"]
+    lists = body["lists"]
+    assert (lists["todo"]["total"], lists["todo"]["completed"]) == (3, 1)
+    assert len(lists["todo"]["items"]) == 2 and lists["todo"]["next_cursor"]
+    assert (lists["watch"]["total"], lists["watch"]["completed"]) == (1, 0)
+    assert [task["id"] for task in lists["watch"]["items"]] == [watch["id"]]
+    assert lists["later"] == {"items": [], "total": 0, "completed": 0, "next_cursor": None}
+    
+    # 游标与 /tasks 的默认排序一致
+    rest = await client.get(
+        "/api/tasks", params={"list_type": "todo", "cursor": lists["todo"]["next_cursor"]}, headers=auth_headers
+    )
+    seen = [task["id"] for task in lists["todo"]["items"] + rest.json()["items"]]
+    assert sorted(seen) == sorted(task["id"] for task in todo)
+
+async def test_dashboard_reads_in_two_queries(client, auth_headers, create_task):
+    await create_task(auth_headers)
+    await client.put("/api/daily-cards/today", headers=auth_headers)
+    await client.get("/api/auth/me", headers=auth_headers)
+    
+    response, commands = await count_commands(client.get("/api/dashboard", headers=auth_headers))
+    
+    assert response.status_code == 200
+    assert response.json()["today_card"]
+    # 用户、今日卡片和版本号一次聚合，列表及计数一次聚合；认证不读取用户
+    assert commands == {"aggregate": 2}
+    
+    response, commands = await count_commands(
+        client.get("/api/dashboard", headers={**auth_headers, "If-None-Match": response.headers["ETag"]})
+    )
+    
+    assert response.status_code == 304
+    assert commands == {"aggregate": 1}
+
+async def test_dashboard_for_deleted_user_is_not_found(client, mongo, auth_headers):
+    await mongo["users"].delete_many({})
+    
+    response = await client.get("/api/dashboard", headers=auth_headers)
+    
+    assert response.status_code == 404
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from bson import ObjectId
+
+async def _import(client, headers, lines):
+    body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+    return await client.post("/api/import", files={"file": ("export.ndjson", body.encode())}, headers=headers)
+
+async def test_imported_tasks_are_ranked_after_existing_tasks(client, auth_headers, create_task):
+    existing = await create_task(auth_headers)
+    records = [
+        {"type": "task", "data": {"title": "Second", "list_type": "todo", "rank": "b"}},
+        {"type": "task", "data": {"title": "First", "list_type": "todo", "rank": "a"}},
+        {"type": "task", "data": {"title": "Unranked", "list_type": "todo"}},
+    ]
+    
+    response = await _import(client, auth_headers, records)
+    
+    assert response.status_code == 200, response.text
+    page = (await client.get(
+        "/api/tasks", params={"list_type": "todo", "sort": "rank"}, headers=auth_headers
+    )).json()
+    assert [task["title"] for task in page["items"]] == [existing["title"], "Unranked", "First", "Second"]
+    ranks = [task["rank"] for task in page["items"]]
+    assert len(set(ranks)) == 4 and all(ranks)
+
+@pytest.mark.parametrize("line", [
+    {"type": "task", "data": ["not", "an", "object"]},
+    {"type": "task", "data": {"_id": {"$oid": "not-an-object-id"}, "title": "Bad"}},
+    '{"type": "task", "data": {"due_date": {"$date": "bad"}}}',
+    {"type": "task", "data": {"title": "Bad", "list_type": "todo", "priority": "high"}},
+    {"type": "task", "data": {"title": "Bad", "list_type": "todo", "due_date": "tomorrow"}},
+    {"type": "task", "data": {"title": "Bad", "list_type": "todo", "tags": "work"}},
+    {"type": "task", "data": {"title": "Bad", "list_type": None, "tags": ["work"]}},
+    {"type": "archived_task", "data": {"title": "Bad", "list_type": "junk", "is_completed": True}},
+    {"type": "task", "data": {"list_type": "todo"}},
+    {"type": "daily_card", "data": {"date": "not a date"}},
+    {"type": "daily_card", "data": {"date": {"$date": "2024-01-01T00:00:00Z"}, "tasks": [{"task_id": "x", "title": "t"}]}},
+])
+async def test_malformed_record_reports_line_number(client, auth_headers, line):
+    good = {"type": "task", "data": {"_id": {"$oid": str(ObjectId())}, "title": "Ok", "list_type": "todo"}}
+    
+    response = await _import(client, auth_headers, [good, line])
+    
+    assert response.status_code == 400
+    assert "第 2 行" in response.json()["detail"]
+    
+    # 无效记录不会写入，之后读取任务和标签都不受影响
+    assert (await client.get("/api/tasks", headers=auth_headers)).status_code == 200
+    assert (await client.get("/api/tags", headers=auth_headers)).json()["items"] == []
+
+async def test_imported_records_read_back_like_created_ones(client, auth_headers):
+    task_id = ObjectId()
+    records = [
+        {"type": "task", "data": {
+            "_id": {"$oid": str(task_id)}, "title": "Imported", "list_type": "watch", "priority": 2,
+            "tags": ["work"], "due_date": {"$date": "2024-03-01T00:00:00Z"}, "user_id": {"$oid": str(ObjectId())},
+        }},
+        {"type": "daily_card", "data": {
+            "date": {"$date": "2024-02-01T00:00:00Z"},
+            "tasks": [{"task_id": {"$oid": str(task_id)}, "title": "Imported", "is_completed": False}],
+        }},
+    ]
+    
+    response = await _import(client, auth_headers, [json.dumps(record) for record in records])
+    
+    assert response.status_code == 200, response.text
+    task = (await client.get(f"/api/tasks/{task_id}", headers=auth_headers)).json()
+    assert (task["title"], task["priority"], task["is_completed"]) == ("Imported", 2, False)
+    cards = (await client.get("/api/daily-cards", headers=auth_headers)).json()["items"]
+    assert [card["date"] for card in cards] == ["2024-02-01"]
+    assert cards[0]["tasks"][0]["task_id"] == str(task_id)
+
+async def test_import_into_another_account_reassigns_ids(client, auth_headers, create_task, make_user):
+    task = await create_task(auth_headers, list_type="watch", tags=["work"])
+    card = (await client.post(
+        "/api/daily-cards", json={"tasks": [{"task_id": task["id"], "title": task["title"]}]}, headers=auth_headers
+    )).json()
+    export = (await client.get("/api/export", headers=auth_headers)).text.splitlines()
+    
+    other_headers = await make_user("bob")
+    response = await _import(client, other_headers, export)
+    
+    assert response.status_code == 200, response.text
+    assert response.json()["tasks"] == {"inserted": 1, "skipped": 0, "reassigned": 1}
+    assert response.json()["daily_cards"] == {"inserted": 1, "skipped": 0, "reassigned": 1}
+    [copy] = (await client.get("/api/tasks", headers=other_headers)).json()["items"]
+    assert copy["id"] != task["id"] and copy["title"] == task["title"]
+    [card_copy] = (await client.get("/api/daily-cards", headers=other_headers)).json()["items"]
+    assert card_copy["id"] != card["id"]
+    assert [t["task_id"] for t in card_copy["tasks"]] == [copy["id"]]
+    
+    # 原账户的数据不变，再次导入原账户时全部计为跳过
+    assert (await client.get(f"/api/tasks/{task['id']}", headers=auth_headers)).status_code == 200
+    again = (await _import(client, auth_headers, export)).json()
+    assert again["tasks"] == {"inserted": 0, "skipped": 1, "reassigned": 0}
+    assert again["daily_cards"] == {"inserted": 0, "skipped": 1, "reassigned": 0}
@@ -0,0 +1,45 @@
+from app.api.routes.events import stream_events
+from app.core.broker import event_broker
+from app.core.deps import get_stream_identity
+
+async def _stream_token(client, headers) -> str:
+    response = await client.post("/api/events/token", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["access_token"]
+
+async def test_stream_token_authenticates_only_the_event_stream(client, auth_headers):
+    user_id = (await client.get("/api/auth/me", headers=auth_headers)).json()["id"]
+    token = await _stream_token(client, auth_headers)
+    
+    identity = await get_stream_identity(token=token, header_token=None)
+    assert identity.id == user_id
+    
+    # 事件流令牌不能当作访问令牌使用，访问令牌也不能放在查询参数中
+    assert (await client.get("/api/tasks", headers={"Authorization": f"Bearer {token}"})).status_code == 401
+    access_token = auth_headers["Authorization"].split()[1]
+    response = await client.get("/api/events/stream", params={"token": access_token})
+    assert response.status_code == 401
+    assert (await client.get("/api/events/stream")).status_code == 401
+
+async def test_stream_token_rejected_after_revoke(client, auth_headers):
+    token = await _stream_token(client, auth_headers)
+    await client.post("/api/auth/revoke", headers=auth_headers)
+    
+    response = await client.get("/api/events/stream", params={"token": token})
+    
+    assert response.status_code == 401
+
+async def test_subscription_lives_with_the_response_body(client, auth_headers):
+    token = await _stream_token(client, auth_headers)
+    identity = await get_stream_identity(token=token, header_token=None)
+    
+    response = await stream_events(identity)
+    # 响应开始发送之前没有订阅
+    assert identity.id not in event_broker._subscriptions
+    
+    body = response.body_iterator
+    assert (await body.__anext__()).startswith("retry:")
+    assert identity.id in event_broker._subscriptions
+    
+    await body.aclose()
+    assert identity.id not in event_broker._subscriptions
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.hash_pool import HashWorkerPool
+
+async def test_concurrency_is_capped_at_max_workers():
+    pool = HashWorkerPool(kind="thread", max_workers=2, max_queue=10)
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+    
+    def work() -> None:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+    
+    try:
+        await asyncio.gather(*(pool.run(work) for _ in range(8)))
+    finally:
+        pool.shutdown()
+    
+    assert peak == 2
+    assert pool.stats()["hash_time"]["count"] == 8
+    assert pool.stats()["pending"] == 0
+
+async def test_saturated_pool_rejects_with_503():
+    pool = HashWorkerPool(kind="thread", max_workers=1, max_queue=2)
+    release = threading.Event()
+    
+    try:
+        # 1个执行中、2个排队，第4个请求被拒绝
+        blocked = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc_info:
+            await pool.run(release.wait)
+        
+        release.set()
+        await asyncio.gather(*blocked)
+    finally:
+        release.set()
+        pool.shutdown()
+    
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
+    assert pool.stats()["rejected"] == 1
+
+async def test_event_loop_is_not_blocked_while_hashing():
+    pool = HashWorkerPool(kind="thread", max_workers=1, max_queue=10)
+    ticks = 0
+    
+    async def ticker() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+    
+    task = asyncio.ensure_future(ticker())
+    try:
+        await pool.run(time.sleep, 0.2)
+    finally:
+        task.cancel()
+        pool.shutdown()
+    
+    assert ticks >= 10
@@ -0,0 +1,24 @@
+from pymongo import ASCENDING
+
+from app.core.indexes import INDEXES, QUERY_SHAPES, ensure_indexes, verify_query_plans
+
+async def test_query_shapes_use_indexes(mongo):
+    """每种查询形态的执行计划都不退化为全集合扫描"""
+    assert len(QUERY_SHAPES) > 0
+    assert await verify_query_plans() == []
+
+async def test_ensure_indexes_is_idempotent(mongo):
+    before = {name: await mongo[name].index_information() for name in INDEXES}
+    await ensure_indexes()
+    after = {name: await mongo[name].index_information() for name in INDEXES}
+    assert after == before
+
+async def test_ensure_indexes_rebuilds_changed_definition(mongo):
+    collection = mongo["task_tags"]
+    await collection.drop_index("user_id_total")
+    await collection.create_index([("user_id", ASCENDING)], name="user_id_total")
+    
+    await ensure_indexes()
+    
+    index = (await collection.index_information())["user_id_total"]
+    assert list(index["key"]) == [("user_id", 1), ("total", -1)]
@@ -0,0 +1,113 @@
+import base64
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.api.pagination import decode_cursor, keyset_filter
+from app.api.routes.tasks import TASK_SORT
+
+TASK_COUNT = 3000
+PAGE_SIZE = 100
+
+# 大账户的翻页耗时测试：任务数和每页条数（服务端允许的最大值）
+LARGE_TASK_COUNT = 100000
+LARGE_PAGE_SIZE = 200
+
+async def _insert_tasks(mongo, user_id: ObjectId, count: int) -> None:
+    # 每10个任务共用一个更新时间，翻页依赖 _id 区分排序相同的任务
+    start = datetime(2024, 1, 1)
+    await mongo["tasks"].insert_many([
+        {
+            "user_id": user_id,
+            "title": f"Task {index}",
+            "list_type": "todo",
+            "is_completed": False,
+            "created_at": start,
+            "updated_at": start + timedelta(minutes=index // 10),
+        }
+        for index in range(count)
+    ])
+
+async def _user_id(client, headers) -> ObjectId:
+    return ObjectId((await client.get("/api/auth/me", headers=headers)).json()["id"])
+
+async def _walk(client, headers, page_size: int = PAGE_SIZE, timings: list = None) -> list:
+    """按游标逐页读取全部任务，返回每页的结果；传入 timings 时记录每页的耗时"""
+    pages, cursor = [], None
+    while True:
+        params = {"limit": page_size, **({"cursor": cursor} if cursor else {})}
+        started = time.perf_counter()
+        response = await client.get("/api/tasks", params=params, headers=headers)
+        if timings is not None:
+            timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if not cursor:
+            return pages
+
+async def test_walk_returns_every_task_once_in_order(client, mongo, auth_headers):
+    await _insert_tasks(mongo, await _user_id(client, auth_headers), TASK_COUNT)
+    
+    pages = await _walk(client, auth_headers)
+    
+    ids = [task["id"] for page in pages for task in page["items"]]
+    assert len(pages) == TASK_COUNT // PAGE_SIZE
+    assert len(ids) == len(set(ids)) == TASK_COUNT
+    expected = await mongo["tasks"].find({}, {"_id": 1}).sort(TASK_SORT).to_list(length=None)
+    assert ids == [str(task["_id"]) for task in expected]
+
+async def test_page_cost_does_not_grow_with_depth(client, mongo, auth_headers):
+    """每一页扫描的索引键和文档数只与每页条数有关，与翻页深度无关"""
+    user_id = await _user_id(client, auth_headers)
+    await _insert_tasks(mongo, user_id, TASK_COUNT)
+    pages = await _walk(client, auth_headers)
+    
+    examined = []
+    for page in (pages[0], pages[len(pages) // 2], pages[-2]):
+        query = {"$and": [{"user_id": user_id}, keyset_filter(TASK_SORT, decode_cursor(page["next_cursor"], TASK_SORT))]}
+        explanation = await mongo["tasks"].find(query).sort(TASK_SORT).limit(PAGE_SIZE + 1).explain()
+        stats = explanation["executionStats"]
+        examined.append((stats["totalKeysExamined"], stats["totalDocsExamined"]))
+    
+    for keys, docs in examined:
+        assert docs <= 2 * (PAGE_SIZE + 1)
+        assert keys <= 2 * (PAGE_SIZE + 2)
+
+async def test_page_latency_is_flat_at_100k_tasks(client, mongo, auth_headers):
+    """翻到最后几页的耗时与前几页相当：每页只做一次索引范围扫描，与之前跳过的任务数无关"""
+    await _insert_tasks(mongo, await _user_id(client, auth_headers), LARGE_TASK_COUNT)
+    
+    timings = []
+    pages = await _walk(client, auth_headers, LARGE_PAGE_SIZE, timings)
+    
+    assert sum(len(page["items"]) for page in pages) == LARGE_TASK_COUNT
+    # 比较前后各十分之一页数的中位耗时，容忍计时抖动
+    window = len(timings) // 10
+    first, last = statistics.median(timings[1:window + 1]), statistics.median(timings[-window:])
+    assert last <= 2 * first + 0.005, f"first pages {first * 1000:.1f} ms, last pages {last * 1000:.1f} ms"
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    _encode("not json"),
+    _encode('{"updated_at": 1}'),
+    _encode('[{"$date": 1704067200000}]'),
+    _encode('[{"$date": 1704067200000}, {"$oid": "not-an-object-id"}]'),
+    _encode('[{"$date": {}}, {"$oid": "65a1b2c3d4e5f60718293a4b"}]'),
+    _encode('[{"$timestamp": {}}, {"$oid": "65a1b2c3d4e5f60718293a4b"}]'),
+    _encode('[{"$numberDecimal": "x"}, {"$oid": "65a1b2c3d4e5f60718293a4b"}]'),
+    _encode('[{"$regex": "^a", "$options": ""}, {"$oid": "65a1b2c3d4e5f60718293a4b"}]'),
+    _encode('[{"a": 1}, [1, 2]]'),
+])
+async def test_invalid_cursor_is_rejected(client, auth_headers, cursor):
+    response = await client.get("/api/tasks", params={"cursor": cursor}, headers=auth_headers)
+    
+    assert response.status_code == 400
+    assert response.json()["detail"] == "无效的分页游标"
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.services.ranking import rebalance_list
+
+async def _rank_order(client, headers, limit: int = 100) -> list:
+    ids, cursor = [], None
+    while True:
+        params = {"sort": "rank", "list_type": "todo", "limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/api/tasks", params=params, headers=headers)).json()
+        ids.extend(task["id"] for task in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+async def test_concurrent_creates_get_distinct_ranks(client, mongo, auth_headers, create_task):
+    await create_task(auth_headers)
+    
+    await asyncio.gather(*(create_task(auth_headers, title=f"Task {i}") for i in range(10)))
+    
+    ranks = await mongo["tasks"].distinct("rank")
+    assert len(ranks) == 11
+
+async def test_reorder_between_tasks_with_equal_ranks(client, mongo, auth_headers, create_task):
+    """相邻任务排序键相同时重排列表后完成移动，而不是返回409"""
+    first, second, moved = [await create_task(auth_headers, title=f"Task {i}") for i in range(3)]
+    await mongo["tasks"].update_many(
+        {"_id": {"$in": [ObjectId(first["id"]), ObjectId(second["id"])]}}, {"$set": {"rank": "U"}}
+    )
+    
+    response = await client.put(
+        f"/api/tasks/{moved['id']}/rank", json={"prev_id": first["id"], "next_id": second["id"]}, headers=auth_headers
+    )
+    
+    assert response.status_code == 200, response.text
+    assert await _rank_order(client, auth_headers) == [first["id"], moved["id"], second["id"]]
+
+async def test_rebalance_keeps_read_order(client, mongo, auth_headers):
+    user_id = ObjectId((await client.get("/api/auth/me", headers=auth_headers)).json()["id"])
+    now = datetime.utcnow()
+    await mongo["tasks"].insert_many([
+        {
+            "user_id": user_id, "title": f"Task {i}", "list_type": "todo", "is_completed": False,
+            "rank": rank, "created_at": now, "updated_at": now,
+        }
+        for i, rank in enumerate([None, "a", None, "a", "b", None])
+    ])
+    before = await _rank_order(client, auth_headers)
+    
+    await rebalance_list(user_id, "todo")
+    
+    assert await _rank_order(client, auth_headers) == before
+    assert len(await mongo["tasks"].distinct("rank")) == 6
+
+async def test_rank_pages_continue_past_unranked_tasks(client, mongo, auth_headers):
+    user_id = ObjectId((await client.get("/api/auth/me", headers=auth_headers)).json()["id"])
+    now = datetime.utcnow()
+    await mongo["tasks"].insert_many([
+        {
+            "user_id": user_id, "title": f"Task {i}", "list_type": "todo", "is_completed": False,
+            "rank": rank, "created_at": now, "updated_at": now,
+        }
+        for i, rank in enumerate([None, None, None, "a", "b", "c"])
+    ])
+    
+    assert len(await _rank_order(client, auth_headers, limit=2)) == 6
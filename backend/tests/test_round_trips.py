@@ -0,0 +1,73 @@
+"""
+端点往返次数回归测试
+
+固定每个写入端点发往MongoDB的命令数，防止读-写-再读的模式回归。
+认证读取的用户在注册后的首个请求后进入进程内缓存，被测请求不再访问 users 集合。
+"""
+import pytest
+
+from tests.conftest import count_commands
+
+async def test_register_round_trips(client):
+    response, counts = await count_commands(client.post(
+        "/api/auth/register", json={"email": "bob@example.com", "username": "bob", "password": "secret"}
+    ))
+    
+    assert response.status_code == 201
+    # 唯一索引代替预先查询，插入的文档直接作为响应
+    assert counts == {"insert": 1}
+
+async def test_create_task_round_trips(client, auth_headers, create_task):
+    await create_task(auth_headers)
+    
+    _, counts = await count_commands(create_task(auth_headers, tags=["work"]))
+    
+    # 列表首个排序键、同步序号、插入、标签计数、版本号
+    assert counts == {"find": 1, "insert": 1, "update": 1, "findAndModify": 2}
+
+@pytest.mark.parametrize("method, path, params, expected", [
+    # 同步序号、任务更新、版本号：不影响计数的更新只有一次任务往返
+    ("put", "", {"json": {"title": "Renamed"}}, {"findAndModify": 3}),
+    # 同步序号、读取计数字段、以其为条件更新任务、版本号；标签计数的 $inc 与清零标签的删除在同一次批量写入中
+    ("put", "", {"json": {"title": "Renamed", "tags": ["home"]}}, {"find": 1, "findAndModify": 3, "update": 1, "delete": 1}),
+    # 同步序号、以未完成为条件更新任务、生产力统计、版本号
+    ("put", "/complete", {}, {"findAndModify": 3, "update": 1}),
+    # 目标列表首个排序键、同步序号、读取计数字段、以其为条件更新任务、标签计数（列表类型变化）、版本号
+    ("put", "/move", {"params": {"list_type": "later"}}, {"find": 2, "findAndModify": 3, "update": 1}),
+    # 删除并取回、标签计数、删除记录的同步序号、删除记录、版本号
+    ("delete", "", {}, {"findAndModify": 3, "update": 1, "delete": 1, "insert": 1}),
+])
+async def test_task_mutation_round_trips(client, auth_headers, create_task, method, path, params, expected):
+    task = await create_task(auth_headers, tags=["work"])
+    
+    response, counts = await count_commands(
+        getattr(client, method)(f"/api/tasks/{task['id']}{path}", headers=auth_headers, **params)
+    )
+    
+    assert response.status_code < 300, response.text
+    assert counts == expected
+
+async def test_create_daily_card_round_trips(client, auth_headers, create_task):
+    task = await create_task(auth_headers)
+    
+    response, counts = await count_commands(client.post(
+        "/api/daily-cards", json={"tasks": [{"task_id": task["id"], "title": task["title"]}]}, headers=auth_headers
+    ))
+    
+    assert response.status_code == 201, response.text
+    # 任务校验、同步序号、插入、生产力统计、版本号
+    assert counts == {"find": 1, "insert": 1, "update": 1, "findAndModify": 2}
+
+async def test_update_daily_card_round_trips(client, auth_headers, create_task):
+    task = await create_task(auth_headers)
+    card = (await client.put("/api/daily-cards/today", headers=auth_headers)).json()
+    
+    response, counts = await count_commands(client.put(
+        f"/api/daily-cards/{card['id']}",
+        json={"tasks": [{"task_id": task["id"], "title": task["title"]}]},
+        headers=auth_headers
+    ))
+    
+    assert response.status_code == 200, response.text
+    # 任务校验、同步序号、卡片更新、生产力统计、版本号
+    assert counts == {"find": 1, "findAndModify": 3, "update": 1}
@@ -0,0 +1,27 @@
+import pytest
+
+from app.core.config import settings
+from app.core.security import configure_bcrypt_rounds, pwd_context, password_needs_rehash
+
+@pytest.fixture
+def restore_rounds():
+    yield
+    configure_bcrypt_rounds(settings.BCRYPT_ROUNDS)
+
+def test_only_hashes_below_minimum_need_rehash(restore_rounds):
+    """成本在范围内的哈希不重新计算，不同进程校准出不同成本时不会来回重新哈希"""
+    configure_bcrypt_rounds(6, min_rounds=5)
+    
+    assert not password_needs_rehash(pwd_context.hash("secret", rounds=5))
+    assert not password_needs_rehash(pwd_context.hash("secret", rounds=7))
+    assert password_needs_rehash(pwd_context.hash("secret", rounds=4))
+    
+    # 另一个进程校准出更低的成本，它生成的哈希在本进程中同样有效
+    configure_bcrypt_rounds(5, min_rounds=5)
+    assert not password_needs_rehash(pwd_context.hash("secret", rounds=6))
+
+def test_fixed_rounds_upgrade_weaker_hashes(restore_rounds):
+    configure_bcrypt_rounds(6)
+    
+    assert password_needs_rehash(pwd_context.hash("secret", rounds=5))
+    assert not password_needs_rehash(pwd_context.hash("secret", rounds=6))
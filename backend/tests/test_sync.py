@@ -0,0 +1,100 @@
+"""
+增量同步测试
+
+同步序号由每个用户的计数器预留，插入、更新和删除记录在 mongo:4.4 上都带有可比较的序号。
+"""
+from datetime import datetime
+
+from bson import ObjectId, Timestamp
+
+import pytest
+
+from app.api.pagination import encode_cursor
+from app.core.config import settings
+from app.services.sync import SYNC_FIELD, reserve_sync_stamps
+
+async def _sync(client, headers, token=None, **params) -> dict:
+    if token:
+        params["since"] = token
+    response = await client.get("/api/sync", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.fixture
+def settled(monkeypatch):
+    """写入立即视为可见，同步令牌总是前进到最后一条变更"""
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", 0)
+
+async def test_delta_sync_returns_inserts_updates_and_deletions(client, mongo, auth_headers, create_task, settled):
+    first = await create_task(auth_headers)
+    second = await create_task(auth_headers)
+    token = (await _sync(client, auth_headers))["token"]
+    
+    third = await create_task(auth_headers)
+    await client.put(f"/api/tasks/{second['id']}", json={"title": "Renamed"}, headers=auth_headers)
+    await client.delete(f"/api/tasks/{first['id']}", headers=auth_headers)
+    card = (await client.put("/api/daily-cards/today", headers=auth_headers)).json()
+    
+    delta = await _sync(client, auth_headers, token)
+    
+    assert [task["id"] for task in delta["tasks"]] == [third["id"], second["id"]]
+    assert delta["tasks"][1]["title"] == "Renamed"
+    assert [c["id"] for c in delta["daily_cards"]] == [card["id"]]
+    assert delta["deleted"] == [{"collection": "tasks", "id": first["id"]}]
+    
+    # 插入的文档（包括删除记录）都带有服务端预留的整数序号
+    for name in ("tasks", "daily_cards", "tombstones"):
+        async for doc in mongo[name].find():
+            assert isinstance(doc[SYNC_FIELD], int) and doc[SYNC_FIELD] > 0
+    
+    empty = await _sync(client, auth_headers, delta["token"])
+    assert empty["tasks"] == [] and empty["daily_cards"] == [] and empty["deleted"] == []
+
+async def test_delta_sync_pages_through_changes(client, auth_headers, create_task, settled):
+    token = (await _sync(client, auth_headers))["token"]
+    created = [(await create_task(auth_headers, title=f"Task {i}"))["id"] for i in range(5)]
+    
+    seen = []
+    while True:
+        page = await _sync(client, auth_headers, token, limit=2)
+        seen.extend(task["id"] for task in page["tasks"])
+        token = page["token"]
+        if not page["has_more"]:
+            break
+    
+    assert seen == created
+
+async def test_token_does_not_pass_writes_still_in_flight(client, mongo, auth_headers, create_task):
+    """较小的序号晚于较大的序号写入时，下次同步仍能取到它"""
+    user_id = ObjectId((await client.get("/api/auth/me", headers=auth_headers)).json()["id"])
+    
+    # 预留一个序号但暂不写入，随后的任务取得更大的序号并先写入
+    late_stamp = await reserve_sync_stamps(user_id)
+    task = await create_task(auth_headers)
+    first = await _sync(client, auth_headers)
+    assert [t["id"] for t in first["tasks"]] == [task["id"]]
+    
+    late_id = ObjectId()
+    await mongo["tasks"].insert_one({
+        "_id": late_id, "user_id": user_id, "title": "Late", "list_type": "todo",
+        "is_completed": False, "rank": "a", "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+        SYNC_FIELD: late_stamp,
+    })
+    
+    delta = await _sync(client, auth_headers, first["token"])
+    
+    # 尚未确认可见的变更会被重复下发
+    assert [t["id"] for t in delta["tasks"]] == [str(late_id), task["id"]]
+
+async def test_legacy_timestamp_token_requires_full_sync(client, auth_headers):
+    legacy = encode_cursor({SYNC_FIELD: Timestamp(1704067200, 1)}, [(SYNC_FIELD, 1)])
+    
+    response = await client.get("/api/sync", params={"since": legacy}, headers=auth_headers)
+    
+    assert response.status_code == 410
+
+@pytest.mark.parametrize("token", ["@@", "bm90LWpzb24", encode_cursor({"a": -1, "b": None}, [("a", 1), ("b", 1)])])
+async def test_invalid_token(client, auth_headers, token):
+    response = await client.get("/api/sync", params={"since": token}, headers=auth_headers)
+    
+    assert response.status_code == 400
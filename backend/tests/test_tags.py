@@ -0,0 +1,19 @@
+async def test_autocomplete_ignores_case(client, auth_headers, create_task):
+    await create_task(auth_headers, tags=["Work", "workout", "home"])
+    
+    response = await client.get("/api/tags/autocomplete", params={"prefix": "WOR"}, headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert [tag["tag"] for tag in response.json()["items"]] == ["Work", "workout"]
+
+async def test_facets_omit_emptied_lists(client, auth_headers, create_task):
+    task = await create_task(auth_headers, tags=["work"])
+    await create_task(auth_headers, list_type="watch", tags=["work"])
+    await client.put(f"/api/tasks/{task['id']}", json={"list_type": "later"}, headers=auth_headers)
+    
+    items = (await client.get("/api/tags", headers=auth_headers)).json()["items"]
+    assert items == [{"tag": "work", "total": 2, "counts": {"watch": 1, "later": 1}}]
+    
+    assert (await client.get("/api/tags", params={"list_type": "todo"}, headers=auth_headers)).json()["items"] == []
+    response = await client.get("/api/tags", params={"list_type": "nope"}, headers=auth_headers)
+    assert response.status_code == 400
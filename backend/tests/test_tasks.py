@@ -0,0 +1,50 @@
+from bson import ObjectId
+
+from app.services.productivity import check_rollups
+from app.services.tags import check_tag_counts
+
+async def test_completion_time_rule(client, mongo, auth_headers, create_task):
+    """两种完成路径使用同一规则：重复完成不改变完成时间，取消完成清除完成时间"""
+    task = await create_task(auth_headers)
+    path = f"/api/tasks/{task['id']}"
+    
+    completed = (await client.put(f"{path}/complete", headers=auth_headers)).json()
+    assert completed["is_completed"] and completed["completed_at"]
+    
+    # 写入时刻的响应带微秒，BSON日期只保存到毫秒
+    completed_at = completed["completed_at"][:23]
+    again = (await client.put(path, json={"is_completed": True}, headers=auth_headers)).json()
+    assert again["completed_at"][:23] == completed_at
+    again = (await client.put(f"{path}/complete", headers=auth_headers)).json()
+    assert again["completed_at"][:23] == completed_at
+    
+    reopened = (await client.put(path, json={"is_completed": False}, headers=auth_headers)).json()
+    assert reopened["completed_at"] is None
+    stored = await mongo["tasks"].find_one({"title": "Write report"})
+    assert "completed_at" not in stored
+    
+    recompleted = (await client.put(f"{path}/complete", headers=auth_headers)).json()
+    assert recompleted["completed_at"][:23] >= completed_at
+
+async def test_updates_keep_counters_consistent(client, mongo, auth_headers, create_task):
+    """更新、完成和移动后返回服务器上的文档，标签计数和生产力统计与全量聚合一致"""
+    task = await create_task(auth_headers, tags=["work"])
+    path = f"/api/tasks/{task['id']}"
+    legacy = await create_task(auth_headers, title="Legacy")
+    # 早期数据：已完成但没有完成时间的任务
+    await mongo["tasks"].update_one({"title": "Legacy"}, {"$set": {"is_completed": True}})
+    
+    await client.put(f"{path}/complete", headers=auth_headers)
+    await client.put(f"{path}/complete", headers=auth_headers)
+    moved = (await client.put(f"{path}/move", params={"list_type": "later"}, headers=auth_headers)).json()
+    renamed = (await client.put(path, json={"title": "Renamed", "tags": ["home"]}, headers=auth_headers)).json()
+    await client.put(f"/api/tasks/{legacy['id']}/complete", headers=auth_headers)
+    
+    stored = await mongo["tasks"].find_one({"title": "Renamed"})
+    assert moved["list_type"] == "later" and moved["rank"] == stored["rank"]
+    assert (renamed["tags"], renamed["list_type"], renamed["is_completed"]) == (["home"], "later", True)
+    assert await check_tag_counts() == []
+    assert await check_rollups() == []
+    
+    missing = await client.put(f"/api/tasks/{ObjectId()}/complete", headers=auth_headers)
+    assert missing.status_code == 404
@@ -1,6 +1,7 @@
 import { defineStore } from 'pinia'
 import axios from 'axios'
 import { useAuthStore } from './auth'
+import { useDailyCardStore } from './dailyCard'
 
 export const useTaskStore = defineStore('tasks', {
   state: () => ({
@@ -9,7 +10,17 @@ export const useTaskStore = defineStore('tasks', {
       watch: [],
       later: []
     },
+    // 各列表下一页的游标，为空表示该列表已全部加载
+    cursors: {
+      todo: null,
+      watch: null,
+      later: null
+    },
+    // 仪表板返回的各列表计数；列表按需分页加载，计数不能由已加载的任务得出
+    counts: null,
     loading: false,
+    // 正在加载下一页的列表；翻页不影响 loading，已显示的任务保持可见
+    loadingMore: null,
     error: null
   }),
   
@@ -17,6 +28,7 @@ export const useTaskStore = defineStore('tasks', {
     getTodoTasks: (state) => state.tasks.todo,
     getWatchTasks: (state) => state.tasks.watch,
     getLaterTasks: (state) => state.tasks.later,
+    hasMoreTasks: (state) => (listType) => Boolean(state.cursors[listType]),
     
     getTaskById: (state) => (id) => {
       const allTasks = [
@@ -29,28 +41,109 @@ export const useTaskStore = defineStore('tasks', {
   },
   
   actions: {
+    // 按任务所在列表和完成状态调整计数，delta 为 1 或 -1；尚未加载仪表板时没有计数可调整
+    adjustCounts(task, delta) {
+      const counts = this.counts?.[task.list_type]
+      if (!counts) {
+        return
+      }
+      
+      counts.total += delta
+      if (task.is_completed) {
+        counts.completed += delta
+      }
+    },
+    
+    async fetchTaskPage(listType, cursor = null) {
+      const authStore = useAuthStore()
+      
+      const response = await axios.get('/api/tasks', {
+        params: cursor ? { list_type: listType, cursor } : { list_type: listType },
+        headers: {
+          Authorization: `Bearer ${authStore.token}`
+        }
+      })
+      return response.data
+    },
+    
     async fetchTasks() {
       this.loading = true
       this.error = null
       
+      try {
+        // 每个列表只获取第一页，其余页面由 fetchMoreTasks 按需加载
+        const listTypes = ['todo', 'watch', 'later']
+        const pages = await Promise.all(listTypes.map(listType => this.fetchTaskPage(listType)))
+        
+        listTypes.forEach((listType, index) => {
+          this.tasks[listType] = pages[index].items
+          this.cursors[listType] = pages[index].next_cursor
+        })
+      } catch (error) {
+        this.error = '获取任务失败'
+        console.error(error)
+      } finally {
+        this.loading = false
+      }
+    },
+    
+    async fetchMoreTasks(listType) {
+      const cursor = this.cursors[listType]
+      if (!cursor || this.loading || this.loadingMore) {
+        return
+      }
+      
+      this.loadingMore = listType
+      this.error = null
+      
+      try {
+        const page = await this.fetchTaskPage(listType, cursor)
+        this.tasks[listType].push(...page.items)
+        this.cursors[listType] = page.next_cursor
+      } catch (error) {
+        this.error = '获取任务失败'
+        console.error(error)
+      } finally {
+        this.loadingMore = null
+      }
+    },
+    
+    async fetchDashboard() {
+      this.loading = true
+      this.error = null
+      
       const authStore = useAuthStore()
+      const dailyCardStore = useDailyCardStore()
       
       try {
-        const response = await axios.get('/api/tasks', {
+        // 一次请求获取三个列表的前若干个任务、列表计数、今日卡片和用户信息
+        const response = await axios.get('/api/dashboard', {
           headers: {
             Authorization: `Bearer ${authStore.token}`
           }
         })
         
-        // 按列表类型分组任务
-        const tasks = response.data
+        const { user, lists, today_card } = response.data
         this.tasks = {
-          todo: tasks.filter(task => task.list_type === 'todo'),
-          watch: tasks.filter(task => task.list_type === 'watch'),
-          later: tasks.filter(task => task.list_type === 'later')
+          todo: lists.todo.items,
+          watch: lists.watch.items,
+          later: lists.later.items
         }
+        // 仪表板的游标与 /api/tasks 的默认排序一致，可直接继续分页
+        this.cursors = {
+          todo: lists.todo.next_cursor,
+          watch: lists.watch.next_cursor,
+          later: lists.later.next_cursor
+        }
+        this.counts = {
+          todo: { total: lists.todo.total, completed: lists.todo.completed },
+          watch: { total: lists.watch.total, completed: lists.watch.completed },
+          later: { total: lists.later.total, completed: lists.later.completed }
+        }
+        dailyCardStore.todayCard = today_card
+        authStore.user = user
       } catch (error) {
-        this.error = '获取任务失败'
+        this.error = '获取仪表板数据失败'
         console.error(error)
       } finally {
         this.loading = false
@@ -72,6 +165,7 @@ export const useTaskStore = defineStore('tasks', {
         
         const newTask = response.data
         this.tasks[newTask.list_type].push(newTask)
+        this.adjustCounts(newTask, 1)
         
         return newTask
       } catch (error) {
@@ -99,7 +193,14 @@ export const useTaskStore = defineStore('tasks', {
         const updatedTask = response.data
         
         // 如果列表类型改变，需要从旧列表中移除并添加到新列表
-        const oldListType = this.getTaskById(id)?.list_type
+        const oldTask = this.getTaskById(id)
+        const oldListType = oldTask?.list_type
+        
+        // 旧任务未加载时无法得知它原来的列表和完成状态，计数保持不变
+        if (oldTask) {
+          this.adjustCounts(oldTask, -1)
+          this.adjustCounts(updatedTask, 1)
+        }
         
         if (oldListType && oldListType !== updatedTask.list_type) {
           // 从旧列表中移除
@@ -148,6 +249,7 @@ export const useTaskStore = defineStore('tasks', {
         
         // 从列表中移除任务
         this.tasks[task.list_type] = this.tasks[task.list_type].filter(t => t.id !== id)
+        this.adjustCounts(task, -1)
         
         return true
       } catch (error) {